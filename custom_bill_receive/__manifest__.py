@@ -3,6 +3,8 @@
     'version': '1.0',
     'depends': ['account'],
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/account_payment_views.xml',
         'views/account_move_line_views.xml',
     ],
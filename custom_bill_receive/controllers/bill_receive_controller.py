@@ -1,8 +1,11 @@
-from odoo import http, fields
+from odoo import api, http, fields
 from odoo.http import request
 import json
 import logging
-import unicodedata
+
+from ..models.ingestion_lookup import IngestionLookupCache
+from ..tools import normalize_text, normalize_vat, normalizer_cache_stats
+from ..tools.json_stream import iter_chunks, iter_json_array_items
 
 _logger = logging.getLogger(__name__)
 
@@ -23,97 +26,24 @@ class BillReceiveController(http.Controller):
         'publicidad y propaganda': '601.89.01',
         'otros gastos': '601.84.01',
     }
+    STREAM_CHUNK_SIZE = 100
+    NDJSON_COMMIT_EVERY = 50
+    SQL_DELETE_CHUNK_SIZE = 1000
 
-    def _find_existing_tax(self, tax_data, type_tax_use):
-        company = request.env.company
-        tax_name = (tax_data or {}).get('name')
-        tax_amount = float((tax_data or {}).get('amount', 0.0))
-        if not tax_name:
-            raise ValueError("Tax name is required.")
-
-        tax_model = request.env['account.tax'].sudo()
-        domain = [
-            ('amount', '=', tax_amount),
-            ('type_tax_use', '=', type_tax_use),
-        ]
-        if 'company_id' in tax_model._fields:
-            domain.append(('company_id', 'in', [company.id, False]))
-
-        normalized_tax_name = self._normalize_text(tax_name)
-        existing_taxes = tax_model.search(domain)
-        prioritized_taxes = existing_taxes.filtered(
-            lambda tax: not tax.company_id or tax.company_id == company
-        )
-
-        exact_name_with_group_tax = prioritized_taxes.filtered(
-            lambda tax: self._normalize_text(tax.name) == normalized_tax_name
-            and tax.tax_group_id
-            and self._normalize_text(tax.tax_group_id.name) == normalized_tax_name
-        )[:1]
-        if exact_name_with_group_tax:
-            return exact_name_with_group_tax
-
-        exact_name_tax = prioritized_taxes.filtered(
-            lambda tax: self._normalize_text(tax.name) == normalized_tax_name
-        )[:1]
-        if exact_name_tax and 'iva' not in normalized_tax_name:
-            return exact_name_tax
-
-        if 'iva' in normalized_tax_name:
-            iva_tax_with_group = prioritized_taxes.filtered(
-                lambda tax: (
-                    'iva' in self._normalize_text(tax.name)
-                    or (tax.tax_group_id and 'iva' in self._normalize_text(tax.tax_group_id.name))
-                )
-                and tax.tax_group_id
-                and self._normalize_text(tax.tax_group_id.name) == normalized_tax_name
-            )[:1]
-            if iva_tax_with_group:
-                return iva_tax_with_group
-
-            iva_tax = prioritized_taxes.filtered(
-                lambda tax: 'iva' in self._normalize_text(tax.name)
-                or (tax.tax_group_id and 'iva' in self._normalize_text(tax.tax_group_id.name))
-            )[:1]
-            if iva_tax:
-                return iva_tax
-
-        if exact_name_tax:
-            return exact_name_tax
+    def _ingestion_service(self):
+        return request.env['bill.receive.ingestion'].sudo()
 
-        fallback_tax = prioritized_taxes[:1]
-        if fallback_tax:
-            return fallback_tax
-
-        raise ValueError(
-            f"No existing tax found for '{tax_name}' ({tax_amount}%) with use '{type_tax_use}'."
-        )
+    def _find_existing_tax(self, tax_data, type_tax_use):
+        return self._ingestion_service()._find_existing_tax(tax_data, type_tax_use)
 
     def _normalize_text(self, value):
-        text = (value or '').strip().lower()
-        text = ''.join(
-            ch for ch in unicodedata.normalize('NFKD', text)
-            if not unicodedata.combining(ch)
-        )
-        return ' '.join(text.split())
+        return normalize_text(value)
 
     def _normalize_vat(self, vat):
-        raw = (vat or '').strip().upper().replace(' ', '').replace('-', '')
-        if not raw:
-            return raw
-        # Keep explicit country-prefixed VATs untouched.
-        if raw.startswith('MX') and len(raw) > 2:
-            return raw
-        # Mexican RFC without country prefix -> expected by Odoo as MX + RFC.
-        if raw.isalnum() and len(raw) in (12, 13):
-            return f"MX{raw}"
-        if len(raw) >= 2 and raw[:2].isalpha():
-            return raw
-        return raw
+        return normalize_vat(vat)
 
     def _get_mx_country_id(self):
-        country = request.env['res.country'].sudo().search([('code', '=', 'MX')], limit=1)
-        return country.id if country else False
+        return self._ingestion_service()._get_mx_country_id()
 
     def _extract_json_payload(self):
         try:
@@ -123,163 +53,31 @@ class BillReceiveController(http.Controller):
             return {}
 
     def _parse_exchange_rate_value(self, value):
-        if value in (None, '', False):
-            return None
-        try:
-            parsed = float(value)
-        except Exception as err:
-            raise ValueError(f"Invalid exchange_rate '{value}': {err}")
-        if parsed <= 0:
-            raise ValueError("exchange_rate must be greater than 0.")
-        return parsed
-
-    def _resolve_rate_date(self, payload, default_date=None):
-        rate_date = (payload or {}).get('rate_date') or default_date or fields.Date.context_today(request.env.user)
-        return fields.Date.to_date(rate_date)
+        return self._ingestion_service()._parse_exchange_rate_value(value)
 
     def _apply_exchange_rate(self, currency, payload, default_date=None):
-        exchange_rate = self._parse_exchange_rate_value((payload or {}).get('exchange_rate'))
-        if not exchange_rate or not currency:
-            return False
-
-        company = request.env.company
-        company_currency = company.currency_id
-        if not company_currency or currency == company_currency:
-            return False
-
-        rate_date = self._resolve_rate_date(payload, default_date)
-        rate_model = request.env['res.currency.rate'].sudo()
+        return self._ingestion_service()._apply_exchange_rate(currency, payload, default_date=default_date)
 
-        rate_vals = {
-            'name': rate_date,
-            'currency_id': currency.id,
-        }
-        if 'company_id' in rate_model._fields:
-            rate_vals['company_id'] = company.id
-        if 'inverse_company_rate' in rate_model._fields:
-            rate_vals['inverse_company_rate'] = exchange_rate
-        elif 'company_rate' in rate_model._fields:
-            rate_vals['company_rate'] = exchange_rate
-        elif 'rate' in rate_model._fields:
-            rate_vals['rate'] = 1.0 / exchange_rate
-        else:
-            raise ValueError("res.currency.rate does not expose a supported rate field.")
-
-        domain = [
-            ('currency_id', '=', currency.id),
-            ('name', '=', rate_date),
-        ]
-        if 'company_id' in rate_model._fields:
-            domain.append(('company_id', '=', company.id))
-
-        existing_rate = rate_model.search(domain, limit=1)
-        if existing_rate:
-            existing_rate.write(rate_vals)
-        else:
-            rate_model.create(rate_vals)
-
-        _logger.info(
-            "Applied exchange rate %s for currency %s on %s",
-            exchange_rate, currency.name, rate_date,
-        )
-        return True
+    def _payment_service(self):
+        return request.env['bill.receive.payment'].sudo()
 
     def _update_invoice_exchange_rate(self, move, exchange_rate, rate_date=None):
-        exchange_rate = self._parse_exchange_rate_value(exchange_rate)
-        if not exchange_rate or not move or not move.currency_id:
-            return False
-
-        company_currency = request.env.company.currency_id
-        if not company_currency or move.currency_id == company_currency:
-            return False
-
-        # Odoo invoice widgets usually display the inverse rate:
-        # 1 company_currency = X invoice_currency.
-        invoice_rate = 1.0 / exchange_rate
-
-        if 'invoice_currency_rate' in move._fields:
-            try:
-                move.sudo().with_context(check_move_validity=False).write({
-                    'invoice_currency_rate': invoice_rate,
-                })
-                move.invalidate_recordset()
-                _logger.info(
-                    "Updated invoice %s exchange rate to %s using invoice_currency_rate",
-                    move.id, invoice_rate,
-                )
-                return True
-            except Exception as write_err:
-                _logger.info(
-                    "Could not write invoice_currency_rate on move %s: %s. Falling back to currency rate table.",
-                    move.id, write_err,
-                )
-
-        self._apply_exchange_rate(
-            currency=move.currency_id,
-            payload={
-                'exchange_rate': exchange_rate,
-                'rate_date': rate_date or move.invoice_date or fields.Date.context_today(request.env.user),
-            },
-            default_date=rate_date or move.invoice_date,
-        )
-        move.invalidate_recordset()
-        return True
+        return self._payment_service()._update_invoice_exchange_rate(move, exchange_rate, rate_date=rate_date)
 
     def _extract_uuid_value(self, data):
-        value = (
-            (data or {}).get('l10n_mx_edi_cfdi_uuid')
-            or (data or {}).get('uuid')
-            or (data or {}).get('folio_fiscal')
-            or ''
-        )
-        return str(value).strip().upper()
+        return self._ingestion_service()._extract_uuid_value(data)
 
     def _extract_reference_value(self, data):
-        value = (
-            (data or {}).get('name')
-            or (data or {}).get('ref')
-            or (data or {}).get('invoice_name')
-            or ''
-        )
-        return str(value).strip()
+        return self._ingestion_service()._extract_reference_value(data)
 
     def _find_move_by_reference(self, reference, allowed_move_types, allowed_states=None):
-        account_move = request.env['account.move'].sudo()
-        domain = [('move_type', 'in', allowed_move_types), ('ref', '=', reference)]
-        if allowed_states:
-            domain.append(('state', 'in', allowed_states))
-        move = account_move.search(domain, limit=1)
-        return account_move, move
+        return self._ingestion_service()._find_move_by_reference(reference, allowed_move_types, allowed_states)
 
     def _find_move_by_cfdi_uuid(self, uuid, allowed_move_types, allowed_states=None):
-        account_move = request.env['account.move'].sudo()
-        uuid_value = str(uuid or '').strip().upper()
-        if not uuid_value:
-            return account_move, account_move.browse()
-
-        base_domain = [('move_type', 'in', allowed_move_types)]
-        if allowed_states:
-            base_domain.append(('state', 'in', allowed_states))
-
-        uuid_domain = self._build_uuid_domain(account_move, uuid_value)
-        if uuid_domain is None:
-            return account_move, None
-
-        move = account_move.search(base_domain + uuid_domain, limit=1)
-        return account_move, move
+        return self._ingestion_service()._find_move_by_cfdi_uuid(uuid, allowed_move_types, allowed_states)
 
     def _build_uuid_domain(self, account_move, uuid):
-        uuid_filters = []
-        if 'folio_fiscal' in account_move._fields:
-            uuid_filters.append(('folio_fiscal', '=', uuid))
-        if 'l10n_mx_edi_cfdi_uuid' in account_move._fields:
-            uuid_filters.append(('l10n_mx_edi_cfdi_uuid', '=', uuid))
-
-        if not uuid_filters:
-            return None
-        if len(uuid_filters) == 1:
-            return uuid_filters
-        return ['|', uuid_filters[0], uuid_filters[1]]
+        return self._ingestion_service()._build_uuid_domain(account_move, uuid)
 
     def _find_move_by_uuid(self, uuid, allowed_move_types, allowed_states=None):
         account_move = request.env['account.move'].sudo()
@@ -287,11 +85,7 @@ class BillReceiveController(http.Controller):
         if allowed_states:
             domain.append(('state', 'in', allowed_states))
 
-        uuid_domain = self._build_uuid_domain(account_move, uuid)
-        if uuid_domain is None:
-            return account_move, None
-
-        domain += uuid_domain
+        domain += self._build_uuid_domain(account_move, uuid)
         move = account_move.search(domain, limit=1)
         return account_move, move
 
@@ -367,109 +161,10 @@ class BillReceiveController(http.Controller):
         )
 
     def _assign_payment_to_move(self, move, payment, account_internal_group):
-        """Link a posted payment to a move using Odoo's native outstanding-line flow."""
-        expected_account_type = (
-            'asset_receivable' if account_internal_group == 'receivable' else 'liability_payable'
-        )
-
-        move.invalidate_recordset()
-        payment.invalidate_recordset()
-
-        payment_lines = payment.move_id.line_ids.filtered(
-            lambda l: not l.reconciled and l.account_id.internal_group == account_internal_group
-        )
-        if not payment_lines:
-            payment_lines = payment.move_id.line_ids.filtered(
-                lambda l: not l.reconciled and l.account_id.account_type == expected_account_type
-            )
-        if payment_lines and hasattr(move, 'js_assign_outstanding_line'):
-            try:
-                move.js_assign_outstanding_line(payment_lines[:1].id)
-                move.invalidate_recordset()
-                payment.invalidate_recordset()
-                return
-            except Exception as assign_err:
-                _logger.info(
-                    "Native outstanding-line assignment failed for move %s / payment %s: %s. Falling back to direct reconcile.",
-                    move.id, payment.id, assign_err,
-                )
-
-        move_lines = move.line_ids.filtered(
-            lambda l: not l.reconciled and l.account_id.internal_group == account_internal_group
-        )
-        if not move_lines:
-            move_lines = move.line_ids.filtered(
-                lambda l: not l.reconciled and l.account_id.account_type == expected_account_type
-            )
-
-        if not payment_lines:
-            payment_lines = payment.move_id.line_ids.filtered(
-                lambda l: not l.reconciled and l.account_id.id in move_lines.mapped('account_id').ids
-            )
-
-        lines_to_reconcile = move_lines + payment_lines
-        if not lines_to_reconcile:
-            raise ValueError(
-                f"No unreconciled {account_internal_group} lines found for move {move.id} / payment {payment.id}."
-            )
-
-        lines_to_reconcile.reconcile()
-        move.invalidate_recordset()
-        payment.invalidate_recordset()
-
-    def _get_payment_lines_for_assignment(self, payment, account_internal_group, move=None):
-        expected_account_type = (
-            'asset_receivable' if account_internal_group == 'receivable' else 'liability_payable'
-        )
-        payment.invalidate_recordset()
-
-        payment_lines = payment.move_id.line_ids.filtered(
-            lambda l: not l.reconciled and l.account_id.internal_group == account_internal_group
-        )
-        if not payment_lines:
-            payment_lines = payment.move_id.line_ids.filtered(
-                lambda l: not l.reconciled and l.account_id.account_type == expected_account_type
-            )
-        if not payment_lines and move:
-            move_accounts = move.line_ids.mapped('account_id').ids
-            payment_lines = payment.move_id.line_ids.filtered(
-                lambda l: not l.reconciled and l.account_id.id in move_accounts
-            )
-        return payment_lines
+        return self._payment_service()._assign_payment_to_move(move, payment, account_internal_group)
 
     def _reconcile_moves(self, source_move, target_move, account_internal_group):
-        expected_account_type = (
-            'asset_receivable' if account_internal_group == 'receivable' else 'liability_payable'
-        )
-
-        source_move.invalidate_recordset()
-        target_move.invalidate_recordset()
-
-        source_lines = source_move.line_ids.filtered(
-            lambda l: not l.reconciled and l.account_id.internal_group == account_internal_group
-        )
-        if not source_lines:
-            source_lines = source_move.line_ids.filtered(
-                lambda l: not l.reconciled and l.account_id.account_type == expected_account_type
-            )
-
-        target_lines = target_move.line_ids.filtered(
-            lambda l: not l.reconciled and l.account_id.internal_group == account_internal_group
-        )
-        if not target_lines:
-            target_lines = target_move.line_ids.filtered(
-                lambda l: not l.reconciled and l.account_id.account_type == expected_account_type
-            )
-
-        lines_to_reconcile = source_lines + target_lines
-        if not lines_to_reconcile:
-            raise ValueError(
-                f"No unreconciled {account_internal_group} lines found for moves {source_move.id} / {target_move.id}."
-            )
-
-        lines_to_reconcile.reconcile()
-        source_move.invalidate_recordset()
-        target_move.invalidate_recordset()
+        return self._ingestion_service()._reconcile_moves(source_move, target_move, account_internal_group)
 
     def _snapshot_payment_data(self, payment):
         data = {
@@ -598,36 +293,37 @@ class BillReceiveController(http.Controller):
         _logger.info(f"Registered and posted payment {payment.id} for bill {bill.id}")
         return payment
 
-        # Invalidate ORM cache so move_id.line_ids reflects the DB state
-        # written by action_post() rather than the pre-post cached values.
-        payment.invalidate_recordset()
-        bill.invalidate_recordset()
-
-        bill_lines = bill.line_ids.filtered(
-            lambda l: not l.reconciled and l.account_id.id == payable_account_id
-        )
-        # Match by exact account ID first; fall back to account_type.
-        payment_lines = payment.move_id.line_ids.filtered(
-            lambda l: not l.reconciled and l.account_id.id == payable_account_id
-        )
-        if not payment_lines:
-            payment_lines = payment.move_id.line_ids.filtered(
-                lambda l: not l.reconciled and l.account_id.account_type == 'liability_payable'
-            )
+    def _run_idempotent(self, endpoint, handler):
+        """Run ``handler`` once per Idempotency-Key (header or
+        "idempotency_key" param); retries with the same key and body get the
+        stored response back without redoing the work.
 
-        if bill_lines and payment_lines:
-            (bill_lines + payment_lines).reconcile()
-        else:
-            _logger.warning(
-                "Reconciliation skipped for bill %s / payment %s — "
-                "bill_lines=%s payment_lines=%s",
-                bill.id, payment.id, bill_lines.ids, payment_lines.ids,
-            )
-        _logger.info(f"Registered and posted payment {payment.id} for bill {bill.id}")
-        return payment
+        The key and the hashed payload come from the params Odoo already
+        parsed; the raw body is only re-read for a keyed request sent
+        without a JSON-RPC "params" envelope.
+        """
+        params = request.params or {}
+        key = request.httprequest.headers.get('Idempotency-Key') or params.get('idempotency_key')
+        if not key:
+            return handler()
+
+        payload = params or self._extract_json_payload()
+        keys = request.env['bill.receive.idempotency.key'].sudo()
+        stored = keys._replay_or_claim(str(key), endpoint, keys._hash_request(endpoint, payload))
+        if stored is not None:
+            return stored
+        response = handler()
+        keys._store_response(str(key), response)
+        return response
 
     @http.route('/api/receive_bills', type='json', auth='public', methods=['POST'], csrf=False)
     def receive_bills(self, bills=None, **kwargs):
+        return self._run_idempotent(
+            '/api/receive_bills',
+            lambda: self._process_receive_bills(bills=bills, **kwargs),
+        )
+
+    def _process_receive_bills(self, bills=None, **kwargs):
         try:
             if not bills:
                 try:
@@ -641,149 +337,25 @@ class BillReceiveController(http.Controller):
 
             _logger.info(f"Received {len(bills)} bills to process")
 
-            created_bills = []
-            errors = []
-            seen_references = set()
-            for bill_data in bills:
-                try:
-                    with request.env.cr.savepoint():
-                        reference = self._extract_reference_value(bill_data)
-                        if reference:
-                            if reference in seen_references:
-                                errors.append({
-                                    'bill_data': bill_data,
-                                    'error': f"Duplicate reference in request payload: '{reference}'",
-                                })
-                                continue
-
-                            requested_move_type = bill_data.get('move_type')
-                            allowed_move_types = [requested_move_type] if requested_move_type else ['in_invoice', 'in_refund']
-                            _, existing_move = self._find_move_by_reference(
-                                reference=reference,
-                                allowed_move_types=allowed_move_types,
-                            )
-                            if existing_move:
-                                errors.append({
-                                    'bill_data': bill_data,
-                                    'error': f"Duplicate reference already exists on move id={existing_move.id}: '{reference}'",
-                                })
-                                continue
-                            seen_references.add(reference)
-
-                        cfdi_uuid = self._extract_uuid_value(bill_data)
-
-                        raw_vat = (bill_data.get('partner_id') or {}).get('vat', '')
-                        normalized_vat = self._normalize_vat(raw_vat)
-                        partner_name = (bill_data.get('partner_id') or {}).get('name')
-                        mx_country_id = self._get_mx_country_id()
-                        partner_model = request.env['res.partner'].sudo().with_context(no_vat_validation=True)
-
-                        partner = partner_model.search([
-                            ('name', '=', partner_name),
-                            ('vat', 'in', [normalized_vat, raw_vat]),
-                        ], limit=1)
-                        if not partner and partner_name:
-                            partner = partner_model.search([('name', '=', partner_name)], limit=1)
-                        if not partner:
-                            partner_vals = {
-                                'name': partner_name,
-                                'vat': normalized_vat,
-                                'supplier_rank': 1,
-                            }
-                            if mx_country_id:
-                                partner_vals['country_id'] = mx_country_id
-                            partner = partner_model.create(partner_vals)
-                        else:
-                            update_vals = {}
-                            if normalized_vat and partner.vat != normalized_vat:
-                                update_vals['vat'] = normalized_vat
-                            if mx_country_id and not partner.country_id:
-                                update_vals['country_id'] = mx_country_id
-                            if update_vals:
-                                partner_model.browse(partner.id).write(update_vals)
-
-                        currency = None
-                        if 'currency_code' in bill_data:
-                            currency = request.env['res.currency'].sudo().search([
-                                ('name', '=', bill_data['currency_code'])
-                            ], limit=1)
-                            if not currency:
-                                errors.append({'bill_data': bill_data, 'error': f"Currency '{bill_data['currency_code']}' not found."})
-                                continue
-                        else:
-                            currency = request.env['res.currency'].sudo().search([('name', '=', 'USD')], limit=1)
-                            if not currency:
-                                errors.append({'bill_data': bill_data, 'error': "USD currency not found."})
-                                continue
-
-                        invoice_line_ids = []
-                        for line in bill_data['invoice_line_ids']:
-                            product = request.env['product.product'].sudo().search([
-                                ('name', '=', line['name'])
-                            ], limit=1)
-                            if not product:
-                                product = request.env['product.product'].sudo().create({
-                                    'name': line['name'],
-                                    'type': 'service',
-                                })
-
-                            tax_ids = []
-                            for tax in line.get('tax_ids', []):
-                                try:
-                                    resolved_tax = self._find_existing_tax(
-                                        tax_data=tax,
-                                        type_tax_use='purchase',
-                                    )
-                                    tax_ids.append(resolved_tax.id)
-                                except Exception as e:
-                                    errors.append({
-                                        'line_item': line,
-                                        'error': f'Failed to create tax: {str(e)}'
-                                    })
-                                    continue
-
-                            invoice_line_ids.append((0, 0, {
-                                'name': line['name'],
-                                'quantity': line['quantity'],
-                                'price_unit': line['price_unit'],
-                                'account_id': line['account_id'],
-                                'product_id': product.id,
-                                'tax_ids': [(6, 0, tax_ids)]
-                            }))
-
-                        bill_vals = {
-                            'move_type': bill_data['move_type'],
-                            'journal_id': bill_data['journal_id'],
-                            'ref': bill_data.get('name', ''),
-                            'invoice_date': bill_data['invoice_date'],
-                            'invoice_date_due': bill_data.get('invoice_date_due', bill_data['invoice_date']),
-                            'partner_id': partner.id,
-                            'invoice_line_ids': invoice_line_ids,
-                            'l10n_mx_edi_cfdi_uuid': cfdi_uuid,
-                            'currency_id': currency.id
-                        }
-
-                        bill = request.env['account.move'].sudo().create(bill_vals)
-                        self._apply_exchange_rate(
-                            currency=currency,
-                            payload=bill_data,
-                            default_date=bill_data['invoice_date'],
-                        )
-                        bill.action_post()
+            if kwargs.get('async_mode'):
+                job = request.env['bill.ingestion.job'].sudo()._enqueue('bills', bills, kwargs)
+                return {
+                    'success': 'Bills queued',
+                    'job_id': job.id,
+                    'total': job.total_count,
+                }
 
-                        created_bills.append(bill.id)
-                        if cfdi_uuid:
-                            bill.sudo().write({'l10n_mx_edi_cfdi_uuid': cfdi_uuid})
-                        _logger.info(f"Created bill {bill.id} for {partner_name}")
-                except Exception as e:
-                    _logger.error(f"Error processing bill: {str(e)}", exc_info=True)
-                    errors.append({'bill_data': bill_data, 'error': str(e)})
-                    continue
+            service = self._ingestion_service()
+            result = service.ingest_bills(bills, **service._parse_ingestion_options(kwargs))
+            errors = result['errors']
+            if service._parse_error_mode(kwargs) == 'compact':
+                errors = service._compact_errors(bills, errors, 'bill_data')
 
             return {
                 'success': 'Bills processed',
-                'created_bills': created_bills,
-                'errors': errors
+                'created_bills': result['created_bills'],
+                'errors': errors,
+                'lookup_cache': result['lookup_cache'],
             }
         except Exception as e:
             request.env.cr.rollback()
@@ -796,6 +368,12 @@ class BillReceiveController(http.Controller):
 
     @http.route('/api/receive_invoices', type='json', auth='public', methods=['POST'], csrf=False)
     def receive_invoices(self, invoices=None, **kwargs):
+        return self._run_idempotent(
+            '/api/receive_invoices',
+            lambda: self._process_receive_invoices(invoices=invoices, **kwargs),
+        )
+
+    def _process_receive_invoices(self, invoices=None, **kwargs):
         try:
             if not invoices:
                 try:
@@ -809,170 +387,25 @@ class BillReceiveController(http.Controller):
 
             _logger.info(f"Received {len(invoices)} invoices to process")
 
-            created_invoices = []
-            errors = []
-            seen_references = set()
-            for invoice_data in invoices:
-                try:
-                    with request.env.cr.savepoint():
-                        reference = self._extract_reference_value(invoice_data)
-                        if reference:
-                            if reference in seen_references:
-                                errors.append({
-                                    'invoice_data': invoice_data,
-                                    'error': f"Duplicate reference in request payload: '{reference}'",
-                                })
-                                continue
+            if kwargs.get('async_mode'):
+                job = request.env['bill.ingestion.job'].sudo()._enqueue('invoices', invoices, kwargs)
+                return {
+                    'success': 'Invoices queued',
+                    'job_id': job.id,
+                    'total': job.total_count,
+                }
+
+            service = self._ingestion_service()
+            result = service.ingest_invoices(invoices, **service._parse_ingestion_options(kwargs))
+            errors = result['errors']
+            if service._parse_error_mode(kwargs) == 'compact':
+                errors = service._compact_errors(invoices, errors, 'invoice_data')
 
-                            requested_move_type = invoice_data.get('move_type')
-                            allowed_move_types = [requested_move_type] if requested_move_type else ['out_invoice', 'out_refund']
-                            _, existing_move = self._find_move_by_reference(
-                                reference=reference,
-                                allowed_move_types=allowed_move_types,
-                            )
-                            if existing_move:
-                                errors.append({
-                                    'invoice_data': invoice_data,
-                                    'error': f"Duplicate reference already exists on move id={existing_move.id}: '{reference}'",
-                                })
-                                continue
-                            seen_references.add(reference)
-
-                        cfdi_uuid = self._extract_uuid_value(invoice_data)
-
-                        raw_vat = (invoice_data.get('partner_id') or {}).get('vat', '')
-                        normalized_vat = self._normalize_vat(raw_vat)
-                        partner_name = (invoice_data.get('partner_id') or {}).get('name')
-                        mx_country_id = self._get_mx_country_id()
-                        partner_model = request.env['res.partner'].sudo().with_context(no_vat_validation=True)
-
-                        partner = partner_model.search([
-                            ('name', '=', partner_name),
-                            ('vat', 'in', [normalized_vat, raw_vat]),
-                        ], limit=1)
-                        if not partner and partner_name:
-                            partner = partner_model.search([('name', '=', partner_name)], limit=1)
-                        if not partner:
-                            partner_vals = {
-                                'name': partner_name,
-                                'vat': normalized_vat,
-                                'customer_rank': 1,
-                            }
-                            if mx_country_id:
-                                partner_vals['country_id'] = mx_country_id
-                            partner = partner_model.create(partner_vals)
-                        else:
-                            update_vals = {}
-                            if normalized_vat and partner.vat != normalized_vat:
-                                update_vals['vat'] = normalized_vat
-                            if mx_country_id and not partner.country_id:
-                                update_vals['country_id'] = mx_country_id
-                            if update_vals:
-                                partner_model.browse(partner.id).write(update_vals)
-
-                        currency = request.env['res.currency'].sudo().search([
-                            ('name', '=', invoice_data['currency_code'])
-                        ], limit=1)
-                        if not currency:
-                            raise ValueError(f"Currency '{invoice_data['currency_code']}' not found.")
-
-                        invoice_line_ids = []
-                        for line in invoice_data['invoice_line_ids']:
-                            product = request.env['product.product'].sudo().search([
-                                ('name', '=', line['name'])
-                            ], limit=1)
-                            if not product:
-                                product = request.env['product.product'].sudo().create({
-                                    'name': line['name'],
-                                    'type': 'service',
-                                })
-
-                            tax_ids = []
-                            for tax in line.get('tax_ids', []):
-                                resolved_tax = self._find_existing_tax(
-                                    tax_data=tax,
-                                    type_tax_use='sale',
-                                )
-                                tax_ids.append(resolved_tax.id)
-
-                            resolved_account_id = False
-                            requested_account_id = line.get('account_id')
-                            if requested_account_id:
-                                requested_account = request.env['account.account'].sudo().browse(requested_account_id).exists()
-                                if requested_account and requested_account.account_type not in ('asset_receivable', 'liability_payable'):
-                                    resolved_account_id = requested_account.id
-                                else:
-                                    _logger.warning(
-                                        "Invalid account_id %s for invoice line '%s'. "
-                                        "Expected an income/other account, not receivable/payable.",
-                                        requested_account_id, line['name']
-                                    )
-
-                            if not resolved_account_id:
-                                income_account = product.property_account_income_id or product.categ_id.property_account_income_categ_id
-                                if income_account and income_account.account_type not in ('asset_receivable', 'liability_payable'):
-                                    resolved_account_id = income_account.id
-
-                            if not resolved_account_id:
-                                raise ValueError(
-                                    f"No valid income account found for invoice line '{line['name']}'. "
-                                    "Provide a valid income account_id."
-                                )
-
-                            invoice_line_ids.append((0, 0, {
-                                'name': line['name'],
-                                'quantity': line['quantity'],
-                                'price_unit': line['price_unit'],
-                                'account_id': resolved_account_id,
-                                'product_id': product.id,
-                                'tax_ids': [(6, 0, tax_ids)]
-                            }))
-
-                        modo_pago_code = invoice_data.get('modo_pago', '99')
-                        payment_method = request.env['l10n_mx_edi.payment.method'].sudo().search([
-                            ('code', '=', modo_pago_code)
-                        ], limit=1)
-
-                        invoice_vals = {
-                            'move_type': invoice_data['move_type'],
-                            'journal_id': invoice_data['journal_id'],
-                            'ref': invoice_data.get('name', ''),
-                            'l10n_mx_edi_cfdi_uuid': cfdi_uuid,
-                            'invoice_date': invoice_data['invoice_date'],
-                            'invoice_date_due': invoice_data.get('invoice_date_due', invoice_data['invoice_date']),
-                            'partner_id': partner.id,
-                            "l10n_mx_edi_cfdi_to_public": False,
-                            'invoice_line_ids': invoice_line_ids,
-                            'l10n_mx_edi_usage': invoice_data.get('uso_cfdi', 'G03'),
-                            'l10n_mx_edi_payment_method_id': payment_method.id if payment_method else False,
-                            'currency_id': currency.id
-                        }
-                        
-                        if invoice_data.get('invoice_name'):
-                            invoice_vals['name'] = invoice_data['invoice_name']
-
-                        invoice = request.env['account.move'].sudo().create(invoice_vals)
-                        self._apply_exchange_rate(
-                            currency=currency,
-                            payload=invoice_data,
-                            default_date=invoice_data['invoice_date'],
-                        )
-                        invoice.action_post()
-                        created_invoices.append(invoice.id)
-
-                        if cfdi_uuid:
-                            invoice.sudo().write({'l10n_mx_edi_cfdi_uuid': cfdi_uuid})
-
-                        _logger.info(f"Created invoice {invoice.id} for {partner_name}")
-                except Exception as e:
-                    _logger.error(f"Error processing invoice: {str(e)}", exc_info=True)
-                    errors.append({'invoice_data': invoice_data, 'error': str(e)})
-                    continue
- 
             return {
                 'success': 'Invoices processed',
-                'created_invoices': created_invoices,
-                'errors': errors
+                'created_invoices': result['created_invoices'],
+                'errors': errors,
+                'lookup_cache': result['lookup_cache'],
             }
         except Exception as e:
             request.env.cr.rollback()
@@ -982,211 +415,222 @@ class BillReceiveController(http.Controller):
                 'details': str(e)
             }
 
-    @http.route('/api/receive_credit_note', type='json', auth='public', methods=['POST'], csrf=False)
-    def receive_credit_note(self, credit_note=None, **kwargs):
+    @http.route('/api/receive_documents_stream', type='http', auth='public', methods=['POST'], csrf=False)
+    def receive_documents_stream(self, **kwargs):
+        """
+        Ingest very large bill/invoice payloads without loading them in memory.
+
+        The body is the same JSON as /api/receive_bills or /api/receive_invoices
+        (with or without the JSON-RPC envelope); its "bills"/"invoices" array
+        is parsed incrementally and processed chunk_size documents at a time.
+        Options go in the query string: ?chunk_size=100&batch_mode=1&batch_size=50
+        and error_mode=compact to report errors by payload index instead of
+        echoing the failed documents.
+        """
         try:
-            payload = {}
-            if not credit_note:
-                payload = self._extract_json_payload()
-
-            credit_note = credit_note or payload.get('credit_note') or payload
-            if not isinstance(credit_note, dict):
-                return {'error': 'No credit note data received'}
-
-            cfdi_relacionado = str(
-                credit_note.get('cfdirelacionado')
-                or credit_note.get('cfdi_relacionado')
-                or credit_note.get('folio_relacionado')
-                or ''
-            ).strip()
-            if not cfdi_relacionado:
-                return {'error': 'Missing cfdirelacionado'}
-            if not credit_note.get('journal_id'):
-                return {'error': 'Missing journal_id'}
-            if not credit_note.get('invoice_date'):
-                return {'error': 'Missing invoice_date'}
-            if not credit_note.get('invoice_line_ids'):
-                return {'error': 'Missing invoice_line_ids'}
-
-            _, related_bill = self._find_move_by_cfdi_uuid(
-                uuid=cfdi_relacionado,
-                allowed_move_types=['in_invoice'],
-                allowed_states=['posted'],
+            service = self._ingestion_service()
+            options = service._parse_ingestion_options(kwargs)
+            compact_errors = service._parse_error_mode(kwargs) == 'compact'
+            chunk_size = self._parse_limit(kwargs.get('chunk_size'), self.STREAM_CHUNK_SIZE) or self.STREAM_CHUNK_SIZE
+            lookup = IngestionLookupCache(service, request.env)
+
+            items = iter_json_array_items(request.httprequest.stream, ('bills', 'invoices'))
+            kind = None
+            created_ids = []
+            errors = []
+            received = 0
+            for chunk in iter_chunks(items, chunk_size):
+                kind = chunk[0][0]
+                documents = [document for _key, document in chunk]
+                if kind == 'bills':
+                    result = service.ingest_bills(documents, lookup=lookup, **options)
+                    created_ids += result['created_bills']
+                else:
+                    result = service.ingest_invoices(documents, lookup=lookup, **options)
+                    created_ids += result['created_invoices']
+                if compact_errors:
+                    errors = service._merge_compact_errors(errors, service._compact_errors(
+                        documents, result['errors'], 'bill_data' if kind == 'bills' else 'invoice_data',
+                        index_offset=received,
+                    ))
+                else:
+                    errors += result['errors']
+                received += len(documents)
+                _logger.info("Streamed %s %s so far (%s created)", received, kind, len(created_ids))
+
+            if not kind:
+                res = {'error': 'No bills or invoices data received'}
+            else:
+                res = {
+                    'success': f"{kind.capitalize()} processed",
+                    'received': received,
+                    'created_bills' if kind == 'bills' else 'created_invoices': created_ids,
+                    'errors': errors,
+                    'lookup_cache': lookup.stats(),
+                }
+            return request.make_response(json.dumps(res), headers=[("Content-Type", "application/json")])
+        except Exception as e:
+            request.env.cr.rollback()
+            _logger.error("Failed to process streamed documents: %s", str(e), exc_info=True)
+            return request.make_response(
+                json.dumps({'error': 'Failed to process the request', 'details': str(e)}),
+                headers=[("Content-Type", "application/json")],
             )
-            if not related_bill:
-                return {'error': f"Related bill not found for l10n_mx_edi_cfdi_uuid '{cfdi_relacionado}'"}
-
-            reference = self._extract_reference_value(credit_note)
-            if reference:
-                _, existing_move = self._find_move_by_reference(
-                    reference=reference,
-                    allowed_move_types=['out_refund'],
-                )
-                if existing_move:
-                    return {
-                        'error': f"Duplicate reference already exists on move id={existing_move.id}: '{reference}'",
-                    }
-
-            cfdi_uuid = self._extract_uuid_value(credit_note)
 
-            partner_payload = credit_note.get('partner_id') or {}
-            raw_vat = (credit_note.get('partner_id') or {}).get('vat', '')
-            normalized_vat = self._normalize_vat(raw_vat)
-            partner_name = partner_payload.get('name') or related_bill.partner_id.name
-            mx_country_id = self._get_mx_country_id()
-            partner_model = request.env['res.partner'].sudo().with_context(no_vat_validation=True)
+    @http.route('/api/receive_documents_ndjson', type='http', auth='public', methods=['POST'], csrf=False)
+    def receive_documents_ndjson(self, **kwargs):
+        """
+        Ingest newline-delimited JSON (Content-Type: application/x-ndjson).
+
+        Every line is one document with a "kind" of "bill", "invoice" or
+        "credit_note" and the same fields as the matching /api/receive_*
+        endpoint. Lines are processed as they are read and one JSON result
+        line is streamed back per document, followed by a summary line.
+        Results are only sent once their documents are committed, every
+        ?commit_every=50 documents.
+        """
+        commit_every = self._parse_limit(kwargs.get('commit_every'), self.NDJSON_COMMIT_EVERY) or self.NDJSON_COMMIT_EVERY
+        results = self._iter_ndjson_results(
+            registry=request.env.registry,
+            uid=request.env.uid,
+            context=dict(request.env.context),
+            stream=request.httprequest.stream,
+            commit_every=commit_every,
+        )
+        return request.make_response(results, headers=[("Content-Type", "application/x-ndjson")])
+
+    def _iter_ndjson_results(self, registry, uid, context, stream, commit_every):
+        # The response body is consumed after the request cursor is closed,
+        # so documents are ingested on a cursor owned by this generator.
+        summary = {'received': 0, 'created': 0, 'failed': 0}
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            service = env['bill.receive.ingestion'].sudo()
+            lookup = IngestionLookupCache(service, env)
+            pending = []
+            try:
+                for line_number, raw_line in enumerate(iter(stream.readline, b''), start=1):
+                    if not raw_line.strip():
+                        continue
+                    summary['received'] += 1
+                    try:
+                        document = json.loads(raw_line)
+                        if not isinstance(document, dict):
+                            raise ValueError('Each line must be a JSON object')
+                        result = service.ingest_document(document, lookup=lookup)
+                    except Exception as e:
+                        _logger.error("Failed to ingest NDJSON line %s: %s", line_number, str(e), exc_info=True)
+                        result = {'status': 'error', 'error': str(e)}
+
+                    summary['created' if result['status'] == 'created' else 'failed'] += 1
+                    pending.append(json.dumps(dict(line=line_number, **result)) + '\n')
+                    if len(pending) >= commit_every:
+                        cr.commit()
+                        yield ''.join(pending).encode()
+                        pending = []
+
+                cr.commit()
+                summary['lookup_cache'] = lookup.stats()
+                pending.append(json.dumps({'summary': summary}) + '\n')
+                yield ''.join(pending).encode()
+            except Exception as e:
+                cr.rollback()
+                _logger.error("Failed to process NDJSON documents: %s", str(e), exc_info=True)
+                yield (json.dumps({
+                    'error': 'Failed to process the request',
+                    'details': str(e),
+                    'summary': summary,
+                }) + '\n').encode()
+
+    @http.route('/api/ingestion_job_status', type='json', auth='public', methods=['POST'], csrf=False)
+    def ingestion_job_status(self, job_id=None, **kwargs):
+        try:
+            payload = {}
+            if not job_id:
+                payload = self._extract_json_payload()
 
-            if not partner_payload:
-                partner = related_bill.partner_id
-            else:
-                partner = partner_model.search([
-                    ('name', '=', partner_name),
-                    ('vat', 'in', [normalized_vat, raw_vat]),
-                ], limit=1)
-                if not partner and partner_name:
-                    partner = partner_model.search([('name', '=', partner_name)], limit=1)
-            if not partner:
-                partner_vals = {
-                    'name': partner_name,
-                    'vat': normalized_vat,
-                    'customer_rank': 1,
-                }
-                if mx_country_id:
-                    partner_vals['country_id'] = mx_country_id
-                partner = partner_model.create(partner_vals)
-            else:
-                update_vals = {}
-                if normalized_vat and partner.vat != normalized_vat:
-                    update_vals['vat'] = normalized_vat
-                if mx_country_id and not partner.country_id:
-                    update_vals['country_id'] = mx_country_id
-                if update_vals:
-                    partner_model.browse(partner.id).write(update_vals)
-
-            currency_code = credit_note.get('currency_code') or related_bill.currency_id.name
-            currency = request.env['res.currency'].sudo().search([
-                ('name', '=', currency_code)
-            ], limit=1)
-            if not currency:
-                return {'error': f"Currency '{currency_code}' not found."}
-
-            invoice_line_ids = []
-            for line in credit_note.get('invoice_line_ids', []):
-                product = request.env['product.product'].sudo().search([
-                    ('name', '=', line['name'])
-                ], limit=1)
-                if not product:
-                    product = request.env['product.product'].sudo().create({
-                        'name': line['name'],
-                        'type': 'service',
-                    })
+            job_id = job_id or payload.get('job_id')
+            if not job_id:
+                return {'error': 'Missing job_id'}
 
-                tax_ids = []
-                for tax in line.get('tax_ids', []):
-                    resolved_tax = self._find_existing_tax(
-                        tax_data=tax,
-                        type_tax_use='sale',
-                    )
-                    tax_ids.append(resolved_tax.id)
-
-                resolved_account_id = False
-                requested_account_id = line.get('account_id')
-                if requested_account_id:
-                    requested_account = request.env['account.account'].sudo().browse(requested_account_id).exists()
-                    if requested_account and requested_account.account_type not in ('asset_receivable', 'liability_payable'):
-                        resolved_account_id = requested_account.id
-                    else:
-                        _logger.warning(
-                            "Invalid account_id %s for credit note line '%s'. "
-                            "Expected an income/other account, not receivable/payable.",
-                            requested_account_id, line['name']
-                        )
+            job = request.env['bill.ingestion.job'].sudo().browse(int(job_id)).exists()
+            if not job:
+                return {'error': f"Ingestion job not found (id={job_id})"}
+            return job._get_status()
+        except Exception as e:
+            _logger.error("Failed to read ingestion job status: %s", str(e), exc_info=True)
+            return {
+                'error': 'Failed to read ingestion job status',
+                'details': str(e)
+            }
 
-                if not resolved_account_id:
-                    income_account = product.property_account_income_id or product.categ_id.property_account_income_categ_id
-                    if income_account and income_account.account_type not in ('asset_receivable', 'liability_payable'):
-                        resolved_account_id = income_account.id
+    @http.route('/api/lookup_documents', type='json', auth='public', methods=['POST'], csrf=False)
+    def lookup_documents(self, uuids=None, refs=None, move_types=None, **kwargs):
+        """
+        Resolve many documents in one call.
+        Payload:
+          {
+            "uuids": ["<cfdi_uuid>", ...],
+            "refs": ["<ref>", ...],
+            "move_types": ["in_invoice", ...]   # optional
+          }
+        """
+        try:
+            payload = {}
+            if not uuids and not refs:
+                payload = self._extract_json_payload()
 
-                if not resolved_account_id:
-                    raise ValueError(
-                        f"No valid income account found for credit note line '{line['name']}'. "
-                        "Provide a valid income account_id."
-                    )
+            uuids = uuids or payload.get('uuids') or []
+            refs = refs or payload.get('refs') or []
+            move_types = move_types or payload.get('move_types')
+            if not uuids and not refs:
+                return {'error': 'Missing uuids or refs'}
+            if not isinstance(uuids, list) or not isinstance(refs, list):
+                return {'error': 'uuids and refs must be lists'}
 
-                invoice_line_ids.append((0, 0, {
-                    'name': line['name'],
-                    'quantity': line['quantity'],
-                    'price_unit': line['price_unit'],
-                    'account_id': resolved_account_id,
-                    'product_id': product.id,
-                    'tax_ids': [(6, 0, tax_ids)],
-                }))
-
-            if not invoice_line_ids:
-                return {'error': 'Missing invoice_line_ids'}
-
-            modo_pago_code = credit_note.get('modo_pago', '99')
-            payment_method = request.env['l10n_mx_edi.payment.method'].sudo().search([
-                ('code', '=', modo_pago_code)
-            ], limit=1)
-
-            credit_note_vals = {
-                'move_type': 'in_refund',
-                'journal_id': credit_note['journal_id'],
-                'ref': credit_note.get('name', ''),
-                'l10n_mx_edi_cfdi_uuid': cfdi_uuid,
-                'invoice_date': credit_note['invoice_date'],
-                'invoice_date_due': credit_note.get('invoice_date_due', credit_note['invoice_date']),
-                'partner_id': partner.id,
-                'invoice_line_ids': invoice_line_ids,
-                'currency_id': currency.id,
-                'l10n_mx_edi_usage': credit_note.get('uso_cfdi', 'G03'),
-                'l10n_mx_edi_payment_method_id': payment_method.id if payment_method else False,
+            result = self._ingestion_service().lookup_documents(uuids=uuids, refs=refs, move_types=move_types)
+            return {
+                'success': 'Documents resolved',
+                'summary': {
+                    'requested_uuids': len(uuids),
+                    'requested_refs': len(refs),
+                    'found_uuids': len(result['uuids']),
+                    'found_refs': len(result['refs']),
+                },
+                **result,
+            }
+        except Exception as e:
+            _logger.error("Failed to lookup documents: %s", str(e), exc_info=True)
+            return {
+                'error': 'Failed to lookup documents',
+                'details': str(e)
             }
-            if 'l10n_mx_edi_cfdi_to_public' in request.env['account.move']._fields:
-                credit_note_vals['l10n_mx_edi_cfdi_to_public'] = False
-
-            related_uuid = ''
-            if 'l10n_mx_edi_cfdi_uuid' in related_bill._fields:
-                related_uuid = (related_bill.l10n_mx_edi_cfdi_uuid or '').strip()
-            if not related_uuid and 'folio_fiscal' in related_bill._fields:
-                related_uuid = (related_bill.folio_fiscal or '').strip()
-            if related_uuid and 'l10n_mx_edi_origin' in request.env['account.move']._fields:
-                credit_note_vals['l10n_mx_edi_origin'] = "%s|%s" % (
-                    credit_note.get('tipo_relacion', '01'),
-                    related_uuid,
-                )
 
-            if credit_note.get('invoice_name'):
-                credit_note_vals['name'] = credit_note['invoice_name']
+    @http.route('/api/normalizer_cache_stats', type='json', auth='public', methods=['POST'], csrf=False)
+    def get_normalizer_cache_stats(self, **kwargs):
+        return {
+            'success': 'Normalizer cache stats',
+            'stats': normalizer_cache_stats(),
+        }
 
-            credit_move = request.env['account.move'].sudo().create(credit_note_vals)
-            self._apply_exchange_rate(
-                currency=currency,
-                payload=credit_note,
-                default_date=credit_note['invoice_date'],
-            )
-            credit_move.action_post()
-            self._reconcile_moves(credit_move, related_bill, 'payable')
+    @http.route('/api/receive_credit_note', type='json', auth='public', methods=['POST'], csrf=False)
+    def receive_credit_note(self, credit_note=None, **kwargs):
+        return self._run_idempotent(
+            '/api/receive_credit_note',
+            lambda: self._process_receive_credit_note(credit_note=credit_note, **kwargs),
+        )
 
-            if cfdi_uuid:
-                credit_move.sudo().write({'l10n_mx_edi_cfdi_uuid': cfdi_uuid})
+    def _process_receive_credit_note(self, credit_note=None, **kwargs):
+        try:
+            payload = {}
+            if not credit_note:
+                payload = self._extract_json_payload()
 
-            _logger.info(
-                "Created vendor credit note %s and applied it to bill %s using CFDI related UUID %s",
-                credit_move.id, related_bill.id, cfdi_relacionado,
-            )
-            return {
-                'success': 'Credit note created and applied',
-                'credit_note_id': credit_move.id,
-                'credit_note_name': credit_move.name,
-                'credit_note_ref': credit_move.ref,
-                'related_bill_id': related_bill.id,
-                'related_bill_name': related_bill.name,
-                'cfdirelacionado': cfdi_relacionado,
-                'amount_total': credit_move.amount_total,
-                'amount_residual': credit_move.amount_residual,
-            }
+            credit_note = credit_note or payload.get('credit_note') or payload
+            if not isinstance(credit_note, dict):
+                return {'error': 'No credit note data received'}
+
+            return self._ingestion_service().ingest_credit_note(credit_note)
         except Exception as e:
             request.env.cr.rollback()
             _logger.error("Failed to create credit note: %s", str(e), exc_info=True)
@@ -1197,6 +641,12 @@ class BillReceiveController(http.Controller):
 
     @http.route('/api/register_invoice_payment', type='json', auth='public', methods=['POST'], csrf=False)
     def register_invoice_payment(self, uuid=None, payment_data=None, **kwargs):
+        return self._run_idempotent(
+            '/api/register_invoice_payment',
+            lambda: self._process_register_invoice_payment(uuid=uuid, payment_data=payment_data, **kwargs),
+        )
+
+    def _process_register_invoice_payment(self, uuid=None, payment_data=None, **kwargs):
         try:
             payload = {}
             if not uuid or not payment_data:
@@ -1217,8 +667,6 @@ class BillReceiveController(http.Controller):
                 allowed_move_types=['out_invoice', 'out_refund'],
                 allowed_states=['posted'],
             )
-            if invoice is None:
-                return {'error': 'No UUID field available on account.move (expected folio_fiscal or l10n_mx_edi_cfdi_uuid).'}
             if not invoice:
                 return {'error': f"Invoice not found for UUID '{uuid}'"}
 
@@ -1309,6 +757,12 @@ class BillReceiveController(http.Controller):
             }
           }
         """
+        return self._run_idempotent(
+            '/api/register_bill_payment',
+            lambda: self._process_register_bill_payment(uuid=uuid, payment_data=payment_data, **kwargs),
+        )
+
+    def _process_register_bill_payment(self, uuid=None, payment_data=None, **kwargs):
         try:
             payload = {}
             if not uuid or not payment_data:
@@ -1329,8 +783,6 @@ class BillReceiveController(http.Controller):
                 allowed_move_types=['in_invoice', 'in_refund'],
                 allowed_states=['posted'],
             )
-            if bill is None:
-                return {'error': 'No UUID field available on account.move (expected folio_fiscal or l10n_mx_edi_cfdi_uuid).'}
             if not bill:
                 return {'error': f"Bill not found for UUID '{uuid}'"}
 
@@ -1399,8 +851,123 @@ class BillReceiveController(http.Controller):
                 'details': str(e)
             }
 
+    @http.route('/api/register_bill_payments', type='json', auth='public', methods=['POST'], csrf=False)
+    def register_bill_payments(self, payments=None, **kwargs):
+        """
+        Register many vendor bill payments in one call.
+        Payload:
+          {
+            "payments": [
+              {"uuid": "<cfdi_uuid>", "payment_data": {...}},   # same as /api/register_bill_payment
+              ...
+            ]
+          }
+        """
+        return self._run_idempotent(
+            '/api/register_bill_payments',
+            lambda: self._process_register_payments('bill', payments),
+        )
+
+    @http.route('/api/register_invoice_payments', type='json', auth='public', methods=['POST'], csrf=False)
+    def register_invoice_payments(self, payments=None, **kwargs):
+        """
+        Register many customer invoice payments in one call; items take the
+        same {"uuid", "payment_data"} as /api/register_invoice_payment.
+        """
+        return self._run_idempotent(
+            '/api/register_invoice_payments',
+            lambda: self._process_register_payments('invoice', payments),
+        )
+
+    def _process_register_payments(self, kind, payments=None):
+        try:
+            if not payments:
+                payments = self._extract_json_payload().get('payments')
+            if not payments or not isinstance(payments, list):
+                return {'error': 'Missing payments list'}
+
+            results = self._payment_service().register_payments(kind, payments)
+            created = sum(1 for result in results if result['status'] == 'created')
+            return {
+                'success': 'Payments processed',
+                'summary': {
+                    'total': len(results),
+                    'created': created,
+                    'failed': len(results) - created,
+                },
+                'results': results,
+            }
+        except Exception as e:
+            request.env.cr.rollback()
+            _logger.error("Failed to register %s payments: %s", kind, str(e), exc_info=True)
+            return {
+                'error': 'Failed to register payments',
+                'details': str(e)
+            }
+
+    @http.route('/api/rerate_invoices', type='json', auth='public', methods=['POST'], csrf=False)
+    def rerate_invoices(self, invoices=None, **kwargs):
+        return self._run_idempotent(
+            '/api/rerate_invoices',
+            lambda: self._process_rerate_invoices(invoices=invoices, **kwargs),
+        )
+
+    def _process_rerate_invoices(self, invoices=None, **kwargs):
+        """
+        Re-rate many posted customer invoices in one pass (e.g. month-end
+        revaluation).
+        Payload:
+          {
+            "invoices": [
+              {"uuid": "<cfdi_uuid>", "exchange_rate": 17.25, "rate_date": "YYYY-MM-DD"},
+              ...
+            ]
+          }
+        """
+        try:
+            if not invoices:
+                invoices = self._extract_json_payload().get('invoices')
+            if not invoices or not isinstance(invoices, list):
+                return {'error': 'Missing invoices list'}
+
+            payment_service = self._payment_service()
+            items = [item for item in invoices if isinstance(item, dict)]
+            uuids = [str(item.get('uuid') or '').strip().upper() for item in items]
+            moves_by_uuid = payment_service._resolve_moves_by_uuid(uuids, ['out_invoice', 'out_refund'])
+            not_found = [uuid for uuid in uuids if uuid not in moves_by_uuid]
+
+            result = payment_service.rerate_invoices([
+                (moves_by_uuid[uuid], item.get('exchange_rate'), item.get('rate_date'))
+                for uuid, item in zip(uuids, items) if uuid in moves_by_uuid
+            ])
+            return {
+                'success': 'Invoices re-rated',
+                'summary': {
+                    'total': len(invoices),
+                    'updated': len(result['updated']) + len(result['rate_table']),
+                    'unchanged': len(result['unchanged']),
+                    'skipped': len(result['skipped']),
+                    'not_found': len(not_found),
+                },
+                'not_found': not_found,
+                **result,
+            }
+        except Exception as e:
+            request.env.cr.rollback()
+            _logger.error("Failed to re-rate invoices: %s", str(e), exc_info=True)
+            return {
+                'error': 'Failed to re-rate invoices',
+                'details': str(e)
+            }
+
     @http.route('/api/register_unpaid_bills_payments', type='json', auth='public', methods=['POST'], csrf=False)
     def register_unpaid_bills_payments(self, **kwargs):
+        return self._run_idempotent(
+            '/api/register_unpaid_bills_payments',
+            lambda: self._process_register_unpaid_bills_payments(**kwargs),
+        )
+
+    def _process_register_unpaid_bills_payments(self, **kwargs):
         """
         Bulk-register payments for all posted vendor bills that have no payment
         linked yet (amount_residual == amount_total, i.e. fully unpaid).
@@ -1410,8 +977,14 @@ class BillReceiveController(http.Controller):
           {
             "journal_id": <int>,          # required: bank/cash journal to pay from
             "currency_code": "MXN",       # optional, defaults to each bill's currency
-            "limit": 200                  # optional safety cap (default 200)
+            "limit": 200,                 # optional safety cap (default 200)
+            "cursor": "<next_cursor>",    # optional, resume after a previous call
+            "async_mode": true,           # optional, drain the backlog in a background run
+            "max_bills": 100000           # optional cap for async runs (default: no cap)
           }
+        Pass the returned next_cursor back to continue with the following
+        bills; failed bills are not selected again. In async_mode, limit is
+        the per-chunk size and progress is read from /api/payment_run_status.
         """
         try:
             payload = self._extract_json_payload()
@@ -1437,66 +1010,30 @@ class BillReceiveController(http.Controller):
                 if not override_currency:
                     return {'error': f"Currency '{currency_code}' not found."}
 
-            # Find posted bills that are fully unpaid (amount_residual > 0 and equals amount_total)
-            unpaid_bills = request.env['account.move'].sudo().search([
-                ('move_type', 'in', ['in_invoice', 'in_refund']),
-                ('state', '=', 'posted'),
-                ('payment_state', 'in', ['not_paid', 'partial']),
-            ], limit=limit, order='invoice_date asc, id asc')
+            cursor = payload.get('cursor')
+            if payload.get('async_mode'):
+                run = request.env['bill.payment.run'].sudo()._enqueue(
+                    journal=pay_journal,
+                    currency=override_currency,
+                    rate_payload=payload,
+                    chunk_size=limit,
+                    max_bills=self._parse_limit(payload.get('max_bills'), 0),
+                    cursor=cursor,
+                )
+                return {
+                    'success': 'Bill payment run queued',
+                    'run_id': run.id,
+                }
 
-            results = []
-            errors = []
+            # Find posted bills that are not fully paid, resuming after the cursor
+            unpaid_bills = self._payment_service()._search_unpaid_bills(limit, cursor=cursor)
 
-            for bill in unpaid_bills:
-                try:
-                    with request.env.cr.savepoint():
-                        currency = override_currency or bill.currency_id
-
-                        payable_line = bill.line_ids.filtered(
-                            lambda l: l.account_id.account_type == 'liability_payable'
-                        )[:1]
-                        if not payable_line:
-                            errors.append({'bill_id': bill.id, 'ref': bill.ref, 'error': 'No payable line found'})
-                            continue
-
-                        amount = bill.amount_residual
-                        if amount <= 0:
-                            errors.append({'bill_id': bill.id, 'ref': bill.ref, 'error': 'No residual amount to pay'})
-                            continue
-
-                        payment_date = str(bill.invoice_date) if bill.invoice_date else fields.Date.context_today(request.env.user)
-
-                        payment = request.env['account.payment'].sudo().create({
-                            'payment_type': 'outbound',
-                            'partner_type': 'supplier',
-                            'partner_id': bill.partner_id.id,
-                            'amount': amount,
-                            'date': payment_date,
-                            'journal_id': pay_journal.id,
-                            'currency_id': currency.id,
-                            'payment_method_line_id': pay_method_line.id,
-                            'destination_account_id': payable_line.account_id.id,
-                        })
-                        self._apply_exchange_rate(
-                            currency=currency,
-                            payload=payload,
-                            default_date=payment_date,
-                        )
-                        payment.action_post()
-                        self._assign_payment_to_move(bill, payment, 'payable')
-
-                        _logger.info("Bulk payment %s registered for bill %s (%s)", payment.id, bill.id, bill.ref)
-                        results.append({
-                            'bill_id': bill.id,
-                            'ref': bill.ref,
-                            'payment_id': payment.id,
-                            'amount': amount,
-                            'payment_date': payment_date,
-                        })
-                except Exception as e:
-                    _logger.error("Failed to pay bill %s: %s", bill.id, str(e), exc_info=True)
-                    errors.append({'bill_id': bill.id, 'ref': bill.ref, 'error': str(e)})
-                    continue
+            results, errors = self._payment_service().pay_unpaid_bills(
+                journal=pay_journal,
+                bills=unpaid_bills,
+                override_currency=override_currency,
+                rate_payload=payload,
+            )
 
             return {
                 'success': 'Bulk bill payment completed',
@@ -1507,6 +1044,10 @@ class BillReceiveController(http.Controller):
                 },
                 'paid': results,
                 'errors': errors,
+                'next_cursor': (
+                    self._payment_service()._encode_unpaid_cursor(unpaid_bills[-1])
+                    if len(unpaid_bills) == limit else False
+                ),
             }
         except Exception as e:
             request.env.cr.rollback()
@@ -1516,8 +1057,36 @@ class BillReceiveController(http.Controller):
                 'details': str(e)
             }
 
+    @http.route('/api/payment_run_status', type='json', auth='public', methods=['POST'], csrf=False)
+    def payment_run_status(self, run_id=None, **kwargs):
+        try:
+            payload = {}
+            if not run_id:
+                payload = self._extract_json_payload()
+
+            run_id = run_id or payload.get('run_id')
+            if not run_id:
+                return {'error': 'Missing run_id'}
+
+            run = request.env['bill.payment.run'].sudo().browse(int(run_id)).exists()
+            if not run:
+                return {'error': f"Payment run not found (id={run_id})"}
+            return run._get_status()
+        except Exception as e:
+            _logger.error("Failed to read payment run status: %s", str(e), exc_info=True)
+            return {
+                'error': 'Failed to read payment run status',
+                'details': str(e)
+            }
+
     @http.route('/api/delete_document_by_uuid', type='json', auth='public', methods=['POST'], csrf=False)
     def delete_document_by_uuid(self, uuid=None, document_type=None, **kwargs):
+        return self._run_idempotent(
+            '/api/delete_document_by_uuid',
+            lambda: self._process_delete_document_by_uuid(uuid=uuid, document_type=document_type, **kwargs),
+        )
+
+    def _process_delete_document_by_uuid(self, uuid=None, document_type=None, **kwargs):
         try:
             payload = {}
             if not uuid or not document_type:
@@ -1541,8 +1110,6 @@ class BillReceiveController(http.Controller):
                 allowed_move_types=move_type_by_doc[document_type],
                 allowed_states=['draft', 'posted'],
             )
-            if move is None:
-                return {'error': 'No UUID field available on account.move (expected folio_fiscal or l10n_mx_edi_cfdi_uuid).'}
             if not move:
                 return {'error': f"No {document_type} found for UUID '{uuid}'"}
 
@@ -1653,6 +1220,43 @@ class BillReceiveController(http.Controller):
                 'details': str(e)
             }
 
+    @http.route('/api/delete_documents_by_uuid', type='json', auth='public', methods=['POST'], csrf=False)
+    def delete_documents_by_uuid(self, uuids=None, document_type=None, **kwargs):
+        return self._run_idempotent(
+            '/api/delete_documents_by_uuid',
+            lambda: self._process_delete_documents_by_uuid(uuids=uuids, document_type=document_type, **kwargs),
+        )
+
+    def _process_delete_documents_by_uuid(self, uuids=None, document_type=None, **kwargs):
+        """Bulk variant of /api/delete_document_by_uuid for thousands of UUIDs."""
+        try:
+            payload = {}
+            if uuids is None or not document_type:
+                payload = self._extract_json_payload()
+
+            uuids = uuids if uuids is not None else payload.get('uuids')
+            document_type = (document_type or payload.get('document_type') or payload.get('type') or '').strip().lower()
+
+            if not isinstance(uuids, list) or not uuids:
+                return {'error': "Missing 'uuids' list"}
+            if document_type not in ('invoice', 'bill'):
+                return {'error': "Invalid type. Expected 'invoice' or 'bill'."}
+
+            result = request.env['bill.receive.deletion'].sudo().delete_documents_by_uuid(uuids, document_type)
+            return {
+                'success': f"{document_type.capitalize()}s and related payments deleted",
+                'summary': result['summary'],
+                'deleted': result['deleted'],
+                'errors': result['errors'],
+            }
+        except Exception as e:
+            request.env.cr.rollback()
+            _logger.error("Failed to bulk delete documents by UUID: %s", str(e), exc_info=True)
+            return {
+                'error': 'Failed to delete documents',
+                'details': str(e)
+            }
+
      # ---------- helpers ----------
     
     
@@ -1683,6 +1287,10 @@ class BillReceiveController(http.Controller):
             return None
         return parsed if parsed > 0 else None
 
+    def _split_ids(self, ids, size):
+        for start in range(0, len(ids), size):
+            yield ids[start:start + size]
+
     def _is_db_cursor_closed_error(self, err):
         msg = str(err or "").lower()
         return "cursor already closed" in msg or "connection already closed" in msg
@@ -1698,6 +1306,15 @@ class BillReceiveController(http.Controller):
 
     @http.route('/api/register_payroll_payment', type='json', auth='public', methods=['POST'], csrf=False)
     def register_payroll_payment(self, journal_id=None, amount=None, payment_date=None, reference=None, partner_id=None, partner_name=None, **kwargs):
+        return self._run_idempotent(
+            '/api/register_payroll_payment',
+            lambda: self._process_register_payroll_payment(
+                journal_id=journal_id, amount=amount, payment_date=payment_date,
+                reference=reference, partner_id=partner_id, partner_name=partner_name, **kwargs
+            ),
+        )
+
+    def _process_register_payroll_payment(self, journal_id=None, amount=None, payment_date=None, reference=None, partner_id=None, partner_name=None, **kwargs):
         try:
             payload = self._extract_json_payload()
 
@@ -1796,15 +1413,27 @@ class BillReceiveController(http.Controller):
 
     @http.route('/api/delete_all_bills_and_payments', type='json', auth='public', methods=['POST'], csrf=False)
     def delete_all_bills_and_payments(self, limit=None, limit_payments=None, limit_bills=None, **kwargs):
+        return self._run_idempotent(
+            '/api/delete_all_bills_and_payments',
+            lambda: self._process_delete_all_bills_and_payments(limit=limit, limit_payments=limit_payments, limit_bills=limit_bills, **kwargs),
+        )
+
+    def _process_delete_all_bills_and_payments(self, limit=None, limit_payments=None, limit_bills=None, **kwargs):
         try:
             payload = self._extract_payload_any()
 
             common_limit = self._parse_limit(limit, payload.get("limit"))
             payments_limit = self._parse_limit(limit_payments, payload.get("limit_payments")) or common_limit
             bills_limit = self._parse_limit(limit_bills, payload.get("limit_bills")) or common_limit
+            # Opt-in: the SQL fast path drops reconciliations without the
+            # exchange-difference reversals and ORM unlink checks.
+            fast_path = str(payload.get("fast_path", False)).strip().lower() in ("true", "1", "yes")
+            chunk_size = self._parse_limit(payload.get("chunk_size"), self.SQL_DELETE_CHUNK_SIZE) or self.SQL_DELETE_CHUNK_SIZE
+            dry_run = str(payload.get("dry_run", False)).strip().lower() in ("true", "1", "yes")
 
             Move = request.env["account.move"].sudo()
             Payment = request.env["account.payment"].sudo()
+            deletion = request.env["bill.receive.deletion"].sudo()
 
             # --- pick records ---
             payment_ids = Payment.search([], limit=payments_limit).ids
@@ -1813,10 +1442,27 @@ class BillReceiveController(http.Controller):
             total_payments = len(payment_ids)
             total_bills = len(bill_ids)
 
+            if dry_run:
+                estimate = deletion.estimate_deletion(
+                    payment_ids=payment_ids,
+                    move_ids=bill_ids,
+                    mode="sql" if fast_path else "orm",
+                )
+                return {
+                    "success": "Dry run: nothing was deleted",
+                    "summary": {
+                        "requested_limits": {"limit": common_limit, "limit_payments": payments_limit, "limit_bills": bills_limit},
+                        "payments": {"found": total_payments},
+                        "bills": {"found": total_bills},
+                    },
+                    **estimate,
+                }
+
             deleted_payments = 0
             deleted_payment_moves = 0
             deleted_bills = 0
             sql_deleted_payments = 0
+            failed_sql_chunks = 0
 
             errors = []
             fatal_db_error = None
@@ -1837,33 +1483,88 @@ class BillReceiveController(http.Controller):
                 if used_sql_fallback and not Payment.browse(pid).exists():
                     sql_deleted_payments += 1
 
-            # --- delete payments first ---
-            for pid in payment_ids:
-                try:
-                    with request.env.cr.savepoint():
-                        p = Payment.browse(pid).exists()
-                        if not p:
-                            continue
-                        self._delete_payment_record(p)
-                    deleted_payments += 1
-
-                except Exception as err:
-                    # Fallback for any payment-specific ORM constraint we cannot cleanly bypass.
-                    msg = str(err or "")
-                    if not self._is_db_cursor_closed_error(err):
-                        try:
-                            with request.env.cr.savepoint():
-                                _hard_delete_payment(pid)
-                            deleted_payments += 1
-                            continue
-                        except Exception as hard_err:
-                            errors.append({"model": "account.payment", "id": pid, "error": f"hard-delete failed: {hard_err}"})
+            # --- ORM path, per id: the default without fast_path and the
+            # fallback for chunks the SQL fast path could not delete ---
+            def _delete_payments_orm(pids):
+                nonlocal deleted_payments, fatal_db_error
+                for pid in pids:
+                    try:
+                        with request.env.cr.savepoint():
+                            p = Payment.browse(pid).exists()
+                            if not p:
+                                continue
+                            self._delete_payment_record(p)
+                        deleted_payments += 1
+
+                    except Exception as err:
+                        # Fallback for any payment-specific ORM constraint we cannot cleanly bypass.
+                        msg = str(err or "")
+                        if not self._is_db_cursor_closed_error(err):
+                            try:
+                                with request.env.cr.savepoint():
+                                    _hard_delete_payment(pid)
+                                deleted_payments += 1
+                                continue
+                            except Exception as hard_err:
+                                errors.append({"model": "account.payment", "id": pid, "error": f"hard-delete failed: {hard_err}"})
+                        else:
+                            errors.append({"model": "account.payment", "id": pid, "error": msg})
+
+                        if self._is_db_cursor_closed_error(err):
+                            fatal_db_error = msg
+                            return
+
+            def _delete_bills_orm(ids):
+                nonlocal deleted_bills, fatal_db_error
+                for bill_id in ids:
+                    try:
+                        with request.env.cr.savepoint():
+                            b = Move.browse(bill_id).exists().with_context(
+                                force_delete=True,
+                                check_move_validity=False,
+                            )
+                            if not b:
+                                continue
+                            if b.line_ids:
+                                b.line_ids.remove_move_reconcile()
+                            b.unlink()
+                        deleted_bills += 1
+                    except Exception as err:
+                        errors.append({"model": "account.move", "id": bill_id, "error": str(err)})
+                        if self._is_db_cursor_closed_error(err):
+                            fatal_db_error = str(err)
+                            return
+
+            # --- SQL fast path: one ANY(%s) delete per chunk of ids ---
+            def _run_chunked(ids, sql_delete, orm_delete, model_name):
+                nonlocal failed_sql_chunks, fatal_db_error
+                for chunk in self._split_ids(ids, chunk_size):
+                    try:
+                        with request.env.cr.savepoint():
+                            counts = sql_delete(chunk)
+                    except Exception as err:
+                        if self._is_db_cursor_closed_error(err):
+                            fatal_db_error = str(err)
+                            return
+                        failed_sql_chunks += 1
+                        _logger.warning(
+                            "SQL delete of %s %s ids failed (%s); falling back to the ORM path.",
+                            len(chunk), model_name, err,
+                        )
+                        orm_delete(chunk)
                     else:
-                        errors.append({"model": "account.payment", "id": pid, "error": msg})
+                        yield counts
+                    if fatal_db_error:
+                        return
 
-                    if self._is_db_cursor_closed_error(err):
-                        fatal_db_error = msg
-                        break
+            # --- delete payments first ---
+            if fast_path:
+                for counts in _run_chunked(payment_ids, deletion.delete_payments_sql, _delete_payments_orm, "account.payment"):
+                    deleted_payments += counts["payments"]
+                    sql_deleted_payments += counts["payments"]
+                    deleted_payment_moves += counts["moves"]
+            else:
+                _delete_payments_orm(payment_ids)
 
             if fatal_db_error:
                 return {
@@ -1880,24 +1581,11 @@ class BillReceiveController(http.Controller):
                 }
 
             # --- delete bills ---
-            for bill_id in bill_ids:
-                try:
-                    with request.env.cr.savepoint():
-                        b = Move.browse(bill_id).exists().with_context(
-                            force_delete=True,
-                            check_move_validity=False,
-                        )
-                        if not b:
-                            continue
-                        if b.line_ids:
-                            b.line_ids.remove_move_reconcile()
-                        b.unlink()
-                    deleted_bills += 1
-                except Exception as err:
-                    errors.append({"model": "account.move", "id": bill_id, "error": str(err)})
-                    if self._is_db_cursor_closed_error(err):
-                        fatal_db_error = str(err)
-                        break
+            if fast_path:
+                for counts in _run_chunked(bill_ids, deletion.delete_moves_sql, _delete_bills_orm, "account.move"):
+                    deleted_bills += counts["moves"]
+            else:
+                _delete_bills_orm(bill_ids)
 
             _logger.info(
                 "Bulk delete finished. payments=%s/%s (sql=%s) payment_moves_deleted=%s bills=%s/%s errors=%s",
@@ -1909,6 +1597,7 @@ class BillReceiveController(http.Controller):
                 "success": "Bulk deletion completed",
                 "summary": {
                     "requested_limits": {"limit": common_limit, "limit_payments": payments_limit, "limit_bills": bills_limit},
+                    "fast_path": {"enabled": fast_path, "chunk_size": chunk_size, "failed_chunks": failed_sql_chunks},
                     "payments": {"found": total_payments, "deleted": deleted_payments, "sql_deleted": sql_deleted_payments},
                     "payment_moves_deleted": deleted_payment_moves,
                     "bills": {"found": total_bills, "deleted": deleted_bills},
@@ -1949,6 +1638,12 @@ class BillReceiveController(http.Controller):
         
     @http.route('/api/change_bill_account_by_uuid', type='json', auth='public', methods=['POST'], csrf=False)
     def change_bill_account_by_uuid(self, uuid=None, account=None, category=None, **kwargs):
+        return self._run_idempotent(
+            '/api/change_bill_account_by_uuid',
+            lambda: self._process_change_bill_account_by_uuid(uuid=uuid, account=account, category=category, **kwargs),
+        )
+
+    def _process_change_bill_account_by_uuid(self, uuid=None, account=None, category=None, **kwargs):
         try:
             payload = {}
             if not uuid or (not account and not category):
@@ -1969,8 +1664,6 @@ class BillReceiveController(http.Controller):
                 allowed_move_types=['in_invoice', 'in_refund'],
                 allowed_states=['draft', 'posted'],
             )
-            if bill is None:
-                return {'error': 'No UUID field available on account.move (expected folio_fiscal or l10n_mx_edi_cfdi_uuid).'}
             if not bill:
                 return {'error': f"Bill not found for UUID '{uuid}'"}
 
@@ -2130,6 +1823,7 @@ class PaymentPurgeController(http.Controller):
         DEV/TEST ONLY
         Deletes payments purely via SQL to bypass ORM validations.
         Optionally deletes linked journal entries (moves) + move lines + reconciliations.
+        With dry_run, only reports per-table row counts and an estimated run time.
         """
         try:
             payload = self._extract_payload_any()
@@ -2151,6 +1845,14 @@ class PaymentPurgeController(http.Controller):
                 res = {"success": "No payments found", "summary": {"picked": 0, "deleted_payments": 0}}
                 return request.make_response(json.dumps(res), headers=[("Content-Type", "application/json")])
 
+            if str(payload.get("dry_run", False)).strip().lower() in ("true", "1", "yes"):
+                estimate = request.env["bill.receive.deletion"].sudo().estimate_deletion(
+                    payment_ids=payment_ids,
+                    include_payment_moves=bool(delete_moves),
+                )
+                res = {"success": "Dry run: nothing was deleted", "summary": {"picked": len(payment_ids)}, **estimate}
+                return request.make_response(json.dumps(res), headers=[("Content-Type", "application/json")])
+
             # 2) fetch move_ids for those payments
             cr.execute(
                 "SELECT id, move_id FROM account_payment WHERE id = ANY(%s)",
@@ -2223,3 +1925,73 @@ class PaymentPurgeController(http.Controller):
                 json.dumps({"error": "purge_payments_sql failed", "details": str(e)}),
                 headers=[("Content-Type", "application/json")]
             )
+
+    def _json_response(self, data):
+        return request.make_response(json.dumps(data), headers=[("Content-Type", "application/json")])
+
+    @http.route('/api/purge_job_start', type='http', auth='public', methods=['POST'], csrf=False)
+    def purge_job_start(self, **kwargs):
+        """
+        DEV/TEST ONLY
+        Queue a background purge that deletes payments and/or vendor bills in
+        chunks, committing after each chunk and throttled to
+        max_rows_per_second. Progress is read from /api/purge_job_status.
+        """
+        try:
+            payload = self._extract_payload_any()
+            target = (payload.get("target") or "all").strip().lower()
+            if target not in ("payments", "bills", "all"):
+                return self._json_response({"error": "Invalid target. Expected 'payments', 'bills' or 'all'."})
+
+            job = request.env["bill.purge.job"].sudo()._enqueue(
+                target=target,
+                chunk_size=self._parse_limit(payload.get("chunk_size")),
+                max_rows_per_second=self._parse_limit(payload.get("max_rows_per_second")),
+                max_records=self._parse_limit(payload.get("limit")),
+            )
+            return self._json_response({"success": "Purge job queued", **job._get_status()})
+        except Exception as e:
+            try:
+                request.env.cr.rollback()
+            except Exception:
+                pass
+            _logger.error("purge_job_start failed: %s", str(e), exc_info=True)
+            return self._json_response({"error": "purge_job_start failed", "details": str(e)})
+
+    @http.route('/api/purge_job_status', type='http', auth='public', methods=['POST'], csrf=False)
+    def purge_job_status(self, **kwargs):
+        try:
+            payload = self._extract_payload_any()
+            job_id = self._parse_limit(payload.get("job_id"))
+            if not job_id:
+                return self._json_response({"error": "Missing job_id"})
+            job = request.env["bill.purge.job"].sudo().browse(job_id).exists()
+            if not job:
+                return self._json_response({"error": f"Purge job not found (id={job_id})"})
+            return self._json_response(job._get_status())
+        except Exception as e:
+            _logger.error("purge_job_status failed: %s", str(e), exc_info=True)
+            return self._json_response({"error": "purge_job_status failed", "details": str(e)})
+
+    @http.route('/api/purge_job_resume', type='http', auth='public', methods=['POST'], csrf=False)
+    def purge_job_resume(self, **kwargs):
+        """Requeue a failed purge job from its last committed chunk."""
+        try:
+            payload = self._extract_payload_any()
+            job_id = self._parse_limit(payload.get("job_id"))
+            if not job_id:
+                return self._json_response({"error": "Missing job_id"})
+            job = request.env["bill.purge.job"].sudo().browse(job_id).exists()
+            if not job:
+                return self._json_response({"error": f"Purge job not found (id={job_id})"})
+            if job.state != "failed":
+                return self._json_response({"error": f"Purge job {job_id} is {job.state}; only failed jobs can be resumed."})
+            job._resume()
+            return self._json_response({"success": "Purge job resumed", **job._get_status()})
+        except Exception as e:
+            try:
+                request.env.cr.rollback()
+            except Exception:
+                pass
+            _logger.error("purge_job_resume failed: %s", str(e), exc_info=True)
+            return self._json_response({"error": "purge_job_resume failed", "details": str(e)})
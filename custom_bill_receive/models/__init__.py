@@ -1,6 +1,16 @@
 from . import bill_receive
 from . import account_payment
 from . import account_move_line
+from . import bill_receive_ingestion
+from . import bill_ingestion_entity_key
+from . import bill_ingestion_job
+from . import bill_receive_idempotency_key
+from . import bill_receive_reconciliation
+from . import bill_receive_payment
+from . import bill_receive_deletion
+from . import bill_payment_run
+from . import bill_purge_job
+from . import res_currency_rate
 from odoo import models, fields
 
 class BillReceive(models.Model):
@@ -1,6 +1,6 @@
 import logging
 
-from odoo import _, models
+from odoo import _, api, models
 
 
 _logger = logging.getLogger(__name__)
@@ -9,6 +9,8 @@ _logger = logging.getLogger(__name__)
 class AccountPayment(models.Model):
     _inherit = "account.payment"
 
+    UNLINKED_PAGE_SIZE = 1000
+
     def _run_debug_query(self, query, params=()):
         cr = self.env.cr
         with cr.savepoint():
@@ -155,24 +157,80 @@ class AccountPayment(models.Model):
             lambda move: move.move_type in ("in_invoice", "in_refund")
         )
 
-    def action_delete_all_unlinked_bill_payments(self):
-        """Search all unlinked outbound vendor bill payments and delete them."""
-        domain = [('payment_type', '=', 'outbound')]
+    @api.model
+    def _search_unlinked_bill_payment_ids(self, limit=None, after_id=0):
+        """Ids of outbound supplier payments not reconciled with any vendor
+        bill, in id order after ``after_id``, found with one anti-join."""
+        self.env.flush_all()
+        conditions = ["pay.payment_type = 'outbound'", "pay.id > %(after_id)s"]
         if 'partner_type' in self._fields:
-            domain.append(('partner_type', '=', 'supplier'))
-        if 'is_internal_transfer' in self._fields:
-            domain.append(('is_internal_transfer', '=', False))
+            conditions.append("pay.partner_type = 'supplier'")
+        if 'is_internal_transfer' in self._fields and self._fields['is_internal_transfer'].store:
+            conditions.append("NOT COALESCE(pay.is_internal_transfer, FALSE)")
+        self.env.cr.execute(
+            """
+            SELECT pay.id
+              FROM account_payment pay
+             WHERE %s
+               AND NOT EXISTS (
+                    SELECT 1
+                      FROM account_move_line payment_line
+                      JOIN account_partial_reconcile apr
+                        ON payment_line.id IN (apr.debit_move_id, apr.credit_move_id)
+                      JOIN account_move_line counterpart_line
+                        ON counterpart_line.id = CASE WHEN apr.debit_move_id = payment_line.id
+                                                      THEN apr.credit_move_id ELSE apr.debit_move_id END
+                      JOIN account_move move
+                        ON move.id = counterpart_line.move_id
+                     WHERE payment_line.move_id = pay.move_id
+                       AND move.move_type IN ('in_invoice', 'in_refund')
+               )
+             ORDER BY pay.id
+             LIMIT %%(limit)s
+            """ % " AND ".join(conditions),
+            {'after_id': after_id or 0, 'limit': limit},
+        )
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _iter_unlinked_bill_payment_pages(self, page_size=None):
+        """Yield pages of unlinked bill payment ids, keyed on the last id."""
+        page_size = page_size or self.UNLINKED_PAGE_SIZE
+        after_id = 0
+        while True:
+            page = self._search_unlinked_bill_payment_ids(limit=page_size, after_id=after_id)
+            if not page:
+                return
+            yield page
+            after_id = page[-1]
 
-        candidates = self.env['account.payment'].sudo().search(domain)
-        unlinked = candidates.filtered(lambda p: p._is_unlinked_bill_payment())
+    def action_delete_all_unlinked_bill_payments(self):
+        """Find all unlinked outbound vendor bill payments in SQL and delete
+        them page by page."""
+        payment_model = self.env['account.payment'].sudo()
+        if self.env.context.get('dry_run'):
+            unlinked_ids = [
+                payment_id for page in payment_model._iter_unlinked_bill_payment_pages() for payment_id in page
+            ]
+            _logger.info("action_delete_all_unlinked_bill_payments: %s unlinked (dry run)", len(unlinked_ids))
+            return self._notify_unlinked_purge_estimate(payment_model.browse(unlinked_ids))
+
+        found = 0
+        deleted_count = 0
+        skipped = []
+        for page in payment_model._iter_unlinked_bill_payment_pages():
+            found += len(page)
+            page_deleted, page_skipped = payment_model.browse(page)._delete_unlinked_bill_payments()
+            deleted_count += page_deleted
+            skipped += page_skipped
 
         _logger.info(
-            "action_delete_all_unlinked_bill_payments: found %s candidates, %s unlinked",
-            len(candidates),
-            len(unlinked),
+            "action_delete_all_unlinked_bill_payments: found %s unlinked, deleted %s",
+            found,
+            deleted_count,
         )
 
-        if not unlinked:
+        if not found:
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
@@ -184,9 +242,45 @@ class AccountPayment(models.Model):
                 },
             }
 
-        return unlinked.action_delete_unlinked_bill_payments()
+        return self._notify_unlinked_delete_result(deleted_count, found, skipped)
+
+    def _notify_unlinked_purge_estimate(self, payments):
+        estimate = self.env['bill.receive.deletion'].sudo().estimate_deletion(
+            payment_ids=payments.ids,
+            mode='orm',
+        )
+        _logger.info("action_delete_all_unlinked_bill_payments dry run: %s", estimate)
+        counts = estimate['row_counts']
+        message = _(
+            "Dry run, nothing was deleted. %(payments)s payment(s), %(moves)s journal entries, "
+            "%(lines)s journal items, %(partials)s partial and %(fulls)s full reconciliation(s) "
+            "would be deleted. Estimated time: %(seconds)s s."
+        ) % {
+            "payments": counts['account_payment'],
+            "moves": counts['account_move'],
+            "lines": counts['account_move_line'],
+            "partials": counts['account_partial_reconcile'],
+            "fulls": counts['account_full_reconcile'],
+            "seconds": estimate['estimated_seconds'],
+        }
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Bill Payments Cleanup'),
+                'message': message,
+                'type': 'info',
+                'sticky': True,
+            },
+        }
 
     def action_delete_unlinked_bill_payments(self):
+        found = len(self.exists())
+        deleted_count, skipped = self._delete_unlinked_bill_payments()
+        return self._notify_unlinked_delete_result(deleted_count, found, skipped)
+
+    def _delete_unlinked_bill_payments(self):
+        """Delete the payments in ``self``; returns ``(deleted_count, skipped)``."""
         payments_to_delete = self.exists()
 
         deleted_count = 0
@@ -309,11 +403,14 @@ class AccountPayment(models.Model):
                 )
                 skipped.append("%s (%s)" % (payment_name, err))
 
+        return deleted_count, skipped
+
+    def _notify_unlinked_delete_result(self, deleted_count, found, skipped):
         message = _(
             "Deleted %(deleted)s selected payment(s) out of %(found)s."
         ) % {
             "deleted": deleted_count,
-            "found": len(payments_to_delete),
+            "found": found,
         }
         if skipped:
             message = _(
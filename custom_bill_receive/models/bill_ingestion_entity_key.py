@@ -0,0 +1,30 @@
+from odoo import fields, models
+
+
+class BillIngestionEntityKey(models.Model):
+    _name = 'bill.ingestion.entity.key'
+    _description = 'Bill Ingestion Entity Creation Key'
+
+    kind = fields.Char(string='Kind', required=True)
+    key = fields.Char(string='Key', required=True)
+
+    _sql_constraints = [
+        (
+            'unique_kind_key',
+            'unique(kind, key)',
+            'This partner/product is already being created by another ingestion worker.',
+        ),
+    ]
+
+    def _purge_stale_keys(self, max_age_minutes=10):
+        """Drop keys older than any running chunk transaction.
+
+        Once the transaction that inserted a key has finished, every new
+        snapshot sees the record it protected, so the key is no longer needed.
+        """
+        self.env.cr.execute(
+            "DELETE FROM bill_ingestion_entity_key "
+            "WHERE create_date < (now() at time zone 'UTC') - make_interval(mins => %s)",
+            (max_age_minutes,),
+        )
+        return self.env.cr.rowcount
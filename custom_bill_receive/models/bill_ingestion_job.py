@@ -0,0 +1,359 @@
+import json
+import logging
+import threading
+import time
+
+from odoo import api, fields, models
+
+from .bill_receive_ingestion import IngestionConflict
+
+_logger = logging.getLogger(__name__)
+
+
+class BillIngestionJob(models.Model):
+    _name = 'bill.ingestion.job'
+    _description = 'Bill Ingestion Job'
+    _order = 'id desc'
+
+    DEFAULT_CHUNK_SIZE = 100
+    CRON_TIME_BUDGET = 240
+    RESULT_KEYS = {
+        'bills': 'created_bills',
+        'invoices': 'created_invoices',
+    }
+
+    kind = fields.Selection(
+        selection=[
+            ('bills', 'Bills'),
+            ('invoices', 'Invoices'),
+        ],
+        string='Document Kind',
+        required=True,
+    )
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        string='Status',
+        default='pending',
+        required=True,
+        index=True,
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        default=lambda self: self.env.company,
+    )
+    options = fields.Text(string='Options', help='JSON ingestion options (batch_mode, batch_size, error_mode).')
+    chunk_size = fields.Integer(string='Chunk Size', default=DEFAULT_CHUNK_SIZE)
+    total_count = fields.Integer(string='Total Documents')
+    chunk_ids = fields.One2many('bill.ingestion.job.chunk', 'job_id', string='Chunks')
+    last_error = fields.Text(string='Last Error')
+    started_at = fields.Datetime(string='Started At')
+    finished_at = fields.Datetime(string='Finished At')
+
+    @api.model
+    def _enqueue(self, kind, documents, options=None):
+        options = options or {}
+        try:
+            chunk_size = int(options.get('chunk_size') or 0)
+        except (TypeError, ValueError):
+            chunk_size = 0
+        chunk_size = chunk_size if chunk_size > 0 else self.DEFAULT_CHUNK_SIZE
+        service = self.env['bill.receive.ingestion']
+
+        chunk_vals = []
+        for sequence, start in enumerate(range(0, len(documents), chunk_size)):
+            chunk_documents = documents[start:start + chunk_size]
+            chunk_vals.append((0, 0, {
+                'sequence': sequence,
+                'payload': json.dumps(chunk_documents),
+                'document_count': len(chunk_documents),
+            }))
+
+        job = self.create({
+            'kind': kind,
+            'options': json.dumps(dict(
+                service._parse_ingestion_options(options),
+                error_mode=service._parse_error_mode(options),
+            )),
+            'chunk_size': chunk_size,
+            'total_count': len(documents),
+            'chunk_ids': chunk_vals,
+        })
+        self._trigger_worker_cron()
+        _logger.info("Queued ingestion job %s with %s %s in %s chunks", job.id, job.total_count, kind, len(chunk_vals))
+        return job
+
+    @api.model
+    def _trigger_worker_cron(self):
+        cron = self.env.ref('custom_bill_receive.ir_cron_process_ingestion_jobs', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    def _get_status(self):
+        self.ensure_one()
+        created_ids = []
+        errors = []
+        processed_count = 0
+        failed_chunks = 0
+        failed_indexes = set()
+        failed_in_chunks = 0
+        # Kept apart from the merge so each failed chunk stays its own entry.
+        chunk_errors = []
+        service = self.env['bill.receive.ingestion']
+        compact_errors = json.loads(self.options or '{}').get('error_mode') == 'compact'
+        for chunk in self.chunk_ids.sorted('sequence'):
+            if chunk.state == 'pending':
+                continue
+            processed_count += chunk.document_count
+            created_ids += json.loads(chunk.created_ids or '[]')
+            if compact_errors:
+                errors = service._merge_compact_errors(errors, json.loads(chunk.error_log or '[]'))
+            else:
+                errors += json.loads(chunk.error_log or '[]')
+            failed_indexes.update(json.loads(chunk.failed_indexes or '[]'))
+            if chunk.state == 'failed':
+                failed_chunks += 1
+                failed_in_chunks += chunk.document_count
+                if compact_errors:
+                    chunk_errors.append({
+                        'code': 'chunk_failed',
+                        'message': chunk.last_error,
+                        'count': chunk.document_count,
+                        'chunk': chunk.sequence,
+                        'documents': [],
+                    })
+                else:
+                    errors.append({'chunk': chunk.sequence, 'error': chunk.last_error})
+        errors += chunk_errors
+
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'progress': {
+                'total': self.total_count,
+                'processed': processed_count,
+                'created': len(created_ids),
+                'failed': len(failed_indexes) + failed_in_chunks,
+                'chunks': len(self.chunk_ids),
+                'failed_chunks': failed_chunks,
+            },
+            self.RESULT_KEYS[self.kind]: created_ids,
+            'errors': errors,
+            'last_error': self.last_error or False,
+            'started_at': str(self.started_at) if self.started_at else False,
+            'finished_at': str(self.finished_at) if self.finished_at else False,
+        }
+
+    @api.model
+    def _run_ingestion_worker(self, deadline):
+        """Claim and process pending chunks until none are left or time is up.
+
+        Every chunk runs in its own transaction: the claim query locks the
+        chunk row with ``FOR UPDATE SKIP LOCKED`` so concurrent workers never
+        pick the same chunk, and the commit releases it.
+        """
+        chunk_model = self.env['bill.ingestion.job.chunk']
+        processed = 0
+        while time.monotonic() < deadline:
+            chunk = chunk_model._claim_next_chunk()
+            if not chunk:
+                self.env.cr.rollback()
+                break
+            try:
+                chunk._process_claimed()
+                self.env.cr.commit()
+                processed += 1
+            except IngestionConflict as conflict:
+                self.env.cr.rollback()
+                _logger.info("Ingestion chunk %s hit a concurrent creation, retrying: %s", chunk.id, conflict)
+            except Exception as err:
+                # Leaving the chunk pending would make every later run claim
+                # and crash on it again, starving the jobs queued after it.
+                self.env.cr.rollback()
+                _logger.error("Ingestion chunk %s crashed the worker: %s", chunk.id, err, exc_info=True)
+                chunk.write({
+                    'state': 'failed',
+                    'last_error': str(err),
+                    'processed_at': fields.Datetime.now(),
+                })
+                self.env.cr.commit()
+        return processed
+
+    @api.model
+    def _ingestion_worker_thread(self, registry, uid, context, deadline):
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            try:
+                env['bill.ingestion.job']._run_ingestion_worker(deadline)
+            except Exception as err:
+                _logger.error("Ingestion worker thread failed: %s", err, exc_info=True)
+
+    @api.model
+    def _update_job_states(self):
+        now = fields.Datetime.now()
+        for job in self.search([('state', 'in', ('pending', 'running'))]):
+            chunk_states = set(job.chunk_ids.mapped('state'))
+            if 'pending' not in chunk_states:
+                failed_chunks = job.chunk_ids.filtered(lambda chunk: chunk.state == 'failed')
+                job.write({
+                    'state': 'failed' if failed_chunks and len(failed_chunks) == len(job.chunk_ids) else 'done',
+                    'last_error': failed_chunks[-1:].last_error or job.last_error,
+                    'started_at': job.started_at or now,
+                    'finished_at': now,
+                })
+            elif job.state == 'pending' and chunk_states & {'done', 'failed'}:
+                job.write({
+                    'state': 'running',
+                    'started_at': now,
+                })
+
+    @api.model
+    def _cron_process_ingestion_jobs(self, workers=None, time_budget=None):
+        """Process queued chunks with ``workers`` threads, each on its own cursor.
+
+        Several cron records (or Odoo cron workers) may run this method at the
+        same time; chunk claiming keeps them on disjoint chunks.
+        """
+        if workers is None:
+            workers = int(self.env['ir.config_parameter'].sudo().get_param(
+                'custom_bill_receive.ingestion_workers', 1
+            ) or 1)
+        deadline = time.monotonic() + (time_budget or self.CRON_TIME_BUDGET)
+
+        self.env['bill.ingestion.entity.key']._purge_stale_keys()
+        self.env.cr.commit()
+
+        if workers <= 1:
+            self._run_ingestion_worker(deadline)
+        else:
+            threads = [
+                threading.Thread(
+                    target=self._ingestion_worker_thread,
+                    args=(self.env.registry, self.env.uid, dict(self.env.context), deadline),
+                    name=f'bill_ingestion_worker_{index}',
+                    daemon=True,
+                )
+                for index in range(workers)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        try:
+            self._update_job_states()
+            self.env.cr.commit()
+        except Exception as err:
+            self.env.cr.rollback()
+            _logger.warning("Could not update ingestion job states: %s", err)
+
+        if self.env['bill.ingestion.job.chunk'].search_count([('state', '=', 'pending')]):
+            self._trigger_worker_cron()
+
+
+class BillIngestionJobChunk(models.Model):
+    _name = 'bill.ingestion.job.chunk'
+    _description = 'Bill Ingestion Job Chunk'
+    _order = 'job_id, sequence'
+
+    job_id = fields.Many2one(
+        'bill.ingestion.job',
+        string='Job',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    sequence = fields.Integer(string='Sequence', required=True)
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        string='Status',
+        default='pending',
+        required=True,
+        index=True,
+    )
+    payload = fields.Text(string='Payload', required=True, help='JSON list of the documents in this chunk.')
+    document_count = fields.Integer(string='Documents')
+    created_ids = fields.Text(string='Created Move IDs', default='[]')
+    error_log = fields.Text(string='Errors', default='[]')
+    failed_indexes = fields.Text(
+        string='Failed Document Indexes',
+        default='[]',
+        help='JSON list of the job-wide payload indexes of documents with at least one error.',
+    )
+    last_error = fields.Text(string='Last Error')
+    processed_at = fields.Datetime(string='Processed At')
+
+    @api.model
+    def _claim_next_chunk(self):
+        self.env.cr.execute(
+            """
+            SELECT chunk.id
+            FROM bill_ingestion_job_chunk chunk
+            JOIN bill_ingestion_job job ON job.id = chunk.job_id
+            WHERE chunk.state = 'pending'
+              AND job.state IN ('pending', 'running')
+            ORDER BY chunk.job_id, chunk.sequence
+            LIMIT 1
+            FOR UPDATE OF chunk SKIP LOCKED
+            """
+        )
+        row = self.env.cr.fetchone()
+        return self.browse(row[0]) if row else self.browse()
+
+    def _process_claimed(self):
+        """Ingest the documents of a chunk locked by :meth:`_claim_next_chunk`."""
+        self.ensure_one()
+        job = self.job_id
+        documents = json.loads(self.payload or '[]')
+        options = json.loads(job.options or '{}')
+        error_mode = options.pop('error_mode', 'full')
+        service = self.env['bill.receive.ingestion'].sudo().with_company(job.company_id).with_context(
+            ingestion_job_worker=True,
+        )
+        data_key = 'bill_data' if job.kind == 'bills' else 'invoice_data'
+        index_offset = self.sequence * job.chunk_size
+        try:
+            with self.env.cr.savepoint():
+                if job.kind == 'bills':
+                    result = service.ingest_bills(documents, **options)
+                else:
+                    result = service.ingest_invoices(documents, **options)
+                errors = result['errors']
+                # Several line-item errors can belong to one document; count
+                # each failed document once.
+                failed_indexes = sorted({
+                    index + index_offset
+                    for index in service._error_document_indexes(documents, errors, data_key)
+                    if index is not None
+                })
+                if error_mode == 'compact':
+                    errors = service._compact_errors(documents, errors, data_key, index_offset=index_offset)
+        except IngestionConflict:
+            raise
+        except Exception as err:
+            _logger.error("Ingestion chunk %s of job %s failed: %s", self.id, job.id, err, exc_info=True)
+            self.write({
+                'state': 'failed',
+                'last_error': str(err),
+                'processed_at': fields.Datetime.now(),
+            })
+            return
+
+        self.write({
+            'state': 'done',
+            'created_ids': json.dumps(result[job.RESULT_KEYS[job.kind]]),
+            'error_log': json.dumps(errors),
+            'failed_indexes': json.dumps(failed_indexes),
+            'processed_at': fields.Datetime.now(),
+        })
@@ -0,0 +1,164 @@
+import json
+import logging
+import time
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class BillPaymentRun(models.Model):
+    _name = 'bill.payment.run'
+    _description = 'Unpaid Bill Payment Run'
+    _order = 'id desc'
+
+    DEFAULT_CHUNK_SIZE = 200
+    CRON_TIME_BUDGET = 240
+    # Only the most recent errors are kept; failed_count has the full total.
+    MAX_STORED_ERRORS = 500
+
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        string='Status',
+        default='pending',
+        required=True,
+        index=True,
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        default=lambda self: self.env.company,
+    )
+    journal_id = fields.Many2one('account.journal', string='Payment Journal', required=True)
+    currency_id = fields.Many2one('res.currency', string='Payment Currency')
+    rate_payload = fields.Text(string='Rate Payload', help='JSON exchange_rate/rate_date applied to the payments.')
+    chunk_size = fields.Integer(string='Chunk Size', default=DEFAULT_CHUNK_SIZE)
+    max_bills = fields.Integer(string='Max Bills', help='Stop after this many bills; 0 drains the whole backlog.')
+    cursor = fields.Char(string='Cursor', help='Continuation token of the last processed bill.')
+    processed_count = fields.Integer(string='Processed Bills')
+    paid_count = fields.Integer(string='Paid Bills')
+    failed_count = fields.Integer(string='Failed Bills')
+    error_log = fields.Text(string='Errors', default='[]')
+    last_error = fields.Text(string='Last Error')
+    started_at = fields.Datetime(string='Started At')
+    finished_at = fields.Datetime(string='Finished At')
+
+    @api.model
+    def _enqueue(self, journal, currency=None, rate_payload=None, chunk_size=None, max_bills=0, cursor=None):
+        run = self.create({
+            'journal_id': journal.id,
+            'currency_id': currency.id if currency else False,
+            'rate_payload': json.dumps({
+                key: rate_payload[key] for key in ('exchange_rate', 'rate_date') if (rate_payload or {}).get(key)
+            }),
+            'chunk_size': chunk_size or self.DEFAULT_CHUNK_SIZE,
+            'max_bills': max_bills or 0,
+            'cursor': cursor or False,
+        })
+        self._trigger_run_cron()
+        _logger.info("Queued unpaid bill payment run %s on journal %s", run.id, journal.id)
+        return run
+
+    @api.model
+    def _trigger_run_cron(self):
+        cron = self.env.ref('custom_bill_receive.ir_cron_process_payment_runs', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    def _get_status(self):
+        self.ensure_one()
+        errors = json.loads(self.error_log or '[]')
+        return {
+            'run_id': self.id,
+            'state': self.state,
+            'progress': {
+                'processed': self.processed_count,
+                'paid': self.paid_count,
+                'failed': self.failed_count,
+                'max_bills': self.max_bills,
+            },
+            'next_cursor': self.cursor or False,
+            'errors': errors,
+            'errors_omitted': max(self.failed_count - len(errors), 0),
+            'last_error': self.last_error or False,
+            'started_at': str(self.started_at) if self.started_at else False,
+            'finished_at': str(self.finished_at) if self.finished_at else False,
+        }
+
+    def _lock_for_processing(self):
+        self.env.cr.execute(
+            "SELECT id FROM bill_payment_run WHERE id = %s AND state IN ('pending', 'running') "
+            "FOR UPDATE SKIP LOCKED",
+            (self.id,),
+        )
+        return bool(self.env.cr.fetchone())
+
+    def _process_chunk(self):
+        """Pay the next chunk after the stored cursor and advance it.
+
+        Returns False once the backlog (or ``max_bills``) is exhausted.
+        """
+        self.ensure_one()
+        service = self.env['bill.receive.payment'].sudo().with_company(self.company_id)
+        limit = self.chunk_size or self.DEFAULT_CHUNK_SIZE
+        if self.max_bills:
+            limit = min(limit, self.max_bills - self.processed_count)
+        bills = service._search_unpaid_bills(limit, cursor=self.cursor) if limit > 0 else self.env['account.move']
+        if not bills:
+            self.write({'state': 'done', 'finished_at': fields.Datetime.now()})
+            return False
+
+        paid, errors = service.pay_unpaid_bills(
+            journal=self.journal_id,
+            bills=bills,
+            override_currency=self.currency_id,
+            rate_payload=json.loads(self.rate_payload or '{}'),
+        )
+        vals = {
+            'state': 'running',
+            'started_at': self.started_at or fields.Datetime.now(),
+            'cursor': service._encode_unpaid_cursor(bills[-1]),
+            'processed_count': self.processed_count + len(bills),
+            'paid_count': self.paid_count + len(paid),
+            'failed_count': self.failed_count + len(errors),
+        }
+        if errors:
+            stored_errors = json.loads(self.error_log or '[]') + errors
+            vals['error_log'] = json.dumps(stored_errors[-self.MAX_STORED_ERRORS:])
+        self.write(vals)
+        return True
+
+    @api.model
+    def _cron_process_payment_runs(self, time_budget=None):
+        """Drain queued runs chunk by chunk, committing after each chunk so a
+        crash or timeout resumes from the stored cursor."""
+        deadline = time.monotonic() + (time_budget or self.CRON_TIME_BUDGET)
+        for run in self.search([('state', 'in', ('pending', 'running'))], order='id'):
+            while time.monotonic() < deadline:
+                if not run._lock_for_processing():
+                    self.env.cr.rollback()
+                    break
+                try:
+                    has_more = run._process_chunk()
+                    self.env.cr.commit()
+                except Exception as err:
+                    self.env.cr.rollback()
+                    _logger.error("Payment run %s failed: %s", run.id, err, exc_info=True)
+                    run.write({
+                        'state': 'failed',
+                        'last_error': str(err),
+                        'finished_at': fields.Datetime.now(),
+                    })
+                    self.env.cr.commit()
+                    break
+                if not has_more:
+                    break
+
+        if self.search_count([('state', 'in', ('pending', 'running'))]):
+            self._trigger_run_cron()
@@ -0,0 +1,247 @@
+import json
+import logging
+import time
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class BillPurgeJob(models.Model):
+    _name = 'bill.purge.job'
+    _description = 'Bill and Payment Purge Job'
+    _order = 'id desc'
+
+    DEFAULT_CHUNK_SIZE = 1000
+    CRON_TIME_BUDGET = 240
+    PHASES_BY_TARGET = {
+        'payments': ['payments'],
+        'bills': ['bills'],
+        'all': ['payments', 'bills'],
+    }
+
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        string='Status',
+        default='pending',
+        required=True,
+        index=True,
+    )
+    target = fields.Selection(
+        selection=[
+            ('payments', 'Payments'),
+            ('bills', 'Vendor Bills'),
+            ('all', 'Payments and Vendor Bills'),
+        ],
+        string='Target',
+        default='all',
+        required=True,
+    )
+    phase = fields.Selection(
+        selection=[('payments', 'Payments'), ('bills', 'Vendor Bills')],
+        string='Current Phase',
+    )
+    cursor = fields.Integer(string='Cursor', help='Last id handled in the current phase.')
+    chunk_size = fields.Integer(string='Chunk Size', default=DEFAULT_CHUNK_SIZE)
+    max_rows_per_second = fields.Integer(
+        string='Max Rows per Second',
+        help='Throttle on deleted rows across all tables; 0 disables throttling.',
+    )
+    max_records = fields.Integer(string='Max Records', help='Stop after this many payments/bills; 0 purges everything.')
+    processed_count = fields.Integer(string='Processed Records')
+    deleted_payments = fields.Integer(string='Deleted Payments')
+    deleted_bills = fields.Integer(string='Deleted Bills')
+    deleted_moves = fields.Integer(string='Deleted Journal Entries')
+    deleted_move_lines = fields.Integer(string='Deleted Journal Items')
+    deleted_reconcile_rows = fields.Integer(string='Deleted Reconciliations')
+    failed_chunks = fields.Integer(string='Failed Chunks')
+    error_log = fields.Text(string='Errors', default='[]')
+    last_error = fields.Text(string='Last Error')
+    started_at = fields.Datetime(string='Started At')
+    finished_at = fields.Datetime(string='Finished At')
+
+    @api.model
+    def _enqueue(self, target='all', chunk_size=None, max_rows_per_second=0, max_records=0):
+        job = self.create({
+            'target': target,
+            'phase': self.PHASES_BY_TARGET[target][0],
+            'chunk_size': chunk_size or self.DEFAULT_CHUNK_SIZE,
+            'max_rows_per_second': max_rows_per_second or 0,
+            'max_records': max_records or 0,
+        })
+        self._trigger_purge_cron()
+        _logger.info("Queued purge job %s (target=%s)", job.id, target)
+        return job
+
+    def _resume(self):
+        """Requeue a failed job from its stored phase and cursor."""
+        self.filtered(lambda job: job.state == 'failed').write({
+            'state': 'pending',
+            'last_error': False,
+            'finished_at': False,
+        })
+        self._trigger_purge_cron()
+
+    @api.model
+    def _trigger_purge_cron(self):
+        cron = self.env.ref('custom_bill_receive.ir_cron_process_purge_jobs', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    def _get_status(self):
+        self.ensure_one()
+        return {
+            'job_id': self.id,
+            'state': self.state,
+            'target': self.target,
+            'phase': self.phase or False,
+            'cursor': self.cursor,
+            'progress': {
+                'processed': self.processed_count,
+                'max_records': self.max_records,
+                'deleted_payments': self.deleted_payments,
+                'deleted_bills': self.deleted_bills,
+                'deleted_moves': self.deleted_moves,
+                'deleted_move_lines': self.deleted_move_lines,
+                'deleted_reconcile_rows': self.deleted_reconcile_rows,
+                'failed_chunks': self.failed_chunks,
+            },
+            'throttle': {
+                'chunk_size': self.chunk_size,
+                'max_rows_per_second': self.max_rows_per_second,
+            },
+            'errors': json.loads(self.error_log or '[]'),
+            'last_error': self.last_error or False,
+            'started_at': str(self.started_at) if self.started_at else False,
+            'finished_at': str(self.finished_at) if self.finished_at else False,
+        }
+
+    def _lock_for_processing(self):
+        self.env.cr.execute(
+            "SELECT id FROM bill_purge_job WHERE id = %s AND state IN ('pending', 'running') "
+            "FOR UPDATE SKIP LOCKED",
+            (self.id,),
+        )
+        return bool(self.env.cr.fetchone())
+
+    def _next_ids(self, limit):
+        if self.phase == 'payments':
+            self.env.cr.execute(
+                "SELECT id FROM account_payment WHERE id > %s ORDER BY id LIMIT %s",
+                (self.cursor, limit),
+            )
+        else:
+            self.env.cr.execute(
+                "SELECT id FROM account_move WHERE move_type IN ('in_invoice', 'in_refund') "
+                "AND id > %s ORDER BY id LIMIT %s",
+                (self.cursor, limit),
+            )
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def _advance_phase(self):
+        phases = self.PHASES_BY_TARGET[self.target]
+        index = phases.index(self.phase) if self.phase in phases else len(phases)
+        if index + 1 < len(phases):
+            self.write({'phase': phases[index + 1], 'cursor': 0})
+            return True
+        self.write({'state': 'done', 'finished_at': fields.Datetime.now()})
+        return False
+
+    def _process_chunk(self):
+        """Delete the next chunk after the stored cursor and advance it.
+
+        Returns ``(has_more, deleted_rows)``. A chunk whose SQL delete fails
+        is logged and skipped so one bad record cannot stall the job.
+        """
+        self.ensure_one()
+        limit = self.chunk_size or self.DEFAULT_CHUNK_SIZE
+        if self.max_records:
+            limit = min(limit, self.max_records - self.processed_count)
+        ids = self._next_ids(limit) if limit > 0 else []
+        if not ids:
+            if limit <= 0:
+                self.write({'state': 'done', 'finished_at': fields.Datetime.now()})
+                return False, 0
+            return self._advance_phase(), 0
+
+        deletion = self.env['bill.receive.deletion'].sudo()
+        vals = {
+            'state': 'running',
+            'started_at': self.started_at or fields.Datetime.now(),
+            'cursor': ids[-1],
+            'processed_count': self.processed_count + len(ids),
+        }
+        deleted_rows = 0
+        try:
+            with self.env.cr.savepoint():
+                if self.phase == 'payments':
+                    counts = deletion.delete_payments_sql(ids)
+                else:
+                    counts = deletion.delete_moves_sql(ids)
+        except Exception as err:
+            _logger.warning("Purge job %s: chunk %s..%s failed: %s", self.id, ids[0], ids[-1], err)
+            vals.update(
+                failed_chunks=self.failed_chunks + 1,
+                error_log=json.dumps(json.loads(self.error_log or '[]') + [{
+                    'phase': self.phase,
+                    'first_id': ids[0],
+                    'last_id': ids[-1],
+                    'error': str(err),
+                }]),
+            )
+        else:
+            deleted_rows = counts['payments'] + counts['moves'] + counts['move_lines'] + counts['reconcile_rows']
+            vals.update(
+                deleted_payments=self.deleted_payments + counts['payments'],
+                deleted_bills=self.deleted_bills + (counts['moves'] if self.phase == 'bills' else 0),
+                deleted_moves=self.deleted_moves + counts['moves'],
+                deleted_move_lines=self.deleted_move_lines + counts['move_lines'],
+                deleted_reconcile_rows=self.deleted_reconcile_rows + counts['reconcile_rows'],
+            )
+        self.write(vals)
+        return True, deleted_rows
+
+    def _throttle(self, deleted_rows, chunk_started, deadline):
+        """Sleep so the job stays under ``max_rows_per_second``."""
+        if not self.max_rows_per_second or not deleted_rows:
+            return
+        wait = deleted_rows / self.max_rows_per_second - (time.monotonic() - chunk_started)
+        wait = min(wait, deadline - time.monotonic())
+        if wait > 0:
+            time.sleep(wait)
+
+    @api.model
+    def _cron_process_purge_jobs(self, time_budget=None):
+        """Purge queued jobs chunk by chunk, committing after each chunk so
+        locks stay short and a crash resumes from the stored cursor."""
+        deadline = time.monotonic() + (time_budget or self.CRON_TIME_BUDGET)
+        for job in self.search([('state', 'in', ('pending', 'running'))], order='id'):
+            while time.monotonic() < deadline:
+                if not job._lock_for_processing():
+                    self.env.cr.rollback()
+                    break
+                chunk_started = time.monotonic()
+                try:
+                    has_more, deleted_rows = job._process_chunk()
+                    self.env.cr.commit()
+                except Exception as err:
+                    self.env.cr.rollback()
+                    _logger.error("Purge job %s failed: %s", job.id, err, exc_info=True)
+                    job.write({
+                        'state': 'failed',
+                        'last_error': str(err),
+                        'finished_at': fields.Datetime.now(),
+                    })
+                    self.env.cr.commit()
+                    break
+                if not has_more:
+                    break
+                job._throttle(deleted_rows, chunk_started, deadline)
+
+        if self.search_count([('state', 'in', ('pending', 'running'))]):
+            self._trigger_purge_cron()
@@ -1,6 +1,69 @@
-from odoo import models, fields
+from odoo import api, models, fields
+from odoo.tools.sql import column_exists, create_column, create_index
+
+UUID_SOURCE_FIELDS = ('l10n_mx_edi_cfdi_uuid', 'folio_fiscal')
+
 
 class BillReceive(models.Model):
     _inherit = 'account.move'
 
-    folio_fiscal = fields.Char(string="Folio Fiscal")
+    folio_fiscal = fields.Char(string="Folio Fiscal", index='btree_not_null')
+    cfdi_uuid_normalized = fields.Char(
+        string="Normalized CFDI UUID",
+        compute='_compute_cfdi_uuid_normalized',
+        store=True,
+        copy=False,
+        help="Upper-cased CFDI UUID (or Folio Fiscal) used by the UUID-keyed API lookups.",
+    )
+
+    @api.depends(lambda self: [name for name in UUID_SOURCE_FIELDS if name in self._fields])
+    def _compute_cfdi_uuid_normalized(self):
+        for move in self:
+            value = ''
+            for field_name in UUID_SOURCE_FIELDS:
+                if field_name in move._fields and (move[field_name] or '').strip():
+                    value = move[field_name]
+                    break
+            move.cfdi_uuid_normalized = value.strip().upper() or False
+
+    def _auto_init(self):
+        # Fill the new column in SQL instead of recomputing it through the ORM
+        # on every existing move.
+        cr = self.env.cr
+        if not column_exists(cr, 'account_move', 'cfdi_uuid_normalized'):
+            create_column(cr, 'account_move', 'cfdi_uuid_normalized', 'varchar')
+            sources = [
+                f"NULLIF(btrim({name}), '')" for name in UUID_SOURCE_FIELDS
+                if column_exists(cr, 'account_move', name)
+            ]
+            if sources:
+                cr.execute(
+                    "UPDATE account_move SET cfdi_uuid_normalized = upper(btrim(COALESCE(%s))) "
+                    "WHERE COALESCE(%s) IS NOT NULL" % (', '.join(sources), ', '.join(sources))
+                )
+        return super()._auto_init()
+
+    def init(self):
+        super().init()
+        create_index(
+            self.env.cr,
+            'account_move_cfdi_uuid_normalized_move_type_index',
+            'account_move',
+            ['cfdi_uuid_normalized', 'move_type', 'state'],
+            where='cfdi_uuid_normalized IS NOT NULL',
+        )
+        create_index(
+            self.env.cr,
+            'account_move_ref_move_type_index',
+            'account_move',
+            ['ref', 'move_type', 'state'],
+            where='ref IS NOT NULL',
+        )
+        create_index(
+            self.env.cr,
+            'account_move_unpaid_bill_keyset_index',
+            'account_move',
+            ['invoice_date', 'id'],
+            where="move_type IN ('in_invoice', 'in_refund') AND state = 'posted' "
+                  "AND payment_state IN ('not_paid', 'partial')",
+        )
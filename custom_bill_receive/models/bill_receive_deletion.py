@@ -0,0 +1,376 @@
+import json
+import logging
+from collections import defaultdict
+
+from odoo import api, models
+from odoo.tools.sql import column_exists
+
+_logger = logging.getLogger(__name__)
+
+
+class BillReceiveDeletion(models.AbstractModel):
+    """Set-based deletion of documents and their payments by CFDI UUID."""
+
+    _name = 'bill.receive.deletion'
+    _description = 'Bill Receive Deletion Service'
+
+    DELETE_CHUNK_SIZE = 500
+    DOCUMENT_MOVE_TYPES = {
+        'invoice': ['out_invoice', 'out_refund'],
+        'bill': ['in_invoice', 'in_refund'],
+    }
+    PAYMENT_POINTER_COLUMNS = ('payment_id', 'origin_payment_id')
+    # Rough seconds per deleted row, by table and deletion path; override
+    # with a JSON dict in the custom_bill_receive.purge_row_costs parameter.
+    ROW_COSTS = {
+        'sql': {
+            'account_payment': 0.0002,
+            'account_move': 0.0005,
+            'account_move_line': 0.0002,
+            'account_partial_reconcile': 0.0003,
+            'account_full_reconcile': 0.0002,
+        },
+        'orm': {
+            'account_payment': 0.04,
+            'account_move': 0.06,
+            'account_move_line': 0.004,
+            'account_partial_reconcile': 0.01,
+            'account_full_reconcile': 0.002,
+        },
+    }
+
+    def _split_chunks(self, values, size=None):
+        values = list(values)
+        size = size or self.DELETE_CHUNK_SIZE
+        for start in range(0, len(values), size):
+            yield values[start:start + size]
+
+    def _resolve_documents(self, uuids, move_types):
+        """One draft/posted document per normalized UUID, matched on the
+        normalized CFDI UUID or the Folio Fiscal and picked in the default
+        ``account.move`` order like ``search(limit=1)``."""
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT ON (requested.uuid) requested.uuid, move.id, move.name
+              FROM unnest(%s::varchar[]) AS requested(uuid)
+              JOIN account_move move
+                ON move.cfdi_uuid_normalized = requested.uuid
+                OR move.folio_fiscal = requested.uuid
+             WHERE move.move_type = ANY(%s)
+               AND move.state IN ('draft', 'posted')
+             ORDER BY requested.uuid, move.date DESC, move.name DESC, move.id DESC
+            """,
+            (list(uuids), list(move_types)),
+        )
+        return {uuid: {'id': move_id, 'name': name} for uuid, move_id, name in self.env.cr.fetchall()}
+
+    def _related_payments(self, move_ids):
+        """``{document_id: {payment_id: payment_move_id}}`` for payments
+        reconciled with ``move_ids``."""
+        self.env.cr.execute(
+            """
+            SELECT doc_line.move_id, pay.id, pay.move_id
+              FROM account_move_line doc_line
+              JOIN account_partial_reconcile apr
+                ON doc_line.id IN (apr.debit_move_id, apr.credit_move_id)
+              JOIN account_move_line other_line
+                ON other_line.id = CASE WHEN apr.debit_move_id = doc_line.id
+                                        THEN apr.credit_move_id ELSE apr.debit_move_id END
+              JOIN account_payment pay ON pay.move_id = other_line.move_id
+             WHERE doc_line.move_id = ANY(%s)
+               AND other_line.move_id <> doc_line.move_id
+            """,
+            (list(move_ids),),
+        )
+        payments = defaultdict(dict)
+        for move_id, payment_id, payment_move_id in self.env.cr.fetchall():
+            payments[move_id][payment_id] = payment_move_id
+        return payments
+
+    def _payment_documents(self, payment_ids):
+        """``{payment_id: {document_id: name}}`` for every invoice/bill each
+        payment is reconciled with, in one query."""
+        self.env.cr.execute(
+            """
+            SELECT pay.id, doc.id, doc.name
+              FROM account_payment pay
+              JOIN account_move_line pay_line ON pay_line.move_id = pay.move_id
+              JOIN account_partial_reconcile apr
+                ON pay_line.id IN (apr.debit_move_id, apr.credit_move_id)
+              JOIN account_move_line doc_line
+                ON doc_line.id = CASE WHEN apr.debit_move_id = pay_line.id
+                                      THEN apr.credit_move_id ELSE apr.debit_move_id END
+              JOIN account_move doc ON doc.id = doc_line.move_id
+             WHERE pay.id = ANY(%s)
+               AND doc.id <> pay.move_id
+               AND doc.move_type IN ('out_invoice', 'out_refund', 'in_invoice', 'in_refund')
+            """,
+            (list(payment_ids),),
+        )
+        documents = defaultdict(dict)
+        for payment_id, document_id, name in self.env.cr.fetchall():
+            documents[payment_id][document_id] = name
+        return documents
+
+    def _purge_reconciliations_sql(self, line_ids):
+        """Delete partial/full reconciles touching ``line_ids`` in SQL and
+        recompute residuals of the surviving counterpart lines."""
+        cr = self.env.cr
+        cr.execute(
+            """
+            SELECT CASE WHEN debit_move_id = ANY(%s) THEN credit_move_id ELSE debit_move_id END
+              FROM account_partial_reconcile
+             WHERE debit_move_id = ANY(%s) OR credit_move_id = ANY(%s)
+            UNION
+            SELECT other.id
+              FROM account_move_line line
+              JOIN account_move_line other ON other.full_reconcile_id = line.full_reconcile_id
+             WHERE line.id = ANY(%s)
+            """,
+            (line_ids, line_ids, line_ids, line_ids),
+        )
+        counterpart_ids = {row[0] for row in cr.fetchall()} - set(line_ids)
+        cr.execute(
+            "SELECT DISTINCT full_reconcile_id FROM account_move_line "
+            "WHERE id = ANY(%s) AND full_reconcile_id IS NOT NULL",
+            (line_ids,),
+        )
+        full_reconcile_ids = [row[0] for row in cr.fetchall()]
+
+        cr.execute(
+            "DELETE FROM account_partial_reconcile WHERE debit_move_id = ANY(%s) OR credit_move_id = ANY(%s)",
+            (line_ids, line_ids),
+        )
+        deleted = cr.rowcount
+        if full_reconcile_ids:
+            cr.execute("UPDATE account_move_line SET full_reconcile_id = NULL WHERE full_reconcile_id = ANY(%s)",
+                       (full_reconcile_ids,))
+            cr.execute("DELETE FROM account_full_reconcile WHERE id = ANY(%s)", (full_reconcile_ids,))
+
+        if counterpart_ids:
+            self.env.invalidate_all()
+            counterparts = self.env['account.move.line'].sudo().browse(list(counterpart_ids)).exists()
+            counterparts.modified(['matched_debit_ids', 'matched_credit_ids', 'full_reconcile_id'])
+        return deleted, len(full_reconcile_ids)
+
+    def _delete_moves_sql(self, move_ids, payment_ids=(), orm_unreconcile=True):
+        """Unreconcile and hard-delete ``payment_ids`` and ``move_ids`` (with
+        their lines) using ``= ANY(%s)`` statements. Returns row counts.
+
+        With ``orm_unreconcile=False`` reconciliations are dropped in SQL as
+        well, which skips the exchange-difference reversals of
+        ``remove_move_reconcile()``.
+        """
+        cr = self.env.cr
+        move_ids = list(move_ids)
+        payment_ids = list(payment_ids)
+        counts = {'payments': 0, 'moves': 0, 'move_lines': 0, 'reconcile_rows': 0, 'full_reconcile_rows': 0}
+
+        cr.execute("SELECT id FROM account_move_line WHERE move_id = ANY(%s)", (move_ids,))
+        line_ids = [row[0] for row in cr.fetchall()]
+        if line_ids and orm_unreconcile:
+            # Through the ORM so counterpart residuals and full reconciles
+            # outside the deleted set stay consistent.
+            self.env['account.move.line'].sudo().browse(line_ids).remove_move_reconcile()
+            self.env.flush_all()
+            cr.execute(
+                "DELETE FROM account_partial_reconcile WHERE debit_move_id = ANY(%s) OR credit_move_id = ANY(%s)",
+                (line_ids, line_ids),
+            )
+            counts['reconcile_rows'] = cr.rowcount
+        elif line_ids:
+            counts['reconcile_rows'], counts['full_reconcile_rows'] = self._purge_reconciliations_sql(line_ids)
+            self.env.flush_all()
+
+        if payment_ids:
+            for column in self.PAYMENT_POINTER_COLUMNS:
+                if column_exists(cr, 'account_move', column):
+                    cr.execute(
+                        f"UPDATE account_move SET {column} = NULL WHERE {column} = ANY(%s)",
+                        (payment_ids,),
+                    )
+            cr.execute("DELETE FROM account_payment WHERE id = ANY(%s)", (payment_ids,))
+            counts['payments'] = cr.rowcount
+        if line_ids:
+            cr.execute("DELETE FROM account_move_line WHERE id = ANY(%s)", (line_ids,))
+            counts['move_lines'] = cr.rowcount
+        if move_ids:
+            cr.execute("DELETE FROM account_move WHERE id = ANY(%s)", (move_ids,))
+            counts['moves'] = cr.rowcount
+        return counts
+
+    @api.model
+    def delete_payments_sql(self, payment_ids):
+        """Hard-delete ``payment_ids`` with their journal entries in SQL."""
+        self.env.flush_all()
+        payment_ids = list(payment_ids)
+        self.env.cr.execute(
+            "SELECT move_id FROM account_payment WHERE id = ANY(%s) AND move_id IS NOT NULL",
+            (payment_ids,),
+        )
+        move_ids = [row[0] for row in self.env.cr.fetchall()]
+        try:
+            return self._delete_moves_sql(move_ids, payment_ids, orm_unreconcile=False)
+        finally:
+            self.env.invalidate_all()
+
+    @api.model
+    def delete_moves_sql(self, move_ids):
+        """Hard-delete ``move_ids`` and their lines in SQL."""
+        self.env.flush_all()
+        try:
+            return self._delete_moves_sql(move_ids, orm_unreconcile=False)
+        finally:
+            self.env.invalidate_all()
+
+    def _row_costs(self, mode):
+        costs = dict(self.ROW_COSTS[mode])
+        override = self.env['ir.config_parameter'].sudo().get_param('custom_bill_receive.purge_row_costs')
+        if override:
+            try:
+                costs.update(json.loads(override).get(mode, {}))
+            except (ValueError, AttributeError):
+                _logger.warning("Ignoring invalid custom_bill_receive.purge_row_costs: %s", override)
+        return costs
+
+    @api.model
+    def estimate_deletion(self, payment_ids=(), move_ids=(), include_payment_moves=True, mode='sql'):
+        """Dry run: exact row counts per table that deleting ``payment_ids``
+        (with their journal entries unless ``include_payment_moves`` is
+        False) and ``move_ids`` would touch, plus an estimated run time from
+        the ``mode`` ('sql' or 'orm') per-row cost model. Nothing is deleted.
+        """
+        self.env.flush_all()
+        self.env.cr.execute(
+            """
+            WITH moves AS (
+                SELECT move_id AS id FROM account_payment
+                 WHERE %(include_payment_moves)s AND id = ANY(%(payment_ids)s) AND move_id IS NOT NULL
+                UNION
+                SELECT id FROM account_move WHERE id = ANY(%(move_ids)s)
+            ), lines AS (
+                SELECT line.id, line.full_reconcile_id
+                  FROM account_move_line line
+                  JOIN moves ON moves.id = line.move_id
+            )
+            SELECT (SELECT COUNT(*) FROM account_payment WHERE id = ANY(%(payment_ids)s)),
+                   (SELECT COUNT(*) FROM moves),
+                   (SELECT COUNT(*) FROM lines),
+                   (SELECT COUNT(*) FROM account_partial_reconcile apr
+                     WHERE apr.debit_move_id IN (SELECT id FROM lines)
+                        OR apr.credit_move_id IN (SELECT id FROM lines)),
+                   (SELECT COUNT(DISTINCT full_reconcile_id) FROM lines)
+            """,
+            {
+                'payment_ids': list(payment_ids),
+                'move_ids': list(move_ids),
+                'include_payment_moves': bool(include_payment_moves),
+            },
+        )
+        row = self.env.cr.fetchone()
+        row_counts = dict(zip(
+            ('account_payment', 'account_move', 'account_move_line',
+             'account_partial_reconcile', 'account_full_reconcile'),
+            row,
+        ))
+        costs = self._row_costs(mode)
+        estimated_seconds = sum(count * costs.get(table, 0.0) for table, count in row_counts.items())
+        return {
+            'dry_run': True,
+            'row_counts': row_counts,
+            'total_rows': sum(row_counts.values()),
+            'estimated_seconds': round(estimated_seconds, 1),
+            'cost_model': {'mode': mode, 'seconds_per_row': costs},
+        }
+
+    @api.model
+    def delete_documents_by_uuid(self, uuids, document_type):
+        """Delete many invoices or bills by CFDI UUID, with the payments
+        reconciled with them.
+
+        Documents, payments and their cross-links are resolved in three
+        queries. A document is rejected, like in /api/delete_document_by_uuid,
+        when one of its payments is also reconciled with another document.
+        Accepted documents are deleted in chunks, each in its own savepoint.
+        """
+        self.env.flush_all()
+        requested = []
+        for uuid in uuids or []:
+            normalized = str(uuid or '').strip().upper()
+            if normalized and normalized not in requested:
+                requested.append(normalized)
+
+        errors = []
+        documents = self._resolve_documents(requested, self.DOCUMENT_MOVE_TYPES[document_type])
+        for uuid in requested:
+            if uuid not in documents:
+                errors.append({'uuid': uuid, 'error': f"No {document_type} found for UUID '{uuid}'"})
+
+        payments_by_document = self._related_payments(doc['id'] for doc in documents.values())
+        documents_by_payment = self._payment_documents(
+            {payment_id for payments in payments_by_document.values() for payment_id in payments}
+        )
+
+        accepted = []
+        for uuid, document in documents.items():
+            payments = payments_by_document.get(document['id'], {})
+            rejection = None
+            for payment_id in sorted(payments):
+                others = {
+                    doc_id: name for doc_id, name in documents_by_payment.get(payment_id, {}).items()
+                    if doc_id != document['id']
+                }
+                if others:
+                    rejection = (
+                        f"Payment {payment_id} is reconciled with other documents "
+                        f"({', '.join(name or str(doc_id) for doc_id, name in others.items())}). "
+                        "Unlink it manually before deleting this document."
+                    )
+                    break
+            if rejection:
+                errors.append({'uuid': uuid, 'document_id': document['id'], 'error': rejection})
+                continue
+            accepted.append((uuid, document, payments))
+
+        deleted = []
+        totals = defaultdict(int)
+        for chunk in self._split_chunks(accepted):
+            payment_ids = [payment_id for _uuid, _doc, payments in chunk for payment_id in payments]
+            move_ids = [doc['id'] for _uuid, doc, _payments in chunk] + [
+                move_id for _uuid, _doc, payments in chunk for move_id in payments.values() if move_id
+            ]
+            try:
+                with self.env.cr.savepoint():
+                    counts = self._delete_moves_sql(move_ids, payment_ids)
+            except Exception as e:
+                _logger.warning("Bulk %s deletion chunk failed: %s", document_type, e)
+                errors += [{'uuid': uuid, 'document_id': doc['id'], 'error': str(e)} for uuid, doc, _payments in chunk]
+                continue
+            finally:
+                self.env.invalidate_all()
+            for key, value in counts.items():
+                totals[key] += value
+            deleted += [{
+                'uuid': uuid,
+                'deleted_document_id': doc['id'],
+                'name': doc['name'],
+                'deleted_payment_ids': sorted(payments),
+            } for uuid, doc, payments in chunk]
+
+        _logger.info(
+            "Bulk deleted %s of %s %s documents (%s payments), %s errors",
+            len(deleted), len(requested), document_type, totals['payments'], len(errors),
+        )
+        return {
+            'deleted': deleted,
+            'errors': errors,
+            'summary': {
+                'requested': len(requested),
+                'deleted_documents': len(deleted),
+                'deleted_payments': totals['payments'],
+                'deleted_moves': totals['moves'],
+                'deleted_move_lines': totals['move_lines'],
+                'deleted_reconcile_rows': totals['reconcile_rows'],
+                'errors_count': len(errors),
+            },
+        }
@@ -0,0 +1,106 @@
+import hashlib
+import json
+
+from odoo import api, fields, models
+
+
+class BillReceiveIdempotencyKey(models.Model):
+    _name = 'bill.receive.idempotency.key'
+    _description = 'Bill Receive API Idempotency Key'
+
+    DEFAULT_RETENTION_DAYS = 7
+
+    key = fields.Char(string='Idempotency Key', required=True)
+    endpoint = fields.Char(string='Endpoint', required=True)
+    request_hash = fields.Char(string='Request Hash', required=True)
+    response = fields.Text(string='Response', help='JSON response returned to the first successful call.')
+
+    _sql_constraints = [
+        (
+            'unique_key',
+            'unique(key)',
+            'This Idempotency-Key was already used.',
+        ),
+    ]
+
+    @api.model
+    def _hash_request(self, endpoint, params):
+        params = {name: value for name, value in (params or {}).items() if name != 'idempotency_key'}
+        canonical = json.dumps([endpoint, params], sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _lookup_stored(self, key, endpoint, request_hash):
+        self.env.cr.execute(
+            "SELECT endpoint, request_hash, response FROM bill_receive_idempotency_key WHERE key = %s",
+            (key,),
+        )
+        row = self.env.cr.fetchone()
+        if not row:
+            return None
+        if (row[0], row[1]) != (endpoint, request_hash):
+            return {
+                'error': 'Idempotency-Key was already used for a different request',
+                'idempotency_key': key,
+            }
+        return dict(json.loads(row[2] or '{}'), idempotent_replay=True)
+
+    @api.model
+    def _replay_or_claim(self, key, endpoint, request_hash):
+        """Return the stored response for a retried request, or reserve ``key``
+        for this transaction and return None.
+
+        The reservation is only visible once the request commits. A concurrent
+        request with the same key waits on the unique index in
+        ``INSERT ... ON CONFLICT DO NOTHING``. If the first request commits,
+        PostgreSQL cannot show that row to the waiting request's repeatable
+        read snapshot and raises a serialization failure. Odoo then retries
+        the request in a fresh transaction, and the retry replays the stored
+        response. If the first request rolls back, the insert goes through.
+        """
+        stored = self._lookup_stored(key, endpoint, request_hash)
+        if stored is not None:
+            return stored
+
+        cr = self.env.cr
+        cr.execute(
+            "INSERT INTO bill_receive_idempotency_key (key, endpoint, request_hash, create_date, write_date) "
+            "VALUES (%s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC') "
+            "ON CONFLICT (key) DO NOTHING RETURNING id",
+            (key, endpoint, request_hash),
+        )
+        if cr.fetchone():
+            return None
+
+        # Only reachable below repeatable read, where the committed row is
+        # visible again.
+        stored = self._lookup_stored(key, endpoint, request_hash)
+        if stored is not None:
+            return stored
+        return {
+            'error': 'A request with this Idempotency-Key is still in progress; retry later',
+            'idempotency_key': key,
+        }
+
+    @api.model
+    def _store_response(self, key, response):
+        # Error responses release the key so the caller can retry once the
+        # cause is fixed; if the request rolled back the row is already gone.
+        if isinstance(response, dict) and response.get('error'):
+            self.env.cr.execute("DELETE FROM bill_receive_idempotency_key WHERE key = %s", (key,))
+            return
+        self.env.cr.execute(
+            "UPDATE bill_receive_idempotency_key SET response = %s WHERE key = %s",
+            (json.dumps(response, default=str), key),
+        )
+
+    @api.model
+    def _cron_purge_expired_keys(self):
+        days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'custom_bill_receive.idempotency_key_days', self.DEFAULT_RETENTION_DAYS
+        ) or self.DEFAULT_RETENTION_DAYS)
+        self.env.cr.execute(
+            "DELETE FROM bill_receive_idempotency_key "
+            "WHERE create_date < (now() at time zone 'UTC') - make_interval(days => %s)",
+            (days,),
+        )
+        return self.env.cr.rowcount
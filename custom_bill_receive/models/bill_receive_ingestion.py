@@ -0,0 +1,1050 @@
+import logging
+from collections import defaultdict
+
+from psycopg2 import errors as pg_errors
+
+from odoo import api, fields, models
+
+from ..tools import normalize_text, normalize_vat
+from .ingestion_lookup import IngestionLookupCache, TaxIndex
+
+_logger = logging.getLogger(__name__)
+
+
+class IngestionConflict(Exception):
+    """Another transaction is creating the same partner/product concurrently."""
+
+
+class BillReceiveIngestion(models.AbstractModel):
+    """Document ingestion engine shared by the /api/receive_* endpoints and
+    the background ingestion job worker, so it runs with or without an HTTP
+    request."""
+
+    _name = 'bill.receive.ingestion'
+    _description = 'Bill Receive Ingestion Service'
+
+    LOOKUP_CHUNK_SIZE = 1000
+    BATCH_CREATE_SIZE = 100
+    ERROR_CODES = (
+        ('Duplicate reference in request payload', 'duplicate_reference_in_payload'),
+        ('Duplicate reference already exists', 'duplicate_reference'),
+        ('Duplicate CFDI UUID in request payload', 'duplicate_uuid_in_payload'),
+        ('Duplicate CFDI UUID already exists', 'duplicate_uuid'),
+        ('Currency ', 'currency_not_found'),
+        ('USD currency not found', 'currency_not_found'),
+        ('Failed to create tax', 'tax_error'),
+        ('Concurrent creation', 'concurrent_creation'),
+    )
+
+    def _build_tax_index(self, type_tax_use, amount=None):
+        company = self.env.company
+        tax_model = self.env['account.tax'].sudo()
+        domain = [('type_tax_use', '=', type_tax_use)]
+        if amount is not None:
+            domain.append(('amount', '=', amount))
+        if 'company_id' in tax_model._fields:
+            domain.append(('company_id', 'in', [company.id, False]))
+
+        taxes = tax_model.search(domain).filtered(
+            lambda tax: not tax.company_id or tax.company_id == company
+        )
+        return TaxIndex(taxes, self._normalize_text)
+
+    def _find_existing_tax(self, tax_data, type_tax_use, tax_index=None):
+        tax_name = (tax_data or {}).get('name')
+        tax_amount = float((tax_data or {}).get('amount', 0.0))
+        if not tax_name:
+            raise ValueError("Tax name is required.")
+
+        if tax_index is None:
+            tax_index = self._build_tax_index(type_tax_use, amount=tax_amount)
+        tax = tax_index.match(self._normalize_text(tax_name), tax_amount)
+        if tax:
+            return tax
+
+        raise ValueError(
+            f"No existing tax found for '{tax_name}' ({tax_amount}%) with use '{type_tax_use}'."
+        )
+
+    def _normalize_text(self, value):
+        return normalize_text(value)
+
+    def _normalize_vat(self, vat):
+        return normalize_vat(vat)
+
+    def _get_mx_country_id(self):
+        country = self.env['res.country'].sudo().search([('code', '=', 'MX')], limit=1)
+        return country.id if country else False
+
+    def _parse_exchange_rate_value(self, value):
+        if value in (None, '', False):
+            return None
+        try:
+            parsed = float(value)
+        except Exception as err:
+            raise ValueError(f"Invalid exchange_rate '{value}': {err}")
+        if parsed <= 0:
+            raise ValueError("exchange_rate must be greater than 0.")
+        return parsed
+
+    def _resolve_rate_date(self, payload, default_date=None):
+        rate_date = (payload or {}).get('rate_date') or default_date or fields.Date.context_today(self.env.user)
+        return fields.Date.to_date(rate_date)
+
+    def _prepare_exchange_rate(self, currency, payload, default_date=None):
+        """Return the ``(currency, rate_date, exchange_rate)`` a payload asks
+        for, or None when there is nothing to write."""
+        exchange_rate = self._parse_exchange_rate_value((payload or {}).get('exchange_rate'))
+        if not exchange_rate or not currency:
+            return None
+
+        company_currency = self.env.company.currency_id
+        if not company_currency or currency == company_currency:
+            return None
+        return currency, self._resolve_rate_date(payload, default_date), exchange_rate
+
+    def _apply_exchange_rate(self, currency, payload, default_date=None, lookup=None):
+        rate = self._prepare_exchange_rate(currency, payload, default_date)
+        if not rate:
+            return False
+
+        if lookup is not None:
+            lookup.exchange_rate(*rate)
+        else:
+            self.env['res.currency.rate'].sudo()._upsert_company_rates([rate])
+        _logger.info(
+            "Applied exchange rate %s for currency %s on %s",
+            rate[2], currency.name, rate[1],
+        )
+        return True
+
+    def _apply_exchange_rates(self, requests):
+        """Apply many ``(currency, payload, default_date)`` rate requests with
+        a single deduplicated upsert."""
+        rates = [
+            rate for rate in (
+                self._prepare_exchange_rate(currency, payload, default_date)
+                for currency, payload, default_date in requests
+            ) if rate
+        ]
+        if not rates:
+            return 0
+        return self.env['res.currency.rate'].sudo()._upsert_company_rates(rates)
+
+    def _extract_uuid_value(self, data):
+        value = (
+            (data or {}).get('l10n_mx_edi_cfdi_uuid')
+            or (data or {}).get('uuid')
+            or (data or {}).get('folio_fiscal')
+            or ''
+        )
+        return str(value).strip().upper()
+
+    def _extract_reference_value(self, data):
+        value = (
+            (data or {}).get('name')
+            or (data or {}).get('ref')
+            or (data or {}).get('invoice_name')
+            or ''
+        )
+        return str(value).strip()
+
+    def _find_move_by_reference(self, reference, allowed_move_types, allowed_states=None):
+        account_move = self.env['account.move'].sudo()
+        domain = [('move_type', 'in', allowed_move_types), ('ref', '=', reference)]
+        if allowed_states:
+            domain.append(('state', 'in', allowed_states))
+        move = account_move.search(domain, limit=1)
+        return account_move, move
+
+    def _find_move_by_cfdi_uuid(self, uuid, allowed_move_types, allowed_states=None):
+        account_move = self.env['account.move'].sudo()
+        uuid_value = str(uuid or '').strip().upper()
+        if not uuid_value:
+            return account_move, account_move.browse()
+
+        base_domain = [('move_type', 'in', allowed_move_types)]
+        if allowed_states:
+            base_domain.append(('state', 'in', allowed_states))
+
+        move = account_move.search(base_domain + self._build_uuid_domain(account_move, uuid), limit=1)
+        return account_move, move
+
+    def _build_uuid_domain(self, account_move, uuid):
+        return self._build_uuids_domain([uuid])
+
+    def _build_uuids_domain(self, uuids):
+        """Match the CFDI UUIDs on the normalized column or on Folio Fiscal.
+
+        cfdi_uuid_normalized prefers l10n_mx_edi_cfdi_uuid, so a move whose
+        Folio Fiscal differs from it is still found by its Folio Fiscal; both
+        terms are index probes.
+        """
+        values = {str(uuid or '').strip() for uuid in uuids} - {''}
+        upper_values = {value.upper() for value in values}
+        return [
+            '|',
+            ('cfdi_uuid_normalized', 'in', sorted(upper_values)),
+            ('folio_fiscal', 'in', sorted(values | upper_values)),
+        ]
+
+    def _matched_uuids(self, normalized_uuid, folio_fiscal, uuids):
+        """The upper-cased ``uuids`` a move found by :meth:`_build_uuids_domain` matched."""
+        return {normalized_uuid or '', (folio_fiscal or '').strip().upper()} & set(uuids)
+
+    def _reconcile_moves(self, source_move, target_move, account_internal_group):
+        self.env['bill.receive.reconciliation'].sudo().reconcile_pair(
+            target_move, source_move, account_internal_group
+        )
+
+    def _claim_entity_key(self, kind, key):
+        """Reserve ``(kind, key)`` before creating a shared master record.
+
+        The row lives in a table with a unique (kind, key) constraint, so a
+        concurrent worker about to create the same partner/product blocks on
+        the index and then gets :class:`IngestionConflict`. Under the job
+        worker (``ingestion_job_worker`` context) its chunk is retried in a
+        fresh transaction that sees the committed record instead of creating
+        a duplicate; synchronous requests report it as a per-document error.
+        """
+        cr = self.env.cr
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute(
+                    "INSERT INTO bill_ingestion_entity_key (kind, key, create_date) "
+                    "VALUES (%s, %s, now() at time zone 'UTC')",
+                    (kind, key),
+                )
+        except (pg_errors.UniqueViolation, pg_errors.SerializationFailure) as err:
+            raise IngestionConflict(
+                f"{kind} '{key}' is being created by another ingestion worker."
+            ) from err
+
+    def _split_chunks(self, values, size=None):
+        values = list(values)
+        size = size or self.LOOKUP_CHUNK_SIZE
+        for start in range(0, len(values), size):
+            yield values[start:start + size]
+
+    def _prefetch_existing_moves(self, documents, default_move_types):
+        """Resolve every ref and CFDI UUID of a payload with chunked IN queries.
+
+        Returns ``{'reference': {ref: [(move_id, move_type)]}, 'uuid': {...}}``
+        so the ingestion loop can detect duplicates without one search per document.
+        """
+        account_move = self.env['account.move'].sudo()
+        move_types = set(default_move_types)
+        references = set()
+        uuids = set()
+        for data in documents or []:
+            if not isinstance(data, dict):
+                continue
+            if data.get('move_type'):
+                move_types.add(data['move_type'])
+            reference = self._extract_reference_value(data)
+            if reference:
+                references.add(reference)
+            uuid_value = self._extract_uuid_value(data)
+            if uuid_value:
+                uuids.add(uuid_value)
+
+        existing = {'reference': defaultdict(list), 'uuid': defaultdict(list)}
+        base_domain = [('move_type', 'in', sorted(move_types))]
+
+        for chunk in self._split_chunks(sorted(references)):
+            rows = account_move.search_read(base_domain + [('ref', 'in', chunk)], ['ref', 'move_type'])
+            for row in rows:
+                existing['reference'][row['ref']].append((row['id'], row['move_type']))
+
+        for chunk in self._split_chunks(sorted(uuids)):
+            rows = account_move.search_read(
+                base_domain + self._build_uuids_domain(chunk),
+                ['cfdi_uuid_normalized', 'folio_fiscal', 'move_type'],
+            )
+            for row in rows:
+                for uuid_value in self._matched_uuids(row['cfdi_uuid_normalized'], row['folio_fiscal'], chunk):
+                    existing['uuid'][uuid_value].append((row['id'], row['move_type']))
+
+        _logger.info(
+            "Prefetched %s existing refs and %s existing UUIDs for %s documents",
+            len(existing['reference']), len(existing['uuid']), len(documents or []),
+        )
+        return existing
+
+    def _match_prefetched_move(self, prefetched, key, allowed_move_types):
+        for move_id, move_type in prefetched.get(key, []):
+            if move_type in allowed_move_types:
+                return move_id
+        return False
+
+    @api.model
+    def lookup_documents(self, uuids=None, refs=None, move_types=None):
+        """Resolve many CFDI UUIDs and/or references to their moves using
+        chunked ``IN`` queries instead of one search per document.
+
+        Returns ``{'uuids': {uuid: [move]}, 'refs': {ref: [move]},
+        'not_found': {'uuids': [...], 'refs': [...]}}``.
+        """
+        account_move = self.env['account.move'].sudo()
+        uuids = sorted({str(value or '').strip().upper() for value in (uuids or [])} - {''})
+        refs = sorted({str(value or '').strip() for value in (refs or [])} - {''})
+        base_domain = [('move_type', 'in', list(move_types))] if move_types else []
+        fields_to_read = [
+            'name', 'ref', 'cfdi_uuid_normalized', 'folio_fiscal', 'move_type', 'state',
+            'payment_state', 'amount_residual', 'currency_id',
+        ]
+
+        def _move_info(row):
+            return {
+                'id': row['id'],
+                'name': row['name'],
+                'ref': row['ref'] or False,
+                'uuid': row['cfdi_uuid_normalized'] or False,
+                'move_type': row['move_type'],
+                'state': row['state'],
+                'payment_state': row['payment_state'],
+                'amount_residual': row['amount_residual'],
+                'currency': row['currency_id'][1] if row['currency_id'] else False,
+            }
+
+        found = {'uuids': defaultdict(list), 'refs': defaultdict(list)}
+        for chunk in self._split_chunks(uuids):
+            rows = account_move.search_read(
+                base_domain + self._build_uuids_domain(chunk), fields_to_read, order='id',
+            )
+            for row in rows:
+                for uuid_value in self._matched_uuids(row['cfdi_uuid_normalized'], row['folio_fiscal'], chunk):
+                    found['uuids'][uuid_value].append(_move_info(row))
+        for chunk in self._split_chunks(refs):
+            rows = account_move.search_read(
+                base_domain + [('ref', 'in', chunk)], fields_to_read, order='id',
+            )
+            for row in rows:
+                found['refs'][row['ref']].append(_move_info(row))
+
+        return {
+            'uuids': dict(found['uuids']),
+            'refs': dict(found['refs']),
+            'not_found': {
+                'uuids': [value for value in uuids if value not in found['uuids']],
+                'refs': [value for value in refs if value not in found['refs']],
+            },
+        }
+
+    def _create_and_post_move(self, move_vals, currency, data, cfdi_uuid, lookup=None):
+        move = self.env['account.move'].sudo().create(move_vals)
+        self._apply_exchange_rate(
+            currency=currency,
+            payload=data,
+            default_date=data['invoice_date'],
+            lookup=lookup,
+        )
+        move.action_post()
+        if cfdi_uuid:
+            move.sudo().write({'l10n_mx_edi_cfdi_uuid': cfdi_uuid})
+        return move
+
+    def _create_moves_in_batches(self, pending_moves, batch_size, errors, data_key):
+        """Create and post prepared moves with one create()/action_post() per chunk.
+
+        A chunk that fails is rolled back and replayed one move at a time, each
+        in its own savepoint, so a single bad document only fails itself.
+        """
+        created_ids = []
+        move_model = self.env['account.move'].sudo()
+        for chunk in self._split_chunks(pending_moves, batch_size):
+            try:
+                with self.env.cr.savepoint():
+                    moves = move_model.create([entry['vals'] for entry in chunk])
+                    self._apply_exchange_rates([
+                        (entry['currency'], entry['data'], entry['data']['invoice_date'])
+                        for entry in chunk
+                    ])
+                    moves.action_post()
+                    for entry, move in zip(chunk, moves):
+                        if entry['cfdi_uuid']:
+                            move.write({'l10n_mx_edi_cfdi_uuid': entry['cfdi_uuid']})
+                created_ids.extend(moves.ids)
+                _logger.info("Batch-created %s moves: %s", len(moves), moves.ids)
+                continue
+            except Exception as chunk_err:
+                _logger.warning(
+                    "Batch of %s moves failed (%s); retrying one by one.",
+                    len(chunk), chunk_err,
+                )
+
+            for entry in chunk:
+                try:
+                    with self.env.cr.savepoint():
+                        move = self._create_and_post_move(
+                            entry['vals'], entry['currency'], entry['data'], entry['cfdi_uuid'],
+                        )
+                    created_ids.append(move.id)
+                except Exception as e:
+                    _logger.error(f"Error creating move from batch: {str(e)}", exc_info=True)
+                    errors.append({data_key: entry['data'], 'error': str(e)})
+        return created_ids
+
+    @api.model
+    def _parse_flag(self, value):
+        # Query-string options arrive as strings ("0", "false").
+        if isinstance(value, str):
+            return value.strip().lower() in ('1', 'true', 'yes', 'on')
+        return bool(value)
+
+    @api.model
+    def _parse_ingestion_options(self, options):
+        options = options or {}
+        try:
+            batch_size = int(options.get('batch_size') or 0)
+        except (TypeError, ValueError):
+            batch_size = 0
+        return {
+            'batch_mode': self._parse_flag(options.get('batch_mode')),
+            'batch_size': batch_size if batch_size > 0 else self.BATCH_CREATE_SIZE,
+        }
+
+    @api.model
+    def _parse_error_mode(self, options):
+        mode = str((options or {}).get('error_mode') or '').strip().lower()
+        return 'compact' if mode == 'compact' else 'full'
+
+    def _error_code(self, message):
+        for prefix, code in self.ERROR_CODES:
+            if message.startswith(prefix):
+                return code
+        return 'ingestion_error'
+
+    def _error_document_indexes(self, documents, errors, data_key):
+        """Payload index of the document behind each error (None if unknown);
+        line-item errors resolve to the document owning the line."""
+        document_index = {id(document): index for index, document in enumerate(documents)}
+        line_index = None
+        indexes = []
+        for error in errors:
+            if data_key in error:
+                indexes.append(document_index.get(id(error[data_key])))
+                continue
+            if line_index is None:
+                line_index = {
+                    id(line): index
+                    for index, document in enumerate(documents)
+                    if isinstance(document, dict)
+                    for line in (document.get('invoice_line_ids') or [])
+                }
+            indexes.append(line_index.get(id(error.get('line_item'))))
+        return indexes
+
+    def _compact_errors(self, documents, errors, data_key, index_offset=0):
+        """Turn ``errors`` into one entry per error code with a count and the
+        payload index/ref/UUID and message of every affected document,
+        instead of echoing the whole document back.
+
+        Messages embed the ref, UUID or move id of their document, so they
+        are kept per document rather than used to group errors.
+        """
+        groups = {}
+        for error, index in zip(errors, self._error_document_indexes(documents, errors, data_key)):
+            document = documents[index] if index is not None else {}
+            if not isinstance(document, dict):
+                document = {}
+
+            message = str(error.get('error') or '')
+            code = self._error_code(message)
+            group = groups.setdefault(code, {
+                'code': code,
+                'count': 0,
+                'documents': [],
+            })
+            group['count'] += 1
+            group['documents'].append({
+                'index': index + index_offset if index is not None else None,
+                'ref': self._extract_reference_value(document) or False,
+                'uuid': self._extract_uuid_value(document) or False,
+                'message': message,
+            })
+        return list(groups.values())
+
+    @api.model
+    def _merge_compact_errors(self, *error_lists):
+        groups = {}
+        for errors in error_lists:
+            for error in errors:
+                group = groups.get(error['code'])
+                if group is None:
+                    groups[error['code']] = dict(error, documents=list(error['documents']))
+                else:
+                    group['count'] += error['count']
+                    group['documents'] += error['documents']
+        return list(groups.values())
+
+    @api.model
+    def ingest_bills(self, bills, batch_mode=False, batch_size=None, lookup=None):
+        """Create and post vendor bills from API payload dicts.
+
+        Returns the ``created_bills``/``errors``/``lookup_cache`` part of the
+        ``/api/receive_bills`` response. Pass ``lookup`` to share one
+        :class:`IngestionLookupCache` across several chunks of a payload.
+        """
+        batch_size = batch_size or self.BATCH_CREATE_SIZE
+        pending_moves = []
+
+        created_bills = []
+        errors = []
+        seen_references = set()
+        seen_uuids = set()
+        lookup = lookup or IngestionLookupCache(self, self.env)
+        existing_moves = self._prefetch_existing_moves(bills, ['in_invoice', 'in_refund'])
+        for bill_data in bills:
+            try:
+                with self.env.cr.savepoint(), lookup.document():
+                    reference = self._extract_reference_value(bill_data)
+                    cfdi_uuid = self._extract_uuid_value(bill_data)
+                    requested_move_type = bill_data.get('move_type')
+                    allowed_move_types = [requested_move_type] if requested_move_type else ['in_invoice', 'in_refund']
+                    if reference:
+                        if reference in seen_references:
+                            errors.append({
+                                'bill_data': bill_data,
+                                'error': f"Duplicate reference in request payload: '{reference}'",
+                            })
+                            continue
+
+                        existing_move_id = self._match_prefetched_move(
+                            existing_moves['reference'], reference, allowed_move_types,
+                        )
+                        if existing_move_id:
+                            errors.append({
+                                'bill_data': bill_data,
+                                'error': f"Duplicate reference already exists on move id={existing_move_id}: '{reference}'",
+                            })
+                            continue
+                    if cfdi_uuid:
+                        if cfdi_uuid in seen_uuids:
+                            errors.append({
+                                'bill_data': bill_data,
+                                'error': f"Duplicate CFDI UUID in request payload: '{cfdi_uuid}'",
+                            })
+                            continue
+
+                        existing_move_id = self._match_prefetched_move(
+                            existing_moves['uuid'], cfdi_uuid, allowed_move_types,
+                        )
+                        if existing_move_id:
+                            errors.append({
+                                'bill_data': bill_data,
+                                'error': f"Duplicate CFDI UUID already exists on move id={existing_move_id}: '{cfdi_uuid}'",
+                            })
+                            continue
+                    if reference:
+                        seen_references.add(reference)
+                    if cfdi_uuid:
+                        seen_uuids.add(cfdi_uuid)
+
+                    partner_name = (bill_data.get('partner_id') or {}).get('name')
+                    partner = lookup.partner(
+                        partner_name=partner_name,
+                        raw_vat=(bill_data.get('partner_id') or {}).get('vat', ''),
+                        rank_field='supplier_rank',
+                    )
+
+                    currency = None
+                    if 'currency_code' in bill_data:
+                        currency = lookup.currency(bill_data['currency_code'])
+                        if not currency:
+                            errors.append({'bill_data': bill_data, 'error': f"Currency '{bill_data['currency_code']}' not found."})
+                            continue
+                    else:
+                        currency = lookup.currency('USD')
+                        if not currency:
+                            errors.append({'bill_data': bill_data, 'error': "USD currency not found."})
+                            continue
+
+                    invoice_line_ids = []
+                    for line in bill_data['invoice_line_ids']:
+                        product = lookup.product(line['name'])
+
+                        tax_ids = []
+                        for tax in line.get('tax_ids', []):
+                            try:
+                                resolved_tax = lookup.tax(
+                                    tax_data=tax,
+                                    type_tax_use='purchase',
+                                )
+                                tax_ids.append(resolved_tax.id)
+                            except Exception as e:
+                                errors.append({
+                                    'line_item': line,
+                                    'error': f'Failed to create tax: {str(e)}'
+                                })
+                                continue
+
+                        invoice_line_ids.append((0, 0, {
+                            'name': line['name'],
+                            'quantity': line['quantity'],
+                            'price_unit': line['price_unit'],
+                            'account_id': line['account_id'],
+                            'product_id': product.id,
+                            'tax_ids': [(6, 0, tax_ids)]
+                        }))
+
+                    bill_vals = {
+                        'move_type': bill_data['move_type'],
+                        'journal_id': bill_data['journal_id'],
+                        'ref': bill_data.get('name', ''),
+                        'invoice_date': bill_data['invoice_date'],
+                        'invoice_date_due': bill_data.get('invoice_date_due', bill_data['invoice_date']),
+                        'partner_id': partner.id,
+                        'invoice_line_ids': invoice_line_ids,
+                        'l10n_mx_edi_cfdi_uuid': cfdi_uuid,
+                        'currency_id': currency.id
+                    }
+
+                    if batch_mode:
+                        pending_moves.append({
+                            'data': bill_data,
+                            'vals': bill_vals,
+                            'currency': currency,
+                            'cfdi_uuid': cfdi_uuid,
+                        })
+                        continue
+
+                    bill = self._create_and_post_move(bill_vals, currency, bill_data, cfdi_uuid, lookup=lookup)
+                    created_bills.append(bill.id)
+                    _logger.info(f"Created bill {bill.id} for {partner_name}")
+            except IngestionConflict as conflict:
+                if self.env.context.get('ingestion_job_worker'):
+                    # The job worker retries the whole chunk in a new transaction.
+                    raise
+                _logger.warning("Concurrent creation while processing bill: %s", conflict)
+                errors.append({'bill_data': bill_data, 'error': f"Concurrent creation: {conflict} Retry this document."})
+                continue
+            except Exception as e:
+                _logger.error(f"Error processing bill: {str(e)}", exc_info=True)
+                errors.append({'bill_data': bill_data, 'error': str(e)})
+                continue
+
+        if pending_moves:
+            created_bills.extend(self._create_moves_in_batches(pending_moves, batch_size, errors, 'bill_data'))
+
+        return {
+            'created_bills': created_bills,
+            'errors': errors,
+            'lookup_cache': lookup.stats(),
+        }
+
+    @api.model
+    def ingest_invoices(self, invoices, batch_mode=False, batch_size=None, lookup=None):
+        """Create and post customer invoices from API payload dicts.
+
+        Returns the ``created_invoices``/``errors``/``lookup_cache`` part of
+        the ``/api/receive_invoices`` response.
+        """
+        batch_size = batch_size or self.BATCH_CREATE_SIZE
+        pending_moves = []
+
+        created_invoices = []
+        errors = []
+        seen_references = set()
+        seen_uuids = set()
+        lookup = lookup or IngestionLookupCache(self, self.env)
+        existing_moves = self._prefetch_existing_moves(invoices, ['out_invoice', 'out_refund'])
+        for invoice_data in invoices:
+            try:
+                with self.env.cr.savepoint(), lookup.document():
+                    reference = self._extract_reference_value(invoice_data)
+                    cfdi_uuid = self._extract_uuid_value(invoice_data)
+                    requested_move_type = invoice_data.get('move_type')
+                    allowed_move_types = [requested_move_type] if requested_move_type else ['out_invoice', 'out_refund']
+                    if reference:
+                        if reference in seen_references:
+                            errors.append({
+                                'invoice_data': invoice_data,
+                                'error': f"Duplicate reference in request payload: '{reference}'",
+                            })
+                            continue
+
+                        existing_move_id = self._match_prefetched_move(
+                            existing_moves['reference'], reference, allowed_move_types,
+                        )
+                        if existing_move_id:
+                            errors.append({
+                                'invoice_data': invoice_data,
+                                'error': f"Duplicate reference already exists on move id={existing_move_id}: '{reference}'",
+                            })
+                            continue
+                    if cfdi_uuid:
+                        if cfdi_uuid in seen_uuids:
+                            errors.append({
+                                'invoice_data': invoice_data,
+                                'error': f"Duplicate CFDI UUID in request payload: '{cfdi_uuid}'",
+                            })
+                            continue
+
+                        existing_move_id = self._match_prefetched_move(
+                            existing_moves['uuid'], cfdi_uuid, allowed_move_types,
+                        )
+                        if existing_move_id:
+                            errors.append({
+                                'invoice_data': invoice_data,
+                                'error': f"Duplicate CFDI UUID already exists on move id={existing_move_id}: '{cfdi_uuid}'",
+                            })
+                            continue
+                    if reference:
+                        seen_references.add(reference)
+                    if cfdi_uuid:
+                        seen_uuids.add(cfdi_uuid)
+
+                    partner_name = (invoice_data.get('partner_id') or {}).get('name')
+                    partner = lookup.partner(
+                        partner_name=partner_name,
+                        raw_vat=(invoice_data.get('partner_id') or {}).get('vat', ''),
+                        rank_field='customer_rank',
+                    )
+
+                    currency = lookup.currency(invoice_data['currency_code'])
+                    if not currency:
+                        raise ValueError(f"Currency '{invoice_data['currency_code']}' not found.")
+
+                    invoice_line_ids = []
+                    for line in invoice_data['invoice_line_ids']:
+                        product = lookup.product(line['name'])
+
+                        tax_ids = []
+                        for tax in line.get('tax_ids', []):
+                            resolved_tax = lookup.tax(
+                                tax_data=tax,
+                                type_tax_use='sale',
+                            )
+                            tax_ids.append(resolved_tax.id)
+
+                        resolved_account_id = False
+                        requested_account_id = line.get('account_id')
+                        if requested_account_id:
+                            requested_account = self.env['account.account'].sudo().browse(requested_account_id).exists()
+                            if requested_account and requested_account.account_type not in ('asset_receivable', 'liability_payable'):
+                                resolved_account_id = requested_account.id
+                            else:
+                                _logger.warning(
+                                    "Invalid account_id %s for invoice line '%s'. "
+                                    "Expected an income/other account, not receivable/payable.",
+                                    requested_account_id, line['name']
+                                )
+
+                        if not resolved_account_id:
+                            income_account = product.property_account_income_id or product.categ_id.property_account_income_categ_id
+                            if income_account and income_account.account_type not in ('asset_receivable', 'liability_payable'):
+                                resolved_account_id = income_account.id
+
+                        if not resolved_account_id:
+                            raise ValueError(
+                                f"No valid income account found for invoice line '{line['name']}'. "
+                                "Provide a valid income account_id."
+                            )
+
+                        invoice_line_ids.append((0, 0, {
+                            'name': line['name'],
+                            'quantity': line['quantity'],
+                            'price_unit': line['price_unit'],
+                            'account_id': resolved_account_id,
+                            'product_id': product.id,
+                            'tax_ids': [(6, 0, tax_ids)]
+                        }))
+
+                    modo_pago_code = invoice_data.get('modo_pago', '99')
+                    payment_method = self.env['l10n_mx_edi.payment.method'].sudo().search([
+                        ('code', '=', modo_pago_code)
+                    ], limit=1)
+
+                    invoice_vals = {
+                        'move_type': invoice_data['move_type'],
+                        'journal_id': invoice_data['journal_id'],
+                        'ref': invoice_data.get('name', ''),
+                        'l10n_mx_edi_cfdi_uuid': cfdi_uuid,
+                        'invoice_date': invoice_data['invoice_date'],
+                        'invoice_date_due': invoice_data.get('invoice_date_due', invoice_data['invoice_date']),
+                        'partner_id': partner.id,
+                        "l10n_mx_edi_cfdi_to_public": False,
+                        'invoice_line_ids': invoice_line_ids,
+                        'l10n_mx_edi_usage': invoice_data.get('uso_cfdi', 'G03'),
+                        'l10n_mx_edi_payment_method_id': payment_method.id if payment_method else False,
+                        'currency_id': currency.id
+                    }
+
+                    if invoice_data.get('invoice_name'):
+                        invoice_vals['name'] = invoice_data['invoice_name']
+
+                    if batch_mode:
+                        pending_moves.append({
+                            'data': invoice_data,
+                            'vals': invoice_vals,
+                            'currency': currency,
+                            'cfdi_uuid': cfdi_uuid,
+                        })
+                        continue
+
+                    invoice = self._create_and_post_move(invoice_vals, currency, invoice_data, cfdi_uuid, lookup=lookup)
+                    created_invoices.append(invoice.id)
+
+                    _logger.info(f"Created invoice {invoice.id} for {partner_name}")
+            except IngestionConflict as conflict:
+                if self.env.context.get('ingestion_job_worker'):
+                    # The job worker retries the whole chunk in a new transaction.
+                    raise
+                _logger.warning("Concurrent creation while processing invoice: %s", conflict)
+                errors.append({'invoice_data': invoice_data, 'error': f"Concurrent creation: {conflict} Retry this document."})
+                continue
+            except Exception as e:
+                _logger.error(f"Error processing invoice: {str(e)}", exc_info=True)
+                errors.append({'invoice_data': invoice_data, 'error': str(e)})
+                continue
+
+        if pending_moves:
+            created_invoices.extend(self._create_moves_in_batches(pending_moves, batch_size, errors, 'invoice_data'))
+
+        return {
+            'created_invoices': created_invoices,
+            'errors': errors,
+            'lookup_cache': lookup.stats(),
+        }
+
+    def ingest_credit_note(self, credit_note):
+        """Create a vendor credit note and reconcile it against the posted bill
+        referenced by its cfdirelacionado. Validation failures are returned as
+        ``{'error': ...}``; unexpected failures raise."""
+        cfdi_relacionado = str(
+            credit_note.get('cfdirelacionado')
+            or credit_note.get('cfdi_relacionado')
+            or credit_note.get('folio_relacionado')
+            or ''
+        ).strip()
+        if not cfdi_relacionado:
+            return {'error': 'Missing cfdirelacionado'}
+        if not credit_note.get('journal_id'):
+            return {'error': 'Missing journal_id'}
+        if not credit_note.get('invoice_date'):
+            return {'error': 'Missing invoice_date'}
+        if not credit_note.get('invoice_line_ids'):
+            return {'error': 'Missing invoice_line_ids'}
+
+        _, related_bill = self._find_move_by_cfdi_uuid(
+            uuid=cfdi_relacionado,
+            allowed_move_types=['in_invoice'],
+            allowed_states=['posted'],
+        )
+        if not related_bill:
+            return {'error': f"Related bill not found for l10n_mx_edi_cfdi_uuid '{cfdi_relacionado}'"}
+
+        reference = self._extract_reference_value(credit_note)
+        if reference:
+            _, existing_move = self._find_move_by_reference(
+                reference=reference,
+                allowed_move_types=['out_refund'],
+            )
+            if existing_move:
+                return {
+                    'error': f"Duplicate reference already exists on move id={existing_move.id}: '{reference}'",
+                }
+
+        cfdi_uuid = self._extract_uuid_value(credit_note)
+
+        partner_payload = credit_note.get('partner_id') or {}
+        raw_vat = (credit_note.get('partner_id') or {}).get('vat', '')
+        normalized_vat = self._normalize_vat(raw_vat)
+        partner_name = partner_payload.get('name') or related_bill.partner_id.name
+        mx_country_id = self._get_mx_country_id()
+        partner_model = self.env['res.partner'].sudo().with_context(no_vat_validation=True)
+
+        if not partner_payload:
+            partner = related_bill.partner_id
+        else:
+            partner = partner_model.search([
+                ('name', '=', partner_name),
+                ('vat', 'in', [normalized_vat, raw_vat]),
+            ], limit=1)
+            if not partner and partner_name:
+                partner = partner_model.search([('name', '=', partner_name)], limit=1)
+        if not partner:
+            partner_vals = {
+                'name': partner_name,
+                'vat': normalized_vat,
+                'customer_rank': 1,
+            }
+            if mx_country_id:
+                partner_vals['country_id'] = mx_country_id
+            partner = partner_model.create(partner_vals)
+        else:
+            update_vals = {}
+            if normalized_vat and partner.vat != normalized_vat:
+                update_vals['vat'] = normalized_vat
+            if mx_country_id and not partner.country_id:
+                update_vals['country_id'] = mx_country_id
+            if update_vals:
+                partner_model.browse(partner.id).write(update_vals)
+
+        currency_code = credit_note.get('currency_code') or related_bill.currency_id.name
+        currency = self.env['res.currency'].sudo().search([
+            ('name', '=', currency_code)
+        ], limit=1)
+        if not currency:
+            return {'error': f"Currency '{currency_code}' not found."}
+
+        invoice_line_ids = []
+        for line in credit_note.get('invoice_line_ids', []):
+            product = self.env['product.product'].sudo().search([
+                ('name', '=', line['name'])
+            ], limit=1)
+            if not product:
+                product = self.env['product.product'].sudo().create({
+                    'name': line['name'],
+                    'type': 'service',
+                })
+
+            tax_ids = []
+            for tax in line.get('tax_ids', []):
+                resolved_tax = self._find_existing_tax(
+                    tax_data=tax,
+                    type_tax_use='sale',
+                )
+                tax_ids.append(resolved_tax.id)
+
+            resolved_account_id = False
+            requested_account_id = line.get('account_id')
+            if requested_account_id:
+                requested_account = self.env['account.account'].sudo().browse(requested_account_id).exists()
+                if requested_account and requested_account.account_type not in ('asset_receivable', 'liability_payable'):
+                    resolved_account_id = requested_account.id
+                else:
+                    _logger.warning(
+                        "Invalid account_id %s for credit note line '%s'. "
+                        "Expected an income/other account, not receivable/payable.",
+                        requested_account_id, line['name']
+                    )
+
+            if not resolved_account_id:
+                income_account = product.property_account_income_id or product.categ_id.property_account_income_categ_id
+                if income_account and income_account.account_type not in ('asset_receivable', 'liability_payable'):
+                    resolved_account_id = income_account.id
+
+            if not resolved_account_id:
+                raise ValueError(
+                    f"No valid income account found for credit note line '{line['name']}'. "
+                    "Provide a valid income account_id."
+                )
+
+            invoice_line_ids.append((0, 0, {
+                'name': line['name'],
+                'quantity': line['quantity'],
+                'price_unit': line['price_unit'],
+                'account_id': resolved_account_id,
+                'product_id': product.id,
+                'tax_ids': [(6, 0, tax_ids)],
+            }))
+
+        if not invoice_line_ids:
+            return {'error': 'Missing invoice_line_ids'}
+
+        modo_pago_code = credit_note.get('modo_pago', '99')
+        payment_method = self.env['l10n_mx_edi.payment.method'].sudo().search([
+            ('code', '=', modo_pago_code)
+        ], limit=1)
+
+        credit_note_vals = {
+            'move_type': 'in_refund',
+            'journal_id': credit_note['journal_id'],
+            'ref': credit_note.get('name', ''),
+            'l10n_mx_edi_cfdi_uuid': cfdi_uuid,
+            'invoice_date': credit_note['invoice_date'],
+            'invoice_date_due': credit_note.get('invoice_date_due', credit_note['invoice_date']),
+            'partner_id': partner.id,
+            'invoice_line_ids': invoice_line_ids,
+            'currency_id': currency.id,
+            'l10n_mx_edi_usage': credit_note.get('uso_cfdi', 'G03'),
+            'l10n_mx_edi_payment_method_id': payment_method.id if payment_method else False,
+        }
+        if 'l10n_mx_edi_cfdi_to_public' in self.env['account.move']._fields:
+            credit_note_vals['l10n_mx_edi_cfdi_to_public'] = False
+
+        related_uuid = ''
+        if 'l10n_mx_edi_cfdi_uuid' in related_bill._fields:
+            related_uuid = (related_bill.l10n_mx_edi_cfdi_uuid or '').strip()
+        if not related_uuid and 'folio_fiscal' in related_bill._fields:
+            related_uuid = (related_bill.folio_fiscal or '').strip()
+        if related_uuid and 'l10n_mx_edi_origin' in self.env['account.move']._fields:
+            credit_note_vals['l10n_mx_edi_origin'] = "%s|%s" % (
+                credit_note.get('tipo_relacion', '01'),
+                related_uuid,
+            )
+
+        if credit_note.get('invoice_name'):
+            credit_note_vals['name'] = credit_note['invoice_name']
+
+        credit_move = self.env['account.move'].sudo().create(credit_note_vals)
+        self._apply_exchange_rate(
+            currency=currency,
+            payload=credit_note,
+            default_date=credit_note['invoice_date'],
+        )
+        credit_move.action_post()
+        self._reconcile_moves(credit_move, related_bill, 'payable')
+
+        if cfdi_uuid:
+            credit_move.sudo().write({'l10n_mx_edi_cfdi_uuid': cfdi_uuid})
+
+        _logger.info(
+            "Created vendor credit note %s and applied it to bill %s using CFDI related UUID %s",
+            credit_move.id, related_bill.id, cfdi_relacionado,
+        )
+        return {
+            'success': 'Credit note created and applied',
+            'credit_note_id': credit_move.id,
+            'credit_note_name': credit_move.name,
+            'credit_note_ref': credit_move.ref,
+            'related_bill_id': related_bill.id,
+            'related_bill_name': related_bill.name,
+            'cfdirelacionado': cfdi_relacionado,
+            'amount_total': credit_move.amount_total,
+            'amount_residual': credit_move.amount_residual,
+        }
+
+    def ingest_document(self, document, lookup=None):
+        """Ingest one document whose ``kind`` is ``bill``, ``invoice`` or
+        ``credit_note`` and return a compact per-document result."""
+        kind = document.get('kind')
+        result = {
+            'kind': kind,
+            'ref': self._extract_reference_value(document) or False,
+            'uuid': self._extract_uuid_value(document) or False,
+        }
+
+        if kind == 'credit_note':
+            with self.env.cr.savepoint():
+                response = self.ingest_credit_note(document)
+            if response.get('error'):
+                result.update(status='error', error=response['error'])
+            else:
+                result.update(status='created', move_id=response['credit_note_id'])
+            return result
+
+        if kind == 'bill':
+            response = self.ingest_bills([document], lookup=lookup)
+            created_ids, data_key = response['created_bills'], 'bill_data'
+        elif kind == 'invoice':
+            response = self.ingest_invoices([document], lookup=lookup)
+            created_ids, data_key = response['created_invoices'], 'invoice_data'
+        else:
+            result.update(status='error', error=f"Unknown document kind '{kind}'")
+            return result
+
+        document_errors = [error['error'] for error in response['errors'] if data_key in error]
+        line_errors = [error['error'] for error in response['errors'] if data_key not in error]
+        if created_ids:
+            result.update(status='created', move_id=created_ids[0])
+            if line_errors:
+                result['warnings'] = line_errors
+        else:
+            result.update(
+                status='error',
+                error=(document_errors or line_errors or ['Document was not created'])[0],
+            )
+        return result
@@ -0,0 +1,498 @@
+import base64
+import json
+import logging
+from collections import defaultdict
+
+from odoo import api, fields, models
+from odoo.tools import float_compare
+
+_logger = logging.getLogger(__name__)
+
+
+class BillReceivePayment(models.AbstractModel):
+    """Payment registration engine behind the /api/register_*_payment(s)
+    endpoints, usable with or without an HTTP request."""
+
+    _name = 'bill.receive.payment'
+    _description = 'Bill Receive Payment Service'
+
+    PAYMENT_KINDS = {
+        'bill': {
+            'label': 'Bill',
+            'move_types': ['in_invoice', 'in_refund'],
+            'payment_type': 'outbound',
+            'partner_type': 'supplier',
+            'method_lines_field': 'outbound_payment_method_line_ids',
+            'account_type': 'liability_payable',
+            'internal_group': 'payable',
+            'move_key': 'bill_id',
+        },
+        'invoice': {
+            'label': 'Invoice',
+            'move_types': ['out_invoice', 'out_refund'],
+            'payment_type': 'inbound',
+            'partner_type': 'customer',
+            'method_lines_field': 'inbound_payment_method_line_ids',
+            'account_type': 'asset_receivable',
+            'internal_group': 'receivable',
+            'move_key': 'invoice_id',
+        },
+    }
+
+    def _ingestion_service(self):
+        return self.env['bill.receive.ingestion'].sudo()
+
+    def _update_invoice_exchange_rate(self, move, exchange_rate, rate_date=None):
+        result = self.rerate_invoices([(move, exchange_rate, rate_date)])
+        return not result['skipped']
+
+    @api.model
+    def rerate_invoices(self, items):
+        """Apply ``(move, exchange_rate, rate_date)`` rates to many foreign
+        currency invoices.
+
+        Moves sharing a rate get one ``invoice_currency_rate`` write, so the
+        ORM recomputes just their dependent line amounts; moves already at
+        that rate are not written. Moves that cannot take the field fall back
+        to one currency-rate-table upsert for the whole batch. Nothing is
+        invalidated beyond what the writes themselves touch.
+        """
+        ingestion = self._ingestion_service()
+        company_currency = self.env.company.currency_id
+        has_invoice_rate = 'invoice_currency_rate' in self.env['account.move']._fields
+        result = {'updated': [], 'unchanged': [], 'rate_table': [], 'skipped': []}
+        moves_by_rate = defaultdict(list)
+        table_rates = {}
+
+        for move, exchange_rate, rate_date in items:
+            exchange_rate = ingestion._parse_exchange_rate_value(exchange_rate)
+            if not exchange_rate or not move or not move.currency_id or not company_currency \
+                    or move.currency_id == company_currency:
+                result['skipped'].append(move.id if move else False)
+                continue
+
+            # Odoo invoice widgets usually display the inverse rate:
+            # 1 company_currency = X invoice_currency.
+            invoice_rate = 1.0 / exchange_rate
+            table_rate = (
+                move.currency_id,
+                rate_date or move.invoice_date or fields.Date.context_today(self.env.user),
+                exchange_rate,
+            )
+            if not has_invoice_rate:
+                table_rates[move.id] = table_rate
+            elif float_compare(move.invoice_currency_rate or 0.0, invoice_rate, precision_digits=12) == 0:
+                result['unchanged'].append(move.id)
+            else:
+                moves_by_rate[invoice_rate].append((move, table_rate))
+
+        move_model = self.env['account.move'].sudo().with_context(check_move_validity=False)
+        for invoice_rate, entries in moves_by_rate.items():
+            moves = move_model.browse([move.id for move, _table_rate in entries])
+            try:
+                with self.env.cr.savepoint():
+                    moves.write({'invoice_currency_rate': invoice_rate})
+                result['updated'] += moves.ids
+                continue
+            except Exception as batch_err:
+                _logger.info("Batch re-rate of %s invoices failed (%s); retrying one by one.", len(moves), batch_err)
+            for move, table_rate in entries:
+                try:
+                    with self.env.cr.savepoint():
+                        move_model.browse(move.id).write({'invoice_currency_rate': invoice_rate})
+                    result['updated'].append(move.id)
+                except Exception as write_err:
+                    _logger.info(
+                        "Could not write invoice_currency_rate on move %s: %s. Falling back to currency rate table.",
+                        move.id, write_err,
+                    )
+                    table_rates[move.id] = table_rate
+
+        if table_rates:
+            self.env['res.currency.rate'].sudo()._upsert_company_rates(list(table_rates.values()))
+            result['rate_table'] += list(table_rates)
+
+        _logger.info(
+            "Re-rated invoices: %s updated, %s unchanged, %s via rate table, %s skipped",
+            len(result['updated']), len(result['unchanged']), len(result['rate_table']), len(result['skipped']),
+        )
+        return result
+
+    def _reconciliation_service(self):
+        return self.env['bill.receive.reconciliation'].sudo()
+
+    def _assign_payment_to_move(self, move, payment, account_internal_group):
+        """Reconcile a posted payment with a move, raising ``ValueError`` on failure."""
+        self._reconciliation_service().reconcile_pair(move, payment, account_internal_group)
+
+    def _resolve_moves_by_uuid(self, uuids, move_types, states=('posted',)):
+        """Map each upper-cased UUID to its move with chunked ``IN`` searches,
+        keeping the first match in the default move order like ``search(limit=1)``."""
+        account_move = self.env['account.move'].sudo()
+        ingestion = self._ingestion_service()
+        moves_by_uuid = {}
+        for chunk in ingestion._split_chunks(sorted(set(uuids) - {''})):
+            for move in account_move.search([
+                ('move_type', 'in', move_types),
+                ('state', 'in', list(states)),
+            ] + ingestion._build_uuids_domain(chunk)):
+                for uuid in ingestion._matched_uuids(move.cfdi_uuid_normalized, move.folio_fiscal, chunk):
+                    moves_by_uuid.setdefault(uuid, move)
+        return moves_by_uuid
+
+    def _prepare_payment(self, kind, move, payment_data, journals, currencies):
+        """Validate one item and return the ``account.payment`` values for it,
+        applying its exchange rate first so posting picks it up."""
+        spec = self.PAYMENT_KINDS[kind]
+        ingestion = self._ingestion_service()
+
+        pay_journal = journals.get(str(payment_data['journal_id']))
+        if not pay_journal:
+            raise ValueError(f"Journal not found (id={payment_data['journal_id']})")
+
+        pay_method_line = pay_journal[spec['method_lines_field']][:1]
+        if not pay_method_line:
+            raise ValueError(
+                f"No {spec['payment_type']} payment method configured on journal '{pay_journal.name}' (id={pay_journal.id})."
+            )
+
+        currency = move.currency_id
+        currency_code = payment_data.get('currency_code')
+        if currency_code:
+            currency = currencies.get(currency_code)
+            if not currency:
+                raise ValueError(f"Currency '{currency_code}' not found.")
+
+        counterpart_line = move.line_ids.filtered(
+            lambda l: l.account_id.account_type == spec['account_type']
+        )[:1]
+        if not counterpart_line:
+            raise ValueError(f"{spec['label']} {move.id} has no {spec['internal_group']} line to pay.")
+
+        amount = payment_data.get('amount', move.amount_residual)
+        if kind == 'bill':
+            payment_date = payment_data.get('payment_date') or (
+                str(move.invoice_date) if move.invoice_date else fields.Date.context_today(self.env.user)
+            )
+            ingestion._apply_exchange_rate(currency=currency, payload=payment_data, default_date=payment_date)
+        else:
+            payment_date = payment_data.get('payment_date', fields.Date.context_today(self.env.user))
+            exchange_rate = ingestion._parse_exchange_rate_value(payment_data.get('exchange_rate'))
+            if exchange_rate:
+                self._update_invoice_exchange_rate(
+                    move=move,
+                    exchange_rate=exchange_rate,
+                    rate_date=payment_data.get('invoice_date') or move.invoice_date,
+                )
+                ingestion._apply_exchange_rate(
+                    currency=currency,
+                    payload={'exchange_rate': exchange_rate, 'rate_date': payment_date},
+                    default_date=payment_date,
+                )
+
+        return {
+            'payment_type': spec['payment_type'],
+            'partner_type': spec['partner_type'],
+            'partner_id': move.partner_id.id,
+            'amount': amount,
+            'date': payment_date,
+            'journal_id': pay_journal.id,
+            'currency_id': currency.id,
+            'payment_method_line_id': pay_method_line.id,
+            'destination_account_id': counterpart_line.account_id.id,
+        }
+
+    def _create_payments(self, entries):
+        """Create the payments of ``entries`` with one multi-record ``create()``;
+        if that fails, fall back to one savepoint per entry."""
+        payment_model = self.env['account.payment'].sudo()
+        try:
+            with self.env.cr.savepoint():
+                payments = payment_model.create([entry['vals'] for entry in entries])
+            for entry, payment in zip(entries, payments):
+                entry['payment'] = payment
+        except Exception as batch_err:
+            _logger.info("Batch payment create failed (%s); retrying one by one.", batch_err)
+            for entry in entries:
+                try:
+                    with self.env.cr.savepoint():
+                        entry['payment'] = payment_model.create(entry['vals'])
+                except Exception as e:
+                    entry['error'] = str(e)
+
+    def _post_payments(self, entries):
+        """Post all created payments together; on failure post them one by one."""
+        entries = [entry for entry in entries if entry.get('payment')]
+        payments = self.env['account.payment'].sudo().browse([entry['payment'].id for entry in entries])
+        try:
+            with self.env.cr.savepoint():
+                payments.action_post()
+        except Exception as batch_err:
+            _logger.info("Batch payment post failed (%s); retrying one by one.", batch_err)
+            for entry in entries:
+                try:
+                    with self.env.cr.savepoint():
+                        entry['payment'].action_post()
+                except Exception as e:
+                    entry['error'] = str(e)
+                    self._discard_payment(entry)
+
+    def _discard_payment(self, entry):
+        payment = entry.pop('payment', None)
+        if not payment:
+            return
+        try:
+            with self.env.cr.savepoint():
+                if payment.state != 'draft':
+                    payment.action_draft()
+                payment.unlink()
+        except Exception as e:
+            _logger.warning("Could not discard payment %s after a failed item: %s", payment.id, e)
+            entry['payment_id'] = payment.id
+
+    def _apply_grouped_exchange_rates(self, entries, rate_payload):
+        """Upsert the request exchange rate once per (currency, rate date)
+        with a single statement; if that fails, retry per group and give the
+        entries of a failing group its error."""
+        ingestion = self._ingestion_service()
+        if not ingestion._parse_exchange_rate_value((rate_payload or {}).get('exchange_rate')):
+            return
+        groups = {}
+        for entry in entries:
+            rate_date = ingestion._resolve_rate_date(rate_payload, entry['vals']['date'])
+            groups.setdefault((entry['currency'].id, rate_date), []).append(entry)
+        try:
+            with self.env.cr.savepoint():
+                ingestion._apply_exchange_rates([
+                    (group[0]['currency'], rate_payload, rate_date)
+                    for (_currency_id, rate_date), group in groups.items()
+                ])
+            return
+        except Exception as batch_err:
+            _logger.info("Batched rate upsert failed (%s); retrying per currency/date.", batch_err)
+
+        for (_currency_id, rate_date), group in groups.items():
+            try:
+                with self.env.cr.savepoint():
+                    ingestion._apply_exchange_rate(
+                        currency=group[0]['currency'],
+                        payload=rate_payload,
+                        default_date=rate_date,
+                    )
+            except Exception as e:
+                for entry in group:
+                    entry['error'] = str(e)
+
+    def _reconcile_bill_payments(self, entries):
+        """Reconcile each posted payment with its bill in one set-based pass;
+        payments that could not be reconciled are discarded."""
+        entries = [entry for entry in entries if entry.get('payment') and not entry.get('error')]
+        if not entries:
+            return
+        outcome = self._reconciliation_service().reconcile_pairs(
+            [(entry['bill'], entry['payment']) for entry in entries], 'payable'
+        )
+        for error in outcome['errors']:
+            entry = entries[error['index']]
+            entry['error'] = error['error']
+            self._discard_payment(entry)
+
+    @api.model
+    def _encode_unpaid_cursor(self, bill):
+        """Opaque continuation token for the (invoice_date, id) keyset."""
+        position = {'d': str(bill.invoice_date) if bill.invoice_date else None, 'i': bill.id}
+        return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+    @api.model
+    def _decode_unpaid_cursor(self, token):
+        try:
+            position = json.loads(base64.urlsafe_b64decode(str(token).encode('ascii')).decode('utf-8'))
+            return (fields.Date.to_date(position['d']) if position['d'] else None), int(position['i'])
+        except Exception:
+            raise ValueError(f"Invalid cursor '{token}'")
+
+    @api.model
+    def _search_unpaid_bills(self, limit, cursor=None):
+        """Posted, not fully paid vendor bills in (invoice_date, id) order,
+        starting strictly after ``cursor`` so failed bills are not re-selected.
+        Bills without invoice_date sort last, as in ``ORDER BY ... ASC``."""
+        domain = [
+            ('move_type', 'in', ['in_invoice', 'in_refund']),
+            ('state', '=', 'posted'),
+            ('payment_state', 'in', ['not_paid', 'partial']),
+        ]
+        if cursor:
+            after_date, after_id = self._decode_unpaid_cursor(cursor)
+            if after_date:
+                domain += [
+                    '|', '|',
+                    ('invoice_date', '>', after_date),
+                    '&', ('invoice_date', '=', after_date), ('id', '>', after_id),
+                    ('invoice_date', '=', False),
+                ]
+            else:
+                domain += [('invoice_date', '=', False), ('id', '>', after_id)]
+        return self.env['account.move'].sudo().search(domain, limit=limit, order='invoice_date asc, id asc')
+
+    @api.model
+    def pay_unpaid_bills(self, journal, bills, override_currency=None, rate_payload=None):
+        """Pay the full residual of ``bills`` from ``journal`` as a pipeline:
+        payable lines are prefetched in one read, exchange rates are upserted
+        per (currency, date), payments are created in one ``create()``, posted
+        together and reconciled against the prefetched lines.
+
+        Returns ``(paid, errors)`` lists in the /api/register_unpaid_bills_payments format.
+        """
+        pay_method_line = journal.outbound_payment_method_line_ids[:1]
+        paid = []
+        errors = []
+
+        payable_account_by_bill = {}
+        for row in self.env['account.move.line'].sudo().search_read([
+            ('move_id', 'in', bills.ids),
+            ('account_id.account_type', '=', 'liability_payable'),
+        ], ['move_id', 'account_id'], order='id'):
+            payable_account_by_bill.setdefault(row['move_id'][0], row['account_id'][0])
+
+        entries = []
+        for bill in bills:
+            account_id = payable_account_by_bill.get(bill.id)
+            if not account_id:
+                errors.append({'bill_id': bill.id, 'ref': bill.ref, 'error': 'No payable line found'})
+                continue
+            amount = bill.amount_residual
+            if amount <= 0:
+                errors.append({'bill_id': bill.id, 'ref': bill.ref, 'error': 'No residual amount to pay'})
+                continue
+
+            currency = override_currency or bill.currency_id
+            payment_date = str(bill.invoice_date) if bill.invoice_date else fields.Date.context_today(self.env.user)
+            entries.append({
+                'bill': bill,
+                'account_id': account_id,
+                'currency': currency,
+                'vals': {
+                    'payment_type': 'outbound',
+                    'partner_type': 'supplier',
+                    'partner_id': bill.partner_id.id,
+                    'amount': amount,
+                    'date': payment_date,
+                    'journal_id': journal.id,
+                    'currency_id': currency.id,
+                    'payment_method_line_id': pay_method_line.id,
+                    'destination_account_id': account_id,
+                },
+            })
+
+        self._apply_grouped_exchange_rates(entries, rate_payload)
+        pending = [entry for entry in entries if not entry.get('error')]
+        if pending:
+            self._create_payments(pending)
+            self._post_payments(pending)
+            self._reconcile_bill_payments(pending)
+
+        for entry in entries:
+            bill = entry['bill']
+            if entry.get('error'):
+                _logger.error("Failed to pay bill %s: %s", bill.id, entry['error'])
+                errors.append({'bill_id': bill.id, 'ref': bill.ref, 'error': entry['error']})
+                continue
+            paid.append({
+                'bill_id': bill.id,
+                'ref': bill.ref,
+                'payment_id': entry['payment'].id,
+                'amount': entry['vals']['amount'],
+                'payment_date': entry['vals']['date'],
+            })
+        _logger.info("Bulk paid %s of %s unpaid bills", len(paid), len(bills))
+        return paid, errors
+
+    @api.model
+    def register_payments(self, kind, items):
+        """Register many ``{uuid, payment_data}`` payments for posted bills
+        (``kind='bill'``) or customer invoices (``kind='invoice'``).
+
+        Moves, journals and currencies are resolved up front, payments are
+        created with a single ``create()`` and posted together, and all items
+        are reconciled in one set-based pass. Returns one result per item.
+        """
+        spec = self.PAYMENT_KINDS[kind]
+        items = items or []
+        results = []
+        entries = []
+
+        uuids = []
+        for item in items:
+            item = item if isinstance(item, dict) else {}
+            uuids.append(str(item.get('uuid') or item.get(f'{kind}_uuid') or '').strip().upper())
+        moves_by_uuid = self._resolve_moves_by_uuid(uuids, spec['move_types'])
+
+        payment_datas = [
+            (item.get('payment_data') or {}) if isinstance(item, dict) else {}
+            for item in items
+        ]
+        journal_ids = {
+            int(data['journal_id']) for data in payment_datas
+            if str(data.get('journal_id') or '').isdigit()
+        }
+        journals = {
+            str(journal.id): journal
+            for journal in self.env['account.journal'].sudo().browse(list(journal_ids)).exists()
+        }
+        currency_codes = {data['currency_code'] for data in payment_datas if data.get('currency_code')}
+        currencies = {
+            currency.name: currency
+            for currency in self.env['res.currency'].sudo().search([('name', 'in', list(currency_codes))])
+        } if currency_codes else {}
+
+        for index, (uuid, payment_data) in enumerate(zip(uuids, payment_datas)):
+            result = {'index': index, 'uuid': uuid or False}
+            results.append(result)
+            if not uuid:
+                result['error'] = f"Missing uuid (or {kind}_uuid)"
+                continue
+            if not payment_data:
+                result['error'] = 'Missing payment_data'
+                continue
+            if not payment_data.get('journal_id'):
+                result['error'] = 'Missing payment_data.journal_id'
+                continue
+            move = moves_by_uuid.get(uuid)
+            if not move:
+                result['error'] = f"{spec['label']} not found for UUID '{uuid}'"
+                continue
+            result[spec['move_key']] = move.id
+            try:
+                with self.env.cr.savepoint():
+                    vals = self._prepare_payment(kind, move, payment_data, journals, currencies)
+            except Exception as e:
+                result['error'] = str(e)
+                continue
+            entries.append({'result': result, 'move': move, 'vals': vals})
+
+        if entries:
+            self._create_payments(entries)
+            self._post_payments(entries)
+
+        posted = [entry for entry in entries if not entry.get('error')]
+        if posted:
+            outcome = self._reconciliation_service().reconcile_pairs(
+                [(entry['move'], entry['payment']) for entry in posted], spec['internal_group']
+            )
+            for error in outcome['errors']:
+                entry = posted[error['index']]
+                entry['error'] = f"Reconciliation failed: {error['error']}"
+                self._discard_payment(entry)
+
+        for entry in entries:
+            result = entry['result']
+            if entry.get('error'):
+                result['error'] = entry['error']
+                continue
+            result.update(payment_id=entry['payment'].id, payment_date=str(entry['vals']['date']))
+
+        for result in results:
+            result['status'] = 'error' if result.get('error') else 'created'
+        created = sum(1 for result in results if result['status'] == 'created')
+        _logger.info("Registered %s of %s %s payments in batch", created, len(results), kind)
+        return results
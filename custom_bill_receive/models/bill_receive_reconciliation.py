@@ -0,0 +1,135 @@
+import logging
+from collections import defaultdict
+
+from odoo import api, models
+
+_logger = logging.getLogger(__name__)
+
+
+class BillReceiveReconciliation(models.AbstractModel):
+    """Set-based reconciliation of many (document, payment/move) pairs."""
+
+    _name = 'bill.receive.reconciliation'
+    _description = 'Bill Receive Reconciliation Service'
+
+    ACCOUNT_TYPES = {
+        'receivable': 'asset_receivable',
+        'payable': 'liability_payable',
+    }
+
+    def _expected_account_type(self, move, account_internal_group=None):
+        if account_internal_group:
+            return self.ACCOUNT_TYPES[account_internal_group]
+        if move.move_type in ('out_invoice', 'out_refund', 'out_receipt'):
+            return 'asset_receivable'
+        return 'liability_payable'
+
+    def _load_open_lines(self, move_ids):
+        """Unreconciled receivable/payable lines of ``move_ids``, by move, in one query."""
+        open_lines = defaultdict(list)
+        rows = self.env['account.move.line'].sudo().search_read([
+            ('move_id', 'in', list(move_ids)),
+            ('reconciled', '=', False),
+            ('account_id.account_type', 'in', list(self.ACCOUNT_TYPES.values())),
+        ], ['move_id', 'account_id', 'partner_id', 'account_type'], order='id')
+        for row in rows:
+            open_lines[row['move_id'][0]].append({
+                'id': row['id'],
+                'account_id': row['account_id'][0],
+                'partner_id': row['partner_id'][0] if row['partner_id'] else False,
+                'account_type': row['account_type'],
+            })
+        return open_lines
+
+    def _reconcile_group(self, line_sets):
+        line_model = self.env['account.move.line'].sudo()
+        if hasattr(line_model, '_reconcile_plan'):
+            # One call for the whole group, each pair stays its own plan item.
+            line_model._reconcile_plan([line_model.browse(line_ids) for line_ids in line_sets])
+        else:
+            for line_ids in line_sets:
+                line_model.browse(line_ids).reconcile()
+
+    @api.model
+    def reconcile_pairs(self, pairs, account_internal_group=None):
+        """Reconcile each ``(move, counterpart)`` pair, where ``counterpart``
+        is an ``account.payment`` or ``account.move``.
+
+        Candidate receivable/payable lines of every move are loaded in one
+        query, pairs are grouped by (account, partner) and each group is
+        reconciled in one call. Only a failing group falls back to one
+        savepoint per pair. Returns ``{'reconciled': [pair indexes],
+        'errors': [{'index', 'move_id', 'counterpart_move_id', 'error'}]}``.
+        """
+        plan = []
+        for index, (move, counterpart) in enumerate(pairs):
+            counterpart_move = counterpart.move_id if counterpart._name == 'account.payment' else counterpart
+            plan.append((index, move, counterpart_move, self._expected_account_type(move, account_internal_group)))
+
+        open_lines = self._load_open_lines(
+            {move.id for _index, move, _counterpart, _type in plan}
+            | {counterpart.id for _index, _move, counterpart, _type in plan}
+        )
+
+        result = {'reconciled': [], 'errors': []}
+        groups = defaultdict(list)
+        for index, move, counterpart_move, account_type in plan:
+            move_lines = [line for line in open_lines[move.id] if line['account_type'] == account_type]
+            accounts = {line['account_id'] for line in move_lines}
+            counterpart_lines = [
+                line for line in open_lines[counterpart_move.id] if line['account_id'] in accounts
+            ] or [
+                line for line in open_lines[counterpart_move.id] if line['account_type'] == account_type
+            ]
+            if not move_lines or not counterpart_lines:
+                result['errors'].append({
+                    'index': index,
+                    'move_id': move.id,
+                    'counterpart_move_id': counterpart_move.id,
+                    'error': (
+                        f"No unreconciled {account_type} lines found for move {move.id} / {counterpart_move.id}."
+                    ),
+                })
+                continue
+            key = (move_lines[0]['account_id'], move_lines[0]['partner_id'])
+            line_ids = [line['id'] for line in move_lines + counterpart_lines]
+            groups[key].append((index, move, counterpart_move, line_ids))
+
+        for group in groups.values():
+            try:
+                with self.env.cr.savepoint():
+                    self._reconcile_group([line_ids for _index, _move, _counterpart, line_ids in group])
+                result['reconciled'] += [index for index, _move, _counterpart, _line_ids in group]
+                continue
+            except Exception as group_err:
+                _logger.info(
+                    "Group reconciliation of %s pairs failed (%s); retrying pair by pair.",
+                    len(group), group_err,
+                )
+            for index, move, counterpart_move, line_ids in group:
+                try:
+                    with self.env.cr.savepoint():
+                        self._reconcile_group([line_ids])
+                    result['reconciled'].append(index)
+                except Exception as e:
+                    result['errors'].append({
+                        'index': index,
+                        'move_id': move.id,
+                        'counterpart_move_id': counterpart_move.id,
+                        'error': str(e),
+                    })
+
+        result['reconciled'].sort()
+        result['errors'].sort(key=lambda error: error['index'])
+        _logger.info(
+            "Reconciled %s of %s pairs in %s groups",
+            len(result['reconciled']), len(plan), len(groups),
+        )
+        return result
+
+    @api.model
+    def reconcile_pair(self, move, counterpart, account_internal_group=None):
+        """Reconcile a single pair, raising ``ValueError`` if it fails."""
+        result = self.reconcile_pairs([(move, counterpart)], account_internal_group)
+        if result['errors']:
+            raise ValueError(result['errors'][0]['error'])
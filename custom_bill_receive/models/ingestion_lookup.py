@@ -0,0 +1,227 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class IngestionLookupCache:
+    """Request-scoped memo of the master data resolved while ingesting documents.
+
+    Each distinct currency code, partner (name, RFC) pair, product name,
+    (tax name, amount, use) key and exchange rate is resolved once per request. Records created
+    or written while processing a document are only kept once the document's
+    savepoint is released; if the document fails they are evicted so the next
+    document resolves them again from the database.
+    """
+
+    def __init__(self, service, env):
+        self.service = service
+        self.env = env
+        self._entries = {}
+        self._pending_keys = []
+        self._pending_created = []
+        self._mx_country_id = None
+        self._tax_indexes = {}
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self.created = {
+            'partner_ids': [],
+            'product_ids': [],
+        }
+
+    def _lookup(self, kind, key):
+        cache_key = (kind, key)
+        if cache_key in self._entries:
+            self.hits[kind] += 1
+            return True, self._entries[cache_key]
+        self.misses[kind] += 1
+        return False, None
+
+    def _store(self, kind, key, value, pending=False):
+        cache_key = (kind, key)
+        self._entries[cache_key] = value
+        if pending:
+            self._pending_keys.append(cache_key)
+        return value
+
+    @contextmanager
+    def document(self):
+        """Scope cache writes to one document, mirroring its savepoint."""
+        self._pending_keys = []
+        self._pending_created = []
+        try:
+            yield self
+        except Exception:
+            for cache_key in self._pending_keys:
+                self._entries.pop(cache_key, None)
+            self._pending_keys = []
+            self._pending_created = []
+            raise
+        for kind, record_id in self._pending_created:
+            self.created[f'{kind}_ids'].append(record_id)
+        self._pending_keys = []
+        self._pending_created = []
+
+    def mx_country_id(self):
+        if self._mx_country_id is None:
+            self.misses['country'] += 1
+            self._mx_country_id = self.service._get_mx_country_id()
+        else:
+            self.hits['country'] += 1
+        return self._mx_country_id
+
+    def currency(self, code):
+        found, currency = self._lookup('currency', code)
+        if found:
+            return currency
+        currency = self.env['res.currency'].sudo().search([('name', '=', code)], limit=1)
+        return self._store('currency', code, currency)
+
+    def partner(self, partner_name, raw_vat, rank_field):
+        raw_vat = raw_vat or ''
+        normalized_vat = self.service._normalize_vat(raw_vat)
+        key = (partner_name, normalized_vat)
+        found, partner = self._lookup('partner', key)
+        if found:
+            return partner
+
+        mx_country_id = self.mx_country_id()
+        partner_model = self.env['res.partner'].sudo().with_context(no_vat_validation=True)
+
+        partner = partner_model.search([
+            ('name', '=', partner_name),
+            ('vat', 'in', [normalized_vat, raw_vat]),
+        ], limit=1)
+        if not partner and partner_name:
+            partner = partner_model.search([('name', '=', partner_name)], limit=1)
+        if not partner:
+            partner_vals = {
+                'name': partner_name,
+                'vat': normalized_vat,
+                rank_field: 1,
+            }
+            if mx_country_id:
+                partner_vals['country_id'] = mx_country_id
+            self.service._claim_entity_key('partner', f"{normalized_vat}|{partner_name or ''}")
+            partner = partner_model.create(partner_vals)
+            self._pending_created.append(('partner', partner.id))
+            return self._store('partner', key, partner, pending=True)
+
+        update_vals = {}
+        if normalized_vat and partner.vat != normalized_vat:
+            update_vals['vat'] = normalized_vat
+        if mx_country_id and not partner.country_id:
+            update_vals['country_id'] = mx_country_id
+        if update_vals:
+            partner_model.browse(partner.id).write(update_vals)
+        return self._store('partner', key, partner, pending=bool(update_vals))
+
+    def product(self, name):
+        found, product = self._lookup('product', name)
+        if found:
+            return product
+        product_model = self.env['product.product'].sudo()
+        product = product_model.search([('name', '=', name)], limit=1)
+        if product:
+            return self._store('product', name, product)
+        self.service._claim_entity_key('product', name)
+        product = product_model.create({
+            'name': name,
+            'type': 'service',
+        })
+        self._pending_created.append(('product', product.id))
+        return self._store('product', name, product, pending=True)
+
+    def tax(self, tax_data, type_tax_use):
+        tax_data = tax_data or {}
+        key = (tax_data.get('name'), float(tax_data.get('amount', 0.0)), type_tax_use)
+        found, tax = self._lookup('tax', key)
+        if found:
+            return tax
+        tax_index = self._tax_indexes.get(type_tax_use)
+        if tax_index is None:
+            tax_index = self._tax_indexes[type_tax_use] = self.service._build_tax_index(type_tax_use)
+        tax = self.service._find_existing_tax(
+            tax_data=tax_data,
+            type_tax_use=type_tax_use,
+            tax_index=tax_index,
+        )
+        return self._store('tax', key, tax)
+
+    def exchange_rate(self, currency, rate_date, exchange_rate):
+        """Upsert a company rate unless this request already wrote the same
+        value for that currency and date; the last value written wins, as
+        with one upsert per document."""
+        key = (currency.id, rate_date)
+        found, last_written = self._lookup('exchange_rate', key)
+        if found and last_written == exchange_rate:
+            return False
+        written = self.env['res.currency.rate'].sudo()._upsert_company_rates([(currency.id, rate_date, exchange_rate)])
+        self._store('exchange_rate', key, exchange_rate, pending=True)
+        return bool(written)
+
+    def stats(self):
+        kinds = sorted(set(self.hits) | set(self.misses))
+        return {
+            'hits': {kind: self.hits[kind] for kind in kinds},
+            'misses': {kind: self.misses[kind] for kind in kinds},
+            'created_partner_ids': list(self.created['partner_ids']),
+            'created_product_ids': list(self.created['product_ids']),
+        }
+
+
+class TaxIndex:
+    """Normalized view of the taxes of one company and ``type_tax_use``.
+
+    Tax and tax-group names are normalized once when the index is built, and
+    entries are keyed by amount and by (amount, name, group name). Lookups
+    keep the priority order of the original ``filtered()`` cascade: exact
+    name and group, exact name (non-IVA), IVA group match, any IVA tax,
+    exact name, then the first tax with that amount.
+    """
+
+    def __init__(self, taxes, normalize):
+        self._by_amount = defaultdict(list)
+        self._by_key = {}
+        for tax in taxes:
+            name = normalize(tax.name)
+            group = normalize(tax.tax_group_id.name) if tax.tax_group_id else ''
+            amount_key = self.amount_key(tax.amount)
+            self._by_amount[amount_key].append((tax, name, group))
+            if group:
+                self._by_key.setdefault((amount_key, name, group), tax)
+
+    @staticmethod
+    def amount_key(amount):
+        return round(float(amount or 0.0), 4)
+
+    def match(self, normalized_name, amount):
+        amount_key = self.amount_key(amount)
+        entries = self._by_amount.get(amount_key)
+        if not entries:
+            return None
+
+        exact_name_with_group_tax = self._by_key.get((amount_key, normalized_name, normalized_name))
+        if exact_name_with_group_tax:
+            return exact_name_with_group_tax
+
+        exact_name_tax = next((tax for tax, name, _group in entries if name == normalized_name), None)
+        if exact_name_tax and 'iva' not in normalized_name:
+            return exact_name_tax
+
+        if 'iva' in normalized_name:
+            iva_tax_with_group = next(
+                (tax for tax, _name, group in entries if group and group == normalized_name),
+                None,
+            )
+            if iva_tax_with_group:
+                return iva_tax_with_group
+
+            iva_tax = next(
+                (tax for tax, name, group in entries if 'iva' in name or 'iva' in group),
+                None,
+            )
+            if iva_tax:
+                return iva_tax
+
+        if exact_name_tax:
+            return exact_name_tax
+        return entries[0][0]
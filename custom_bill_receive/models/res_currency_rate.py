@@ -0,0 +1,78 @@
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class ResCurrencyRate(models.Model):
+    _inherit = 'res.currency.rate'
+
+    UPSERT_BATCH_SIZE = 1000
+
+    @api.model
+    def _upsert_company_rates(self, rates, company=None):
+        """Write many ``(currency, date, exchange_rate)`` rates, where
+        ``exchange_rate`` is company currency units per unit of ``currency``
+        (the value shown as ``inverse_company_rate``).
+
+        Duplicate keys are collapsed (last value wins) and written with one
+        ``INSERT ... ON CONFLICT`` per batch; rows whose stored rate already
+        matches are left untouched, and caches are only invalidated when
+        something was actually written. Returns the number of rows written.
+        """
+        company = company or self.env.company
+        company_currency = company.currency_id
+        distinct = {}
+        for currency, rate_date, exchange_rate in rates:
+            currency_id = currency.id if isinstance(currency, models.BaseModel) else currency
+            if not currency_id or currency_id == company_currency.id or not exchange_rate:
+                continue
+            distinct[(currency_id, fields.Date.to_date(rate_date))] = exchange_rate
+        if not distinct:
+            return 0
+
+        # Stored rate = company_rate * company currency rate, as in the
+        # inverse of company_rate/inverse_company_rate.
+        company_currency_rates = {}
+        rows = []
+        for (currency_id, rate_date), exchange_rate in distinct.items():
+            if rate_date not in company_currency_rates:
+                company_currency_rates[rate_date] = company_currency._get_rates(company, rate_date).get(
+                    company_currency.id
+                ) or 1.0
+            rows.append((rate_date, currency_id, company.id, company_currency_rates[rate_date] / exchange_rate))
+
+        self.flush_model()
+        written_ids = []
+        for start in range(0, len(rows), self.UPSERT_BATCH_SIZE):
+            batch = rows[start:start + self.UPSERT_BATCH_SIZE]
+            params = []
+            for row in batch:
+                params += [*row, self.env.uid, self.env.uid]
+            self.env.cr.execute(
+                """
+                INSERT INTO res_currency_rate
+                    (name, currency_id, company_id, rate, create_uid, write_uid, create_date, write_date)
+                VALUES %s
+                ON CONFLICT (name, currency_id, company_id) DO UPDATE
+                   SET rate = EXCLUDED.rate,
+                       write_uid = EXCLUDED.write_uid,
+                       write_date = EXCLUDED.write_date
+                 WHERE res_currency_rate.rate IS DISTINCT FROM EXCLUDED.rate
+                RETURNING id
+                """ % ', '.join(
+                    ["(%s, %s, %s, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')"] * len(batch)
+                ),
+                params,
+            )
+            written_ids += [row[0] for row in self.env.cr.fetchall()]
+
+        if written_ids:
+            self.invalidate_model()
+            self.env['res.currency'].invalidate_model()
+        _logger.info(
+            "Upserted %s distinct currency rates for company %s (%s written)",
+            len(rows), company.id, len(written_ids),
+        )
+        return len(written_ids)
@@ -0,0 +1,3 @@
+from . import test_bill_ingestion_job
+from . import test_bill_receive_deletion
+from . import test_register_bill_payment_benchmark
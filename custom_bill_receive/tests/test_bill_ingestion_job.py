@@ -0,0 +1,34 @@
+import json
+import time
+from unittest.mock import patch
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestBillIngestionJob(AccountTestInvoicingCommon):
+
+    def test_chunk_with_null_document_is_processed(self):
+        job = self.env['bill.ingestion.job']._enqueue('bills', [None], {'error_mode': 'compact'})
+        chunk = job.chunk_ids
+
+        chunk._process_claimed()
+
+        self.assertEqual(chunk.state, 'done')
+        self.assertEqual(json.loads(chunk.failed_indexes), [0])
+        errors = json.loads(chunk.error_log)
+        self.assertEqual(sum(error['count'] for error in errors), 1)
+        self.assertEqual(job._get_status()['progress']['failed'], 1)
+
+    def test_worker_marks_crashing_chunk_failed(self):
+        job = self.env['bill.ingestion.job']._enqueue('bills', [None])
+        chunk = job.chunk_ids
+        chunk_class = type(self.env['bill.ingestion.job.chunk'])
+
+        with patch.object(chunk_class, '_process_claimed', side_effect=Exception('chunk crash')), \
+                patch.object(self.env.cr, 'commit'), patch.object(self.env.cr, 'rollback'):
+            self.env['bill.ingestion.job']._run_ingestion_worker(time.monotonic() + 60)
+
+        self.assertEqual(chunk.state, 'failed')
+        self.assertEqual(chunk.last_error, 'chunk crash')
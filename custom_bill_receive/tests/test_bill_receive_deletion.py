@@ -0,0 +1,117 @@
+from unittest.mock import patch
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestBillReceiveDeletion(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.deletion = cls.env['bill.receive.deletion']
+
+    def _make_bill(self, amount=100.0, uuid=False):
+        bill = self.init_invoice('in_invoice', partner=self.partner_a, amounts=[amount], post=True)
+        if uuid:
+            bill.folio_fiscal = uuid
+        return bill
+
+    def _pay(self, bills, amount=None):
+        vals = {'group_payment': True}
+        if amount is not None:
+            vals['amount'] = amount
+        return self.env['account.payment.register'].with_context(
+            active_model='account.move', active_ids=bills.ids,
+        ).create(vals)._create_payments()
+
+    def test_delete_documents_by_uuid_rejects_shared_payment(self):
+        bill_a = self._make_bill(uuid='AAAAAAAA-0000-0000-0000-000000000001')
+        bill_b = self._make_bill(uuid='AAAAAAAA-0000-0000-0000-000000000002')
+        payment = self._pay(bill_a | bill_b)
+
+        result = self.deletion.delete_documents_by_uuid([bill_a.folio_fiscal], 'bill')
+
+        self.assertFalse(result['deleted'])
+        self.assertEqual(len(result['errors']), 1)
+        self.assertIn(f"Payment {payment.id} is reconciled with other documents", result['errors'][0]['error'])
+        self.assertTrue(bill_a.exists())
+        self.assertTrue(payment.exists())
+
+    def test_delete_documents_by_uuid_deletes_document_and_payment(self):
+        bill = self._make_bill(uuid='AAAAAAAA-0000-0000-0000-000000000003')
+        payment = self._pay(bill)
+
+        result = self.deletion.delete_documents_by_uuid([bill.folio_fiscal.lower()], 'bill')
+
+        self.assertEqual(result['summary']['deleted_documents'], 1)
+        self.assertEqual(result['deleted'][0]['deleted_payment_ids'], [payment.id])
+        self.assertFalse(bill.exists())
+        self.assertFalse(payment.exists())
+
+    def test_purge_reconciliations_sql_recomputes_counterpart_residual(self):
+        bill = self._make_bill(amount=100.0)
+        payment = self._pay(bill, amount=40.0)
+        self.assertAlmostEqual(bill.amount_residual, 60.0)
+
+        self.deletion.delete_payments_sql([payment.id])
+
+        self.assertFalse(payment.exists())
+        self.assertAlmostEqual(bill.amount_residual, 100.0)
+        self.assertEqual(bill.payment_state, 'not_paid')
+
+    def test_estimate_deletion_matches_deleted_rows(self):
+        bill = self._make_bill(amount=100.0)
+        payment = self._pay(bill)
+        self.assertTrue(bill.line_ids.full_reconcile_id)
+
+        estimate = self.deletion.estimate_deletion(payment_ids=[payment.id], move_ids=[bill.id])
+        counts = self.deletion.delete_payments_sql([payment.id])
+        counts_bill = self.deletion.delete_moves_sql([bill.id])
+
+        self.assertEqual(estimate['row_counts'], {
+            'account_payment': counts['payments'] + counts_bill['payments'],
+            'account_move': counts['moves'] + counts_bill['moves'],
+            'account_move_line': counts['move_lines'] + counts_bill['move_lines'],
+            'account_partial_reconcile': counts['reconcile_rows'] + counts_bill['reconcile_rows'],
+            'account_full_reconcile': counts['full_reconcile_rows'] + counts_bill['full_reconcile_rows'],
+        })
+        self.assertTrue(estimate['dry_run'])
+
+    def test_purge_job_resumes_from_cursor_after_failed_chunk(self):
+        bill_1 = self._make_bill()
+        bill_2 = self._make_bill()
+        job = self.env['bill.purge.job'].create({
+            'target': 'bills',
+            'phase': 'bills',
+            'cursor': bill_1.id - 1,
+            'chunk_size': 1,
+            'max_records': 2,
+        })
+        deletion_class = type(self.env['bill.receive.deletion'])
+
+        with patch.object(deletion_class, 'delete_moves_sql', side_effect=Exception('chunk failure')):
+            has_more, deleted_rows = job._process_chunk()
+        self.assertTrue(has_more)
+        self.assertEqual(deleted_rows, 0)
+        self.assertEqual(job.cursor, bill_1.id)
+        self.assertEqual(job.failed_chunks, 1)
+        self.assertTrue(bill_1.exists())
+
+        # A crash marks the job failed; resuming continues after the cursor.
+        job.write({'state': 'failed', 'last_error': 'worker crashed'})
+        job._resume()
+        self.assertEqual(job.state, 'pending')
+
+        has_more, deleted_rows = job._process_chunk()
+        self.assertTrue(has_more)
+        self.assertGreater(deleted_rows, 0)
+        self.assertEqual(job.cursor, bill_2.id)
+        self.assertFalse(bill_2.exists())
+        self.assertTrue(bill_1.exists())
+
+        has_more, _deleted_rows = job._process_chunk()
+        self.assertFalse(has_more)
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.deleted_bills, 1)
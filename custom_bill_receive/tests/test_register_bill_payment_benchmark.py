@@ -0,0 +1,113 @@
+import logging
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+from ..controllers import bill_receive_controller
+from ..controllers.bill_receive_controller import BillReceiveController
+
+_logger = logging.getLogger(__name__)
+
+
+def _legacy_assign_payment_to_move(self, move, payment, account_internal_group):
+    """``BillReceiveController._assign_payment_to_move`` as it was before the
+    set-based reconciliation engine, copied unchanged. It is the only part of
+    ``_register_bill_payment`` that changed; the benchmark payload has no
+    exchange_rate, so the rate write is a no-op on both sides."""
+    expected_account_type = (
+        'asset_receivable' if account_internal_group == 'receivable' else 'liability_payable'
+    )
+
+    move.invalidate_recordset()
+    payment.invalidate_recordset()
+
+    payment_lines = payment.move_id.line_ids.filtered(
+        lambda l: not l.reconciled and l.account_id.internal_group == account_internal_group
+    )
+    if not payment_lines:
+        payment_lines = payment.move_id.line_ids.filtered(
+            lambda l: not l.reconciled and l.account_id.account_type == expected_account_type
+        )
+    if payment_lines and hasattr(move, 'js_assign_outstanding_line'):
+        try:
+            move.js_assign_outstanding_line(payment_lines[:1].id)
+            move.invalidate_recordset()
+            payment.invalidate_recordset()
+            return
+        except Exception as assign_err:
+            _logger.info(
+                "Native outstanding-line assignment failed for move %s / payment %s: %s. Falling back to direct reconcile.",
+                move.id, payment.id, assign_err,
+            )
+
+    move_lines = move.line_ids.filtered(
+        lambda l: not l.reconciled and l.account_id.internal_group == account_internal_group
+    )
+    if not move_lines:
+        move_lines = move.line_ids.filtered(
+            lambda l: not l.reconciled and l.account_id.account_type == expected_account_type
+        )
+
+    if not payment_lines:
+        payment_lines = payment.move_id.line_ids.filtered(
+            lambda l: not l.reconciled and l.account_id.id in move_lines.mapped('account_id').ids
+        )
+
+    lines_to_reconcile = move_lines + payment_lines
+    if not lines_to_reconcile:
+        raise ValueError(
+            f"No unreconciled {account_internal_group} lines found for move {move.id} / payment {payment.id}."
+        )
+
+    lines_to_reconcile.reconcile()
+    move.invalidate_recordset()
+    payment.invalidate_recordset()
+
+
+@tagged('post_install', '-at_install', '-standard', 'custom_bill_receive_benchmark')
+class TestRegisterBillPaymentBenchmark(AccountTestInvoicingCommon):
+    """Per-payment latency of ``_register_bill_payment``, the hot path of
+    ``change_bill_account_by_uuid`` replays, with the original and the
+    current ``_assign_payment_to_move``. Run with
+    ``--test-tags custom_bill_receive_benchmark``."""
+
+    BILL_COUNT = 20
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.journal = cls.company_data['default_journal_bank']
+        cls.controller = BillReceiveController()
+
+    def _make_bills(self):
+        return [
+            self.init_invoice('in_invoice', partner=self.partner_a, amounts=[100.0 + index], post=True)
+            for index in range(self.BILL_COUNT)
+        ]
+
+    def _time_register(self, bills):
+        payment_data = {'journal_id': self.journal.id}
+        with patch.object(bill_receive_controller, 'request', SimpleNamespace(env=self.env)):
+            started = time.perf_counter()
+            for bill in bills:
+                self.controller._register_bill_payment(bill, dict(payment_data, amount=bill.amount_residual))
+            elapsed = time.perf_counter() - started
+        return elapsed / len(bills) * 1000
+
+    def test_register_bill_payment_latency(self):
+        before_bills = self._make_bills()
+        with patch.object(BillReceiveController, '_assign_payment_to_move', _legacy_assign_payment_to_move):
+            before_ms = self._time_register(before_bills)
+
+        after_bills = self._make_bills()
+        after_ms = self._time_register(after_bills)
+
+        for bill in before_bills + after_bills:
+            self.assertEqual(bill.payment_state, self.env['account.move']._get_invoice_in_payment_state())
+        _logger.info(
+            "_register_bill_payment over %s bills: before %.1f ms/payment, after %.1f ms/payment",
+            self.BILL_COUNT, before_ms, after_ms,
+        )
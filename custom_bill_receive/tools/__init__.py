@@ -0,0 +1 @@
+from .normalization import normalize_text, normalize_vat, normalizer_cache_stats
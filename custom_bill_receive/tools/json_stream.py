@@ -0,0 +1,86 @@
+"""Incremental parsing of the document array of large ingestion payloads.
+
+Only the element currently being decoded is buffered, so a 200 MB request
+never has its raw bytes, decoded text and full object graph in memory at
+the same time.
+"""
+import codecs
+import json
+import re
+
+READ_SIZE = 64 * 1024
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array_items(stream, keys, read_size=READ_SIZE):
+    """Yield ``(key, item)`` for each element of the first array found under one of ``keys``.
+
+    Works for both ``{"bills": [...]}`` and the JSON-RPC envelope
+    ``{"params": {"bills": [...]}}``; anything after the array is ignored.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    key_pattern = re.compile(r'"(%s)"\s*:\s*\[' % '|'.join(re.escape(key) for key in keys))
+    buffer = ''
+    eof = False
+
+    def _read():
+        nonlocal eof
+        data = stream.read(read_size)
+        if not data:
+            eof = True
+            return text_decoder.decode(b'', final=True)
+        return text_decoder.decode(data)
+
+    key = None
+    while key is None:
+        match = key_pattern.search(buffer)
+        if match:
+            key = match.group(1)
+            buffer = buffer[match.end():]
+            break
+        if eof:
+            return
+        # Keep a tail so a key split across two reads is still found.
+        buffer = buffer[-64:] + _read()
+
+    position = 0
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE + ',':
+            position += 1
+        if position >= len(buffer):
+            if eof:
+                raise ValueError(f"Unterminated '{key}' array in request body.")
+            buffer = buffer[position:] + _read()
+            position = 0
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buffer = buffer[position:] + _read()
+            position = 0
+            continue
+        if not eof and (end >= len(buffer) or buffer[end] not in _WHITESPACE + ',]'):
+            # raw_decode also accepts a prefix of a number split across two
+            # reads (123 + 456, 7.5 + e3); decode it again with more data.
+            buffer = buffer[position:] + _read()
+            position = 0
+            continue
+        yield key, item
+        buffer = buffer[end:]
+        position = 0
+
+
+def iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,54 @@
+"""Memoized text/RFC normalizers shared by the bill receive API and any other
+addon that needs to compare partner, tax or category names.
+
+Import from ``odoo.addons.custom_bill_receive.tools``. The caches are per
+process (one per Odoo worker) and bounded, since the vocabulary of tax names,
+categories and RFCs seen by the API is small and highly repetitive.
+"""
+import unicodedata
+from functools import lru_cache
+
+NORMALIZE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_text(value):
+    """Lower-case, strip accents and collapse whitespace."""
+    text = (value or '').strip().lower()
+    text = ''.join(
+        ch for ch in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(ch)
+    )
+    return ' '.join(text.split())
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_vat(vat):
+    """Return the VAT as Odoo expects it, prefixing bare Mexican RFCs with MX."""
+    raw = (vat or '').strip().upper().replace(' ', '').replace('-', '')
+    if not raw:
+        return raw
+    # Keep explicit country-prefixed VATs untouched.
+    if raw.startswith('MX') and len(raw) > 2:
+        return raw
+    # Mexican RFC without country prefix -> expected by Odoo as MX + RFC.
+    if raw.isalnum() and len(raw) in (12, 13):
+        return f"MX{raw}"
+    if len(raw) >= 2 and raw[:2].isalpha():
+        return raw
+    return raw
+
+
+def normalizer_cache_stats():
+    stats = {}
+    for func in (normalize_text, normalize_vat):
+        info = func.cache_info()
+        calls = info.hits + info.misses
+        stats[func.__name__] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': round(info.hits / calls, 4) if calls else 0.0,
+            'size': info.currsize,
+            'maxsize': info.maxsize,
+        }
+    return stats
@@ -69,7 +69,7 @@ class AccountMove(models.Model):
         ('CN01', 'Nómina')
     ], string='Uso CFDI')
 
-    folio_fiscal = fields.Char(string="Folio Fiscal")
+    folio_fiscal = fields.Char(string="Folio Fiscal", index='btree_not_null')
 
     state = fields.Selection(selection_add=[
         ('timbrado', 'Timbrado')
@@ -4,7 +4,7 @@
     'summary': 'Register payments using the invoice exchange rate',
     'author': 'OpenAI',
     'category': 'Accounting',
-    'depends': ['account'],
+    'depends': ['account', 'custom_bill_receive'],
     'data': [
         'views/account_move_views.xml',
     ],
@@ -116,34 +116,10 @@ class AccountMove(models.Model):
 
     def _reconcile_payment_with_invoice(self, payment):
         self.ensure_one()
-        account_internal_group = self._get_payment_account_internal_group()
-        expected_account_type = (
-            'asset_receivable' if account_internal_group == 'receivable' else 'liability_payable'
+        result = self.env['bill.receive.reconciliation'].sudo().reconcile_pairs(
+            [(self, payment)], self._get_payment_account_internal_group()
         )
-
-        self.invalidate_recordset()
-        payment.invalidate_recordset()
-
-        invoice_lines = self.line_ids.filtered(
-            lambda line: not line.reconciled and line.account_id.internal_group == account_internal_group
-        )
-        if not invoice_lines:
-            invoice_lines = self.line_ids.filtered(
-                lambda line: not line.reconciled and line.account_id.account_type == expected_account_type
-            )
-
-        payment_lines = payment.move_id.line_ids.filtered(
-            lambda line: not line.reconciled and line.account_id.internal_group == account_internal_group
-        )
-        if not payment_lines:
-            payment_lines = payment.move_id.line_ids.filtered(
-                lambda line: not line.reconciled and line.account_id.account_type == expected_account_type
-            )
-
-        lines_to_reconcile = invoice_lines + payment_lines
-        if not lines_to_reconcile:
+        if result['errors']:
             raise UserError(
-                _('Could not find lines to reconcile for payment %s.') % (payment.display_name,)
+                _('Could not reconcile payment %s: %s') % (payment.display_name, result['errors'][0]['error'])
             )
-
-        lines_to_reconcile.reconcile()
@@ -52,31 +52,9 @@ class AccountPaymentRegister(models.TransientModel):
 
         exchange_rate = invoice.amount_mxn / invoice.amount_total
         payment_date = getattr(self, 'payment_date', False) or invoice.invoice_date
-        rate_model = self.env['res.currency.rate'].sudo()
-        rate_vals = {
-            'name': payment_date,
-            'currency_id': invoice.currency_id.id,
-        }
-        if 'company_id' in rate_model._fields:
-            rate_vals['company_id'] = invoice.company_id.id
-        if 'inverse_company_rate' in rate_model._fields:
-            rate_vals['inverse_company_rate'] = exchange_rate
-        elif 'company_rate' in rate_model._fields:
-            rate_vals['company_rate'] = exchange_rate
-        elif 'rate' in rate_model._fields:
-            rate_vals['rate'] = 1.0 / exchange_rate
-        else:
-            return
-
-        domain = [
-            ('currency_id', '=', invoice.currency_id.id),
-            ('name', '=', payment_date),
-        ]
-        if 'company_id' in rate_model._fields:
-            domain.append(('company_id', '=', invoice.company_id.id))
-
-        existing_rate = rate_model.search(domain, limit=1)
-        if existing_rate:
-            existing_rate.write(rate_vals)
-        else:
-            rate_model.create(rate_vals)
+        # One upsert through the custom_bill_receive writer; an unchanged
+        # stored rate is left alone.
+        self.env['res.currency.rate'].sudo().with_company(invoice.company_id)._upsert_company_rates(
+            [(invoice.currency_id, payment_date, exchange_rate)],
+            company=invoice.company_id,
+        )